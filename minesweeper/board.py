@@ -1,9 +1,15 @@
+from collections import deque
+from contextlib import contextmanager
 from enum import Enum, unique
-from random import shuffle, random
-from itertools import chain
-from threading import RLock
+from random import Random, getrandbits
+from itertools import repeat
+from threading import Lock
 from math import floor, log
-from minesweeper.utils import digits
+from mmap import mmap, ACCESS_READ
+from os import fstat, fsync, replace
+from struct import Struct
+from minesweeper import vectorized
+from minesweeper.utils import digits, ReadWriteLock
 
 
 @unique
@@ -17,12 +23,18 @@ class State(Enum):
 
 
 class Square:
+    """
+    A lightweight view over the (row, col) cell of a Board. A Square stores no cell data of its own: reading or
+    assigning its has_bomb and state attributes reads or writes the compact buffers of the board it was created from.
+    Square instances are created on demand by Board and are cheap to throw away.
+    """
     REPR_BOMB = "*"
 
-    def __init__(self, row, col, has_bomb, state):
+    __slots__ = ("_board", "row", "col")
+
+    def __init__(self, board, row, col):
+        self._board = board
         self.row, self.col = row, col
-        self.has_bomb = has_bomb
-        self.state = state
 
     def __repr__(self):
         return "<'%s.%s' object, row=%d, col=%d, has_bomb=%s, state=%s>" % \
@@ -34,21 +46,198 @@ class Square:
             return Square.REPR_BOMB
         return self.state.representation
 
+    @property
+    def has_bomb(self):
+        return self._board._has_bomb(self.row, self.col)
+
+    @has_bomb.setter
+    def has_bomb(self, value):
+        self._board._set_bomb(self.row, self.col, value)
+
+    @property
+    def state(self):
+        return self._board._square_state(self.row, self.col)
+
+    @state.setter
+    def state(self, value):
+        self._board._set_square_state(self.row, self.col, value)
+
+
+# Codes under which each State is stored inside the Board state buffer: the code of a State is its index in _STATES.
+_STATES = (State.UNTOUCHED, State.FLAGGED, State.DUG)
+_STATE_CODES = {state: code for code, state in enumerate(_STATES)}
+_UNTOUCHED, _FLAGGED, _DUG = range(len(_STATES))
+# Translation table swapping the UNTOUCHED and DUG codes, leaving FLAGGED unchanged
+_TOGGLE_DUG = bytes((_DUG, _FLAGGED, _UNTOUCHED)) + bytes(range(len(_STATES), 256))
+# Translation tables mapping each byte to 1 if it is 0 (respectively, if it is a not dug state code), and to 0 otherwise
+_IS_ZERO = bytes((1,)) + bytes(255)
+_IS_NOT_DUG = bytes(code != _DUG for code in range(256))
+# Number of squares whose states and mines are compared at a time when counting the dug mines
+_COUNT_BLOCK = 1 << 16
+# Translation table from the ASCII digits of a board file to mines
+_ASCII_TO_MINE = bytes.maketrans(b"01", b"\x00\x01")
+# Translation tables mapping each byte to the ASCII digit of its lowest and second lowest bits
+_BIT_TO_ASCII = tuple(bytes(b"01"[b >> bit & 1] for b in range(256)) for bit in (0, 1))
+
+
+def _pack_plane(buffer, bit):
+    """
+    :return: a bytes object packing bit **bit** of every element of **buffer**, eight elements per byte: element i is
+        stored in bit i % 8 of byte i // 8. The elements are turned into a string of binary digits, then into an int.
+    """
+    digits = buffer.translate(_BIT_TO_ASCII[bit])[::-1]
+
+    return (int(digits, 2) if digits else 0).to_bytes((len(buffer) + 7) // 8, "little")
+
+
+def _unpack_plane(packed, size):
+    """
+    :return: a bytearray of **size** elements, the bits packed in **packed** by _pack_plane().
+    """
+    digits = format(int.from_bytes(packed, "little"), "0%db" % size).encode()[::-1] if size > 0 else b""
+
+    if len(digits) != size:
+        raise ValueError("Found %d bits in a %d elements plane" % (len(digits), size))
+
+    return bytearray(digits.translate(_ASCII_TO_MINE))
+
+
+def _render_table():
+    """
+    :return: a translation table from the render key of a square, (state code << _RENDER_STATE_SHIFT) | (bomb <<
+        _RENDER_MINE_SHIFT) | adjacent mines count, to the character representing that square on the board.
+    """
+    table = bytearray(b"?") * 256
+
+    for code, state in enumerate(_STATES):
+        for bomb in (0, 1):
+            for count in range(9):
+                if state != State.DUG:
+                    representation = state.representation
+                elif bomb:
+                    representation = Square.REPR_BOMB
+                else:
+                    representation = str(count) if count > 0 else state.representation
+
+                table[code << _RENDER_STATE_SHIFT | bomb << _RENDER_MINE_SHIFT | count] = ord(representation)
+
+    return bytes(table)
+
+
+_RENDER_MINE_SHIFT, _RENDER_STATE_SHIFT = 4, 5
+_RENDER_TABLE = _render_table()
+
+
+def _header_line(height, width):
+    """
+    :return: A header line to be displayed on top of the grid of a **height** x **width** board.
+    """
+    sep = " "
+    hmaxdigits = digits(width)                  # The maximum number of digits that a column index can take
+    vpad = sep * (digits(height - 1) + 1)       # The vertical padding whitespace to add before this header
+    # The column indices, in string form, padded with the required whitespace
+    indices = [(str(i).ljust(hmaxdigits))[::-1] for i in range(width)]
+
+    return "\n".join([vpad + sep.join([index[i] for index in indices]) for i in range(hmaxdigits)])
+
+
+def _row_line(row, height, counts, mines, states):
+    """
+    :param row: index of the board row being displayed.
+    :param height: height of the board.
+    :param counts: the adjacent mines counts of the squares of the row, one byte each.
+    :param mines: the mines of the squares of the row, one byte each.
+    :param states: the state codes of the squares of the row, one byte each.
+    :return: the line displaying the squares of the row, preceded by the row index and the padding required for proper
+        alignment. Every square is rendered by looking up a key, merging its state, bomb and adjacent mines count, in a
+        translation table.
+    """
+    width = len(states)
+    keys = int.from_bytes(counts, "little") | \
+        int.from_bytes(mines, "little") << _RENDER_MINE_SHIFT | \
+        int.from_bytes(states, "little") << _RENDER_STATE_SHIFT
+    line = bytearray(b" ") * (2 * width)
+    line[::2] = keys.to_bytes(width, "little").translate(_RENDER_TABLE)
+    padding = " " * (digits(height - 1) + 1 - digits(row))
+
+    return str(row) + padding + line.decode() + "\n"
+
+
+class BoardSnapshot:
+    """
+    An immutable rendering of a Board at a given version. Consecutive snapshots of the same board share the rendered
+    rows that did not change between their versions.
+    """
+
+    __slots__ = ("version", "header", "rows", "_text", "_encoded")
+
+    def __init__(self, version, header, rows):
+        """
+        :param version: the version of the board this snapshot was taken at.
+        :param header: the header line displayed on top of the board grid.
+        :param rows: a tuple with the rendered lines of the board rows.
+        """
+        self.version = version
+        self.header = header
+        self.rows = rows
+        self._text = None
+        self._encoded = None
+
+    def __repr__(self):
+        return "<'%s.%s' object, version=%d, height=%d>" % \
+               (self.__class__.__module__, self.__class__.__name__, self.version, self.height())
+
+    def __str__(self):
+        # Computing the text twice in two different threads is harmless, as both would compute the same string
+        if self._text is None:
+            self._text = self.header + "\n" + "".join(self.rows)
+
+        return self._text
+
+    def encode(self):
+        """
+        :return: the text of the snapshot, encoded once and shared by all the replies sending it.
+        """
+        if self._encoded is None:
+            self._encoded = str(self).encode()
+
+        return self._encoded
+
+    def height(self):
+        return len(self.rows)
+
+    def square(self, row, col):
+        """
+        :return: the character representing the (row, col) square in this snapshot.
+        """
+        return self.rows[row][digits(len(self.rows) - 1) + 1 + 2 * col]
+
 
 class Board:
     """ Problem 3, point b. Thread safety argument:\n
-    Thread safety is currently ensured in Board only. The Square class and any other lack
-    any type of coverage. Accessing some of the Board's squares through the Square class can lead to race conditions.
-
-    Board is made thread-safe exclusively by synchronization, by using a reentrant lock (a RLock). The self._squares
-    attribute, which can nevertheless be accessed even though it is marked private (Python does not provide access
-    protection), can be legitimately accessed and modified by observer and mutator methods. These all use
-    synchronization, and as long as a client of Board does not attempt a direct access at self._squares or at an
-    instance of Square, race conditions should not occur. (Of course a rewriting of the Square class may be operated,
-    for ensuring better security. This, however, is not being done for lack of time.) I do not see any piece of
-    code using techniques such as thread confinement, immutability or threadsafe datatypes for ensuring thread
-    security on this class. (Thread safety techniques discussed in the lecture notes of this course are, indeed,
-    confinement, immutability, thread safe datatypes and synchronization.)
+    Thread safety is currently ensured in Board only. Square instances are mere views over the Board they were
+    obtained from: every read or write performed through a Square is forwarded to the Board, so it is covered by the
+    same synchronization. However, reading a Square and then acting on it (e.g. checking its state and then setting it)
+    is not atomic.
+
+    Board is made thread-safe mainly by synchronization, by using a readers-writer lock (see
+    minesweeper.utils.ReadWriteLock). The board content is stored in flat buffers holding one byte per square at index
+    row * width + col: self._mines, self._states and self._counts (the number of mines adjacent to each square, kept up
+    to date when mines change). These attributes, which can nevertheless be accessed even though they are marked
+    private (Python does not provide access protection), can be legitimately accessed and modified by observer and
+    mutator methods. Observers hold the lock for reading, so that any number of them (e.g. renderings for different
+    clients) can proceed in parallel, while mutators hold it for writing, excluding any other observer or mutator.
+    Reading a single square needs no lock, as a byte of a buffer cannot be observed while half-written. The height and
+    width of a board never change, so they need no lock either. The render cache is the only state modified by an
+    observer, snapshot(), and is additionally guarded by self._render_lock, so that concurrent renderings do not
+    interfere with each other. As long as a client of Board does not attempt a direct access at these attributes,
+    race conditions should not occur.
+
+    Immutability is used as well: snapshot() publishes BoardSnapshot instances, which are never modified after their
+    creation and can therefore be read by any number of threads with no synchronization. Publishing a snapshot is a
+    single attribute assignment, so a thread can never observe a half-built one. (Thread safety techniques discussed in
+    the lecture notes of this course are, indeed, confinement, immutability, thread safe datatypes and
+    synchronization.)
 
     Besides arguments for the thread-safety of Board, a test to confirm that no race conditions occur inside Board is
     included in board_test.py.
@@ -58,32 +247,88 @@ class Board:
     DIFF_INTERMEDIATE = (16, 16, 40)
     DIFF_HARD = (16, 30, 99)
 
+    # Binary file format written by save()
+    FILE_MAGIC = b"MSWB"
+    FILE_VERSION = 1
+    # Magic, format version, flags, reserved, height, width, mines count, seed, board version
+    _FILE_HEADER = Struct("<4sBBHIIQQQ")
+    _FLAG_SEED = 1
+    # Number of the most recent mutations whose changed squares are remembered, see changes()
+    CHANGES_LOG = 1024
+    # Number of changed squares remembered at most, over all those mutations. The squares changed by a larger
+    # mutation, such as a reveal spanning a large board, are not remembered
+    CHANGES_LOG_SQUARES = 1 << 16
+
     def __init__(self, boolean_grid):
-        self._squares = list()
-        self._lock: RLock = RLock()
+        height = len(boolean_grid)
+        width = len(boolean_grid[0]) if height > 0 else 0
 
-        self._lock.acquire()
+        for line in boolean_grid:
+            if len(line) != width:
+                raise ValueError("Found a %d-element-wide line, expected %d" % (len(line), width))
 
-        for row in range(len(boolean_grid)):
-            self._squares.append(list())
+        self._init_buffers(height, width, bytearray(bool(x) for line in boolean_grid for x in line))
 
-            for col in range(len(boolean_grid[row])):
-                self._squares[row].append(
-                    Square(row, col, boolean_grid[row][col], State.UNTOUCHED)
-                )
+    @staticmethod
+    def _from_buffer(height, width, mines, counts=None, seed=None, mines_count=None):
+        """
+        Create a new board directly from a flat buffer of mines, skipping the grid conversion done by __init__().
+
+        :param height: number of rows of the board.
+        :param width: number of elements for each row.
+        :param mines: a bytearray of height * width elements, each 1 if the corresponding square has a bomb, 0
+            otherwise. The buffer is owned by the new board from now on.
+        :param counts: an optional bytearray with the adjacent mines counts of the squares, in the same layout as
+            **mines**. They are computed from **mines** if None.
+        :param seed: the seed the mines were generated from, if any.
+        :param mines_count: the number of 1s of **mines**, if known. They are counted if None.
+        :return: a new Board instance.
+        """
+        board = Board.__new__(Board)
+        board._init_buffers(height, width, mines, counts, seed, mines_count)
+
+        return board
+
+    def _init_buffers(self, height, width, mines, counts=None, seed=None, mines_count=None):
+        self.seed = seed
+        self._height, self._width = height, width
+        self._mines = mines
+        self._states = bytearray(height * width)
+        self._counts = bytearray(height * width) if counts is None else counts
+        self._lock: ReadWriteLock = ReadWriteLock()
+        self._render_lock: Lock = Lock()
+        # Every mutation increases the version of the board. The last published snapshot shares its rendered rows
+        # with the next one, which renders again only the rows marked dirty in the meantime.
+        self._version = 0
+        self._snapshot = None
+        self._dirty_rows = set(range(height))
+        # (version, squares) pairs, the squares being the set of the (row, col) coordinates of those changed by the
+        # mutation which led to version, or None if unknown, and the number of squares they hold
+        self._changes = deque()
+        self._logged_squares = 0
 
         self._check_state()
-        self._lock.release()
+        # Every square of a new board is untouched, so only its mines need counting, and only if their number is not
+        # known. See _count_squares() for boards whose states are restored afterwards.
+        self._mines_count = mines.count(1) if mines_count is None else mines_count
+        self._dug_count = self._flagged_count = self._dug_mines_count = 0
+
+        if counts is None:
+            self._compute_counts()
 
     @staticmethod
-    def create_from_probability(height, width, bomb_probability=0.25):
+    def create_from_probability(height, width, bomb_probability=0.25, seed=None):
         """
         Create a new board by supplying a **height**, a **width** and a bomb probability parameters.
+        Mines are placed with NumPy when it is installed (see minesweeper.vectorized), in pure Python otherwise.
 
         :param height: number of rows of the board, each with an even number of elements.
         :param width: number of elements for each row.
         :param bomb_probability: the probability that a cell of the grid has a bomb during creation.
             **bomb_probability** must belong to [0, 1).
+        :param seed: seed of the random mines placement, a non negative int below 2 ** 64. The same seed gives the
+            same board, as long as the availability of NumPy does not change. A random seed is chosen if None, and
+            stored in the seed attribute of the board either way.
         :return: a new Board instance.
         """
         if height * width <= 0:
@@ -91,163 +336,412 @@ class Board:
         if not 0 <= bomb_probability < 1:
             raise ValueError("It must be 0 <= bomb_probability <= 1 (bomb_probability = %f)" % bomb_probability)
 
-        squares = list()
+        seed = getrandbits(64) if seed is None else seed
 
-        for square in range(height * width):
-            squares.append(random() <= bomb_probability)
+        if vectorized.available():
+            squares = vectorized.random_mines(height * width, bomb_probability, seed)
 
-        return Board(Board._list_to_grid(squares, height, width))
+            return Board._from_buffer(height, width, squares, vectorized.adjacent_counts(squares, height, width), seed)
+
+        random = Random(seed).random
+        squares = bytearray(random() <= bomb_probability for square in range(height * width))
+
+        return Board._from_buffer(height, width, squares, seed=seed)
 
     @staticmethod
-    def create_from_difficulty(difficulty=DIFF_EASY):
+    def create_from_difficulty(difficulty=DIFF_EASY, seed=None):
         """
         Create a new board by supplying a pre-made or a custom difficulty level.
+        Mines are placed with NumPy when it is installed (see minesweeper.vectorized), in pure Python otherwise.
 
         :param difficulty: a (**height**, **width**, **mines**) tuple.
+        :param seed: seed of the random mines placement, as in create_from_probability().
         :return: a Board instance with **height** rows, each **width**-elements wide, containing
             **mines** mines randomly interspersed in its grid.
         """
+        height, width, mines = Board.check_difficulty(difficulty)
+        seed = getrandbits(64) if seed is None else seed
+
+        if vectorized.available():
+            squares = vectorized.random_mines_count(height * width, mines, seed)
+
+            return Board._from_buffer(height, width, squares, vectorized.adjacent_counts(squares, height, width), seed,
+                                      mines)
+
+        squares = Board._random_mines_distribution((height * width) - mines, mines, seed)
+
+        return Board._from_buffer(height, width, squares, seed=seed, mines_count=mines)
+
+    @staticmethod
+    def check_difficulty(difficulty):
+        """
+        :param difficulty: a (**height**, **width**, **mines**) tuple.
+        :return: **difficulty**, unpacked.
+        :raise: ValueError if no board can be created from **difficulty**.
+        """
         height, width, mines = difficulty
 
-        if height * width <= 0:
-            raise ValueError("The grid size must be greater than 0 (found %d)" % height * width)
+        if height <= 0 or width <= 0:
+            raise ValueError("The height and width must be greater than 0 (found %d, %d)" % (height, width))
         if not 0 < mines < height * width:
             raise ValueError("0 < mines < %d not true (mines = %d)" % (height * width, mines))
 
-        squares = Board._random_mines_distribution((height * width) - mines, mines)
-
-        return Board(Board._list_to_grid(squares, height, width))
+        return height, width, mines
 
     @staticmethod
     def create_from_file(path):
         """
         Create a new board as instructed in Problem 4 of the assignment.
+        The file is parsed line by line in a single pass, validating and converting each line at once.
 
         :param path: a string representing a file containing a well-formatted grid of 0s and 1s.
         :return: a new Board instance.
         """
 
         def read_line(text_line):
-            sep = " "
-            encoding = {'0': False, '1': True}
+            """
+            :return: the mines of text_line, a bytes line of the grid, as a bytes object with one 0 or 1 byte per
+                square. The line is validated and converted with bulk bytes operations, square tokens lying at even
+                positions and single space separators at odd ones.
+            """
+            line = text_line.strip()
+            squares = line[::2]
+
+            if len(line) % 2 == 0 or line[1::2].count(b" ") != len(squares) - 1 or \
+                    len(squares.translate(None, b"01")) > 0:
+                # The line may still be valid when decoded, e.g. if it is surrounded by non-ASCII whitespace
+                squares = text_line.decode().strip().split(" ")
 
-            # dict.get() returns None when a given argument is not contained within the dict keys
-            line = [encoding.get(i) for i in text_line.strip().split(sep)]
+                if {"0", "1"}.issuperset(squares):
+                    return bytes(square == "1" for square in squares)
 
-            if None in line:
                 raise ValueError("Found invalid content in '%s'. Every line can contain only 0s and 1s" % path)
 
-            return line
+            return squares.translate(_ASCII_TO_MINE)
+
+        mines = bytearray()
+        widths = list()
+
+        with open(path, "rb") as f:
+            # The file is mapped in memory rather than read, so that only the mines buffer takes memory
+            size = fstat(f.fileno()).st_size
+            data = mmap(f.fileno(), 0, access=ACCESS_READ) if size > 0 else b""
+
+            try:
+                # Universal newlines, as when reading the file in text mode
+                if data.find(b"\r") != -1:
+                    data = data[:].replace(b"\r\n", b"\n").replace(b"\r", b"\n")
+
+                start = 0
+
+                while start < len(data):
+                    end = data.find(b"\n", start)
+                    end = len(data) if end == -1 else end
+                    line = read_line(data[start:end])
+
+                    mines += line
+                    widths.append(len(line))
+                    start = end + 1
+            finally:
+                if isinstance(data, mmap):
+                    data.close()
+
+        for width in widths:
+            if width != len(widths):
+                raise ValueError("Found %d wide line in a %d tall grid, square grid expected" % (width, len(widths)))
+
+        return Board._from_buffer(len(widths), len(widths), mines)
 
-        with open(path) as f:
-            lines = [read_line(line) for line in f]
+    @staticmethod
+    def load(path):
+        """
+        Create a new board from a file written by save(), restoring its mines, the state of its squares and its
+        version. The file is mapped in memory, and its bit planes are expanded straight from the mapping.
+
+        :param path: path of a binary board file.
+        :return: a new Board instance.
+        :raise: ValueError if the file is not a valid binary board file.
+        """
+        with open(path, "rb") as f:
+            if fstat(f.fileno()).st_size < Board._FILE_HEADER.size:
+                raise ValueError("'%s' is too short to be a binary board file" % path)
+
+            with mmap(f.fileno(), 0, access=ACCESS_READ) as data:
+                with memoryview(data) as view:
+                    return Board._from_binary(view, path)
+
+    @staticmethod
+    def _from_binary(data, name="<buffer>"):
+        """
+        :param data: a bytes-like object in the format written by save().
+        :param name: a name for **data**, used in error messages.
+        :return: a new Board instance.
+        """
+        magic, version, flags, _, height, width, mines_count, seed, board_version = \
+            Board._FILE_HEADER.unpack_from(data)
+
+        if magic != Board.FILE_MAGIC:
+            raise ValueError("'%s' is not a binary board file" % name)
+        if version != Board.FILE_VERSION:
+            raise ValueError("'%s' has version %d, expected %d" % (name, version, Board.FILE_VERSION))
+
+        size, plane = height * width, (height * width + 7) // 8
+        start = Board._FILE_HEADER.size
+
+        if len(data) != start + 3 * plane:
+            raise ValueError("'%s' has %d bytes, expected %d" % (name, len(data), start + 3 * plane))
+
+        mines = _unpack_plane(data[start:start + plane], size)
+        states = _unpack_plane(data[start + plane:start + 2 * plane], size)
+        high_states = _unpack_plane(data[start + 2 * plane:start + 3 * plane], size)
 
-            for line in lines:
-                if len(line) != len(lines):
-                    raise ValueError("Found %d wide line in a %d tall grid, square grid expected" %
-                                     (len(line), len(lines)))
+        if mines.count(1) != mines_count:
+            raise ValueError("'%s' has %d mines, expected %d" % (name, mines.count(1), mines_count))
 
-        return Board(lines)
+        board = Board._from_buffer(height, width, mines, seed=seed if flags & Board._FLAG_SEED else None)
+        states = int.from_bytes(states, "little") | int.from_bytes(high_states, "little") << 1
+        board._states[:] = states.to_bytes(size, "little")
+        board._version = board_version
+        board._count_squares()
+
+        if len(board._states.translate(None, bytes(range(len(_STATES))))) > 0:
+            raise ValueError("'%s' contains invalid square states" % name)
+
+        return board
+
+    def save(self, path):
+        """
+        Write the board to **path** in a compact, versioned binary format, which Board.load() reads back. After a
+        fixed size header (see _FILE_HEADER) come three bit planes, holding one bit per square in row-major order: the
+        mines, then the low and the high bit of the state codes. The file is written to a temporary path first and
+        then renamed, so that **path** always holds a complete board, even if the process is killed while saving.
+
+        :param path: path of the file to write.
+        :return: the version of the board which was saved.
+        """
+        with self._lock.read():
+            data, version = self._to_binary(), self._version
+
+        with open(path + ".tmp", "wb") as f:
+            f.writelines(data)
+            f.flush()
+            fsync(f.fileno())
+
+        replace(path + ".tmp", path)
+
+        return version
+
+    def _to_binary(self):
+        """
+        :return: a list of bytes objects which, once joined, make up the binary representation of the board.
+        """
+        has_seed = isinstance(self.seed, int) and 0 <= self.seed < 1 << 64
+        header = Board._FILE_HEADER.pack(Board.FILE_MAGIC, Board.FILE_VERSION, Board._FLAG_SEED if has_seed else 0, 0,
+                                         self._height, self._width, self._mines_count,
+                                         self.seed if has_seed else 0, self._version)
+
+        return [header, _pack_plane(self._mines, 0), _pack_plane(self._states, 0), _pack_plane(self._states, 1)]
 
     def __repr__(self):
-        with self._lock:
+        with self._lock.read():
             return "<'%s.%s' object, height=%d, width=%d, mines_count=%d>" % \
                    (self.__class__.__module__, self.__class__.__name__, self.height(), self.width(), self.mines_count())
 
     def __str__(self):
+        return str(self.snapshot())
 
-        def format_row(row):
-            result = ""
+    def version(self):
+        """
+        :return: the current version of the board, a number increased by every mutation.
+        """
+        return self._version
+
+    def changes(self, since, until=None):
+        """
+        :param since: a version of the board.
+        :param until: a later version of the board, the current one if None.
+        :return: the set of the (row, col) coordinates of the squares whose representation may have changed from
+            version **since** to version **until**, or None if they are not known, either because the mutations in
+            between are no longer remembered or because they were not recorded square by square.
+        """
+        with self._lock.read():
+            until = self._version if until is None else until
 
-            for square in row:
-                if square.state in (State.UNTOUCHED, State.FLAGGED):
-                    result += "%s " % str(square)
-                elif square.state == State.DUG:
-                    if square.has_bomb:
-                        result += "%s " % str(square)
-                    else:
-                        nearby_bombs = len([n for n in self.neighbors(square.row, square.col) if n.has_bomb])
+            if since > until:
+                return None
+            elif since == until:
+                return set()
+            elif not self._changes or self._changes[0][0] > since + 1:
+                return None
 
-                        if nearby_bombs == 0:
-                            result += str(square) + " "
-                        else:
-                            result += "%d " % nearby_bombs
+            result = set()
+
+            for version, squares in reversed(self._changes):
+                if version <= since:
+                    break
+                elif version <= until:
+                    if squares is None:
+                        return None
+
+                    result.update(squares)
 
             return result
 
-        def format_row_header():
-            """
-            :return: A header line to be displayed on top of the board grid.
-            """
-            sep = " "
-            hmaxdigits = digits(self.width())               # The maximum number of digits that a column index can take
-            vpad = sep * (digits(self.height() - 1) + 1)    # The vertical padding whitespace to add before this header
-            # The column indices, in string form, padded with the required whitespace
-            indices = [(str(i).ljust(hmaxdigits))[::-1] for i in range(self.width())]
-            result = ""
+    def _changed(self, squares):
+        """
+        Increase the version of the board for a mutation, remembering the squares it changed. Must be called holding
+        the lock for writing.
 
-            for i in range(hmaxdigits):
-                # result is added a new header line at each iteration
-                result += vpad + sep.join([index[i] for index in indices])
+        :param squares: a collection of the (row, col) coordinates of the squares whose representation changed, or
+            None if they are not known.
+        """
+        if squares is not None and len(squares) > self.CHANGES_LOG_SQUARES:
+            squares = None
+        elif squares is not None:
+            squares = frozenset(squares)
+            self._logged_squares += len(squares)
 
-                if i < hmaxdigits - 1:
-                    result += "\n"
+        self._version += 1
+        self._changes.append((self._version, squares))
 
-            return result
+        while len(self._changes) > self.CHANGES_LOG or self._logged_squares > self.CHANGES_LOG_SQUARES:
+            version, dropped = self._changes.popleft()
+            self._logged_squares -= len(dropped) if dropped is not None else 0
 
-        def vertical_padding(rowindex):
-            """
-            :param rowindex: index of the board row being displayed
-            :return: the padding to be appended in front of a board row to allow proper alignment
-            """
-            return " " * (digits(self.height() - 1) + 1 - digits(rowindex))
+    @contextmanager
+    def atomic(self):
+        """
+        Hold the board lock for writing while the block runs, so that the mutations made within it are seen by other
+        threads, and by snapshots, as a single one.
+        """
+        with self._lock.write():
+            yield self
 
-        result = format_row_header() + "\n"
+    def snapshot(self):
+        """
+        :return: a BoardSnapshot of the current version of the board. Snapshots are immutable, so they can be rendered
+            or inspected without holding any lock while the board keeps changing.
+        """
+        snapshot = self._snapshot
 
-        self._lock.acquire()
+        # A published snapshot of the current version can be handed out with no synchronization at all: a mutation
+        # still in progress would only be visible through a later version.
+        if snapshot is not None and snapshot.version == self._version:
+            return snapshot
 
-        for rowindex, row in zip(range(self.height()), self._squares):
-            result += str(rowindex) + vertical_padding(rowindex) + format_row(row) + "\n"
+        with self._lock.read():
+            with self._render_lock:
+                snapshot = self._snapshot
 
-        self._lock.release()
+                if snapshot is None:
+                    rows = [None] * self._height
+                    header = self._render_header()
+                elif snapshot.version != self._version:
+                    rows = list(snapshot.rows)
+                    header = snapshot.header
+                else:
+                    return snapshot
 
-        return result
+                for row in self._dirty_rows:
+                    rows[row] = self._render_row(row)
+
+                self._dirty_rows.clear()
+                self._snapshot = snapshot = BoardSnapshot(self._version, header, tuple(rows))
+
+                return snapshot
+
+    def _render_header(self):
+        return _header_line(self._height, self._width)
+
+    def _render_row(self, row):
+        start, end = row * self._width, (row + 1) * self._width
+
+        return _row_line(row, self._height, self._counts[start:end], self._mines[start:end], self._states[start:end])
 
     def __len__(self):
-        with self._lock:
-            return sum([len(row) for row in self._squares])
+        return self._height * self._width
 
     def __contains__(self, key):
         if not (isinstance(key[0], int) and isinstance(key[1], int)):
             raise ValueError("Arguments must be integers (found %s, %s)" % (key[0], key[1]))
 
-        with self._lock:
-            return 0 <= key[0] < len(self._squares) and \
-                   0 <= key[1] < len(self._squares[key[0]])
+        return 0 <= key[0] < self._height and 0 <= key[1] < self._width
 
     def __iter__(self):
-        with self._lock:
-            return iter(chain(*self._squares))
+        height, width = self._height, self._width
+
+        return (Square(self, row, col) for row in range(height) for col in range(width))
 
     def square(self, row, col):
-        with self._lock:
-            return self._squares[row][col]
+        if (row, col) not in self:
+            raise IndexError("%d, %d coordinates are out of range" % (row, col))
+
+        return Square(self, row, col)
 
     def height(self):
-        with self._lock:
-            return len(self._squares)
+        return self._height
 
     def width(self):
-        with self._lock:
-            return len(self._squares[0]) if len(self._squares) > 0 else 0
+        return self._width
 
     def mines_count(self):
         """
         :return: an int indicating the number of squares where has_bomb evaluates to true, i.e. those squares
             which have a bomb, or are "mined".
         """
-        with self._lock:
-            return len([square for square in self if square.has_bomb])
+        return self._mines_count
+
+    def dug_count(self):
+        """
+        :return: the number of dug squares.
+        """
+        return self._dug_count
+
+    def flagged_count(self):
+        """
+        :return: the number of flagged squares.
+        """
+        return self._flagged_count
+
+    def safe_remaining(self):
+        """
+        :return: the number of squares without a bomb which are not dug yet.
+        """
+        with self._lock.read():
+            return len(self) - self._mines_count - (self._dug_count - self._dug_mines_count)
+
+    def is_won(self):
+        """
+        :return: True if every square without a bomb was dug, which ends the game.
+        """
+        return self.safe_remaining() == 0
+
+    def _count_squares(self):
+        """
+        Compute from scratch the counters of mined, dug, flagged and dug mined squares, which mutators then keep up to
+        date as squares change. Only needed once the states of the squares were replaced wholesale.
+        """
+        with self._lock.write():
+            self._mines_count = self._mines.count(1)
+            self._dug_count = self._states.count(_DUG)
+            self._flagged_count = self._states.count(_FLAGGED)
+            # The _DUG code is the only one with its second bit set, and mines are 0 or 1. The buffers are compared a
+            # block at a time, rather than as a pair of ints as large as the board.
+            self._dug_mines_count = sum((int.from_bytes(self._states[i:i + _COUNT_BLOCK], "little") &
+                                         int.from_bytes(self._mines[i:i + _COUNT_BLOCK], "little") << 1).bit_count()
+                                        for i in range(0, len(self._states), _COUNT_BLOCK))
+
+    def _count_change(self, index, old, new):
+        """
+        Update the squares counters for the state of the square at buffer index **index** changing from code **old**
+        to code **new**.
+        """
+        for code, delta in ((old, -1), (new, 1)):
+            if code == _DUG:
+                self._dug_count += delta
+                self._dug_mines_count += delta * self._mines[index]
+            elif code == _FLAGGED:
+                self._flagged_count += delta
 
     def set_state(self, row, col, state):
         """
@@ -258,84 +752,274 @@ class Board:
         :param row: row coordinate
         :param col: col coordinate
         :param state: State value to set the (row, col) square into
+        :return: the set of (row, col) coordinates of the squares whose state was changed by this call.
         """
-        self._lock.acquire()
+        if (row, col) not in self:
+            raise ValueError("%d, %d coordinates are out of range" % (row, col))
+
+        with self._lock.write():
+            index = row * self._width + col
+            code = _STATE_CODES[state]
+            changed = {(row, col)} if self._states[index] != code else set()
+
+            if changed:
+                self._count_change(index, self._states[index], code)
+                self._states[index] = code
+                self._dirty_rows.add(row)
+
+            if state == State.DUG and not self._mines[index] and self._counts[index] == 0:
+                changed.update(self._reveal((index,)))
+            if changed:
+                self._changed(changed)
+
+            return changed
+
+    def chord(self, row, col):
+        """
+        Dig every untouched neighbour of the dug (row, col) square, if as many of its neighbours are flagged as it has
+        adjacent mines, revealing the regions with no adjacent mines reached in a single pass. Neighbours flagged
+        wrongly leave mined neighbours to be dug, whose bombs are left in place: callers can find them among the
+        neighbours of the square.
 
+        :return: the set of (row, col) coordinates of the squares whose state was changed by this call, empty if the
+            square is not dug or the number of its flagged neighbours does not match.
+        """
         if (row, col) not in self:
             raise ValueError("%d, %d coordinates are out of range" % (row, col))
 
-        self._squares[row][col].state = state
+        with self._lock.write():
+            index, states, width = row * self._width + col, self._states, self._width
+            neighbors = self._neighbor_indices(index)
+            changed = set()
+
+            if states[index] != _DUG or [states[n] for n in neighbors].count(_FLAGGED) != self._counts[index]:
+                return changed
+
+            for n in neighbors:
+                if states[n] == _UNTOUCHED:
+                    self._count_change(n, _UNTOUCHED, _DUG)
+                    states[n] = _DUG
+                    self._dirty_rows.add(n // width)
+                    changed.add(divmod(n, width))
+
+            changed.update(self._reveal([n for n in neighbors if (n // width, n % width) in changed and
+                                         not self._mines[n] and self._counts[n] == 0]))
+
+            if changed:
+                self._changed(changed)
+
+            return changed
+
+    def _reveal(self, indices):
+        """
+        Digs the neighbourhood of the already dug, mine-free squares at buffer indices **indices**, which are expected
+        to have no adjacent mines. The reveal spreads to every not yet dug square with no adjacent mines reached along
+        the way, until the whole region of such squares and its border are dug.
+
+        The region is visited as a stack of horizontal spans rather than square by square: for each span only the
+        rows above and below are searched for new spans, and both searching and digging are done with bulk bytes
+        operations, so that the time taken is linear in the number of dug squares.
+
+        :return: the set of (row, col) coordinates of the squares that were dug.
+        """
+        states, width, height = self._states, self._width, self._height
+        dug_bits = int.from_bytes(bytes((_DUG,)) * width, "little")
+        expandable_rows = dict()
+        changed = set()
+
+        def expandable(x):
+            """
+            :return: a bytearray holding, for each square of row x, 1 if it is not dug and it has neither a bomb nor
+                adjacent mines, 0 otherwise. Squares are cleared as soon as they are included in a span.
+            """
+            if x not in expandable_rows:
+                start, end = x * width, (x + 1) * width
+                key = int.from_bytes(self._counts[start:end], "little") | \
+                    int.from_bytes(self._mines[start:end], "little") | \
+                    int.from_bytes(states[start:end], "little") & dug_bits
+                expandable_rows[x] = bytearray(key.to_bytes(width, "little").translate(_IS_ZERO))
+
+            return expandable_rows[x]
 
-        if state == State.DUG and not self._squares[row][col].has_bomb:
-            neighbors = self.neighbors(row, col)
-            nearby_bombs = len([n for n in neighbors if n.has_bomb])
+        spans = [(row, col, col + 1) for row, col in (divmod(index, width) for index in indices)]
 
-            if nearby_bombs == 0:
-                for n in [s for s in neighbors if s.state != State.DUG]:
-                    self.set_state(n.row, n.col, State.DUG)
+        while spans:
+            x, left, right = spans.pop()
+            min_col, max_col = max(left - 1, 0), min(right + 1, width)
 
-        self._lock.release()
+            for y in range(max(x - 1, 0), min(x + 2, height)):
+                line = expandable(y)
+                found = line.find(1, min_col, max_col)
+
+                while found != -1:
+                    start, end = line.rfind(0, 0, found) + 1, line.find(0, found)
+                    end = width if end == -1 else end
+                    line[start:end] = bytes(end - start)
+                    spans.append((y, start, end))
+
+                    found = line.find(1, end, max_col)
+
+                self._dig_range(y, min_col, max_col, changed)
+
+        return changed
+
+    def _dig_range(self, row, min_col, max_col, changed):
+        """
+        Digs every not yet dug square of **row** whose column lies in [min_col, max_col), adding their coordinates to
+        the **changed** set.
+        """
+        start = row * self._width + min_col
+        line = self._states[start:start + max_col - min_col]
+
+        if line.count(_DUG) == len(line):
+            return
+
+        undug = line.translate(_IS_NOT_DUG)
+        begin = undug.find(1)
+
+        while begin != -1:
+            end = undug.find(0, begin)
+            end = len(undug) if end == -1 else end
+
+            self._dug_count += end - begin
+            self._dug_mines_count += self._mines.count(1, start + begin, start + end)
+            self._flagged_count -= line.count(_FLAGGED, begin, end)
+            self._states[start + begin:start + end] = bytes((_DUG,)) * (end - begin)
+            self._dirty_rows.add(row)
+            changed.update(zip(repeat(row), range(min_col + begin, min_col + end)))
+
+            begin = undug.find(1, end)
 
     def neighbors(self, row, col):
         """
         :return: a list containing all those squares which are one square away from the (row, col) square, that is its
             "neighbours".
         """
-        self._lock.acquire()
+        return [Square(self, *divmod(n, self._width)) for n in self._neighbor_indices(row * self._width + col)]
 
-        result = list()
-        min_row, max_row = max(row - 1, 0), min(row + 1, len(self._squares) - 1)
-        min_col, max_col = max(col - 1, 0), min(col + 1, len(self._squares[row]) - 1)
+    def adjacent_mines(self, row, col):
+        """
+        :return: the number of mined squares among the neighbours of the (row, col) square. The value is looked up
+            from a grid kept up to date as mines are added or removed, so no neighbour is inspected.
+        """
+        return self._counts[row * self._width + col]
 
-        for x in range(min_row, max_row + 1):
-            for y in range(min_col, max_col + 1):
-                if (x, y) != (row, col):
-                    result.append(self._squares[x][y])
+    def _neighbor_indices(self, index):
+        """
+        :return: a list with the buffer indices of the neighbours of the square at buffer index **index**.
+        """
+        width = self._width
+        row, col = divmod(index, width)
+        min_col, max_col = max(col - 1, 0), min(col + 1, width - 1)
+        result = list()
 
-        self._lock.release()
+        for x in range(max(row - 1, 0), min(row + 1, self._height - 1) + 1):
+            for n in range(x * width + min_col, x * width + max_col + 1):
+                if n != index:
+                    result.append(n)
 
         return result
 
-    def _check_state(self):
+    def _compute_counts(self):
         """
-        Performs validity checks on the current instance, raising relevant exceptions when detecting an invalid state.
-        :return: True if no inconsistencies were found within the current instance.
+        Fills the adjacent mines count grid from scratch, one row at a time. The mines of a row are handled as a single
+        int, with one byte per square, so that summing each square with its left and right neighbours takes two
+        shifts and two additions; the count of a square is then the sum of these triples over the rows above, at and
+        below it, minus the square itself.
         """
-        self._lock.acquire()
-        expected_line_length = len(self._squares[0]) if len(self._squares) > 0 else None
+        width = self._width
+        mask = (1 << (8 * width)) - 1
 
-        for line in self._squares:
-            types = {type(square) for square in line}
+        def mines_row(row):
+            return int.from_bytes(self._mines[row * width:(row + 1) * width], "little") \
+                if 0 <= row < self._height else 0
 
-            if {Square} != types:
-                raise ValueError("The board can only contain Square variables within its grid")
-            if len(line) != expected_line_length:
-                raise ValueError("Found a %d-element-wide line, expected %d" % (len(line), expected_line_length))
+        def triple(mines):
+            padded = mines << 8
+            return (padded + (padded >> 8) + (padded >> 16)) & mask
 
-        self._lock.release()
+        current = mines_row(0)
+        # The triples of the rows above, at and below the current one
+        triples = [0, triple(current)]
 
-        return True
+        for row in range(self._height):
+            below = mines_row(row + 1)
+            triples.append(triple(below))
+            total = sum(triples) - current
+            self._counts[row * width:(row + 1) * width] = total.to_bytes(width, "little")
 
-    @staticmethod
-    def _random_mines_distribution(empty_squares, mined_squares):
-        distribution = [False for i in range(empty_squares)]
-        distribution.extend([True for i in range(mined_squares)])
-        shuffle(distribution)
+            current = below
+            del triples[0]
 
-        return distribution
+    def _has_bomb(self, row, col):
+        return self._mines[row * self._width + col] == 1
 
-    @staticmethod
-    def _list_to_grid(squares, height, width):
+    def _set_bomb(self, row, col, has_bomb):
         """
-        Utility method used to convert a flat list of boolean values (representing mined squares) to
-        a multi-dimensional list with specified height and width.
+        Add or remove the mine of the (row, col) square, updating the adjacent mines count of its neighbours.
+        """
+        index = row * self._width + col
+
+        with self._lock.write():
+            if self._mines[index] != bool(has_bomb):
+                self._mines[index] = bool(has_bomb)
+                delta = 1 if has_bomb else -1
+                self._mines_count += delta
+
+                if self._states[index] == _DUG:
+                    self._dug_mines_count += delta
+
+                for n in self._neighbor_indices(index):
+                    self._counts[n] += delta
 
-        :param squares: one-dimensional list of squares.
-        :param height: height of the resulting grid.
-        :param width: number of elements for each of the **height** rows.
-        :return: a grid-like list with the same values as **squares**.
+                self._dirty_rows.update(range(max(row - 1, 0), min(row + 2, self._height)))
+                self._changed([(row, col)] + [divmod(n, self._width) for n in self._neighbor_indices(index)])
+
+    def _square_state(self, row, col):
+        return _STATES[self._states[row * self._width + col]]
+
+    def _set_square_state(self, row, col, state):
         """
-        return [squares[i * width:(i * width) + width] for i in range(height)]
+        Set the state of the (row, col) square to state, without digging any of its neighbours as set_state() does.
+        """
+        index = row * self._width + col
+
+        with self._lock.write():
+            if self._states[index] != _STATE_CODES[state]:
+                self._count_change(index, self._states[index], _STATE_CODES[state])
+                self._states[index] = _STATE_CODES[state]
+                self._dirty_rows.add(row)
+                self._changed([(row, col)])
+
+    def _check_state(self):
+        """
+        Performs validity checks on the current instance, raising relevant exceptions when detecting an invalid state.
+        The content of the state and count buffers is only ever written by Board itself, so only their size is checked.
+        :return: True if no inconsistencies were found within the current instance.
+        """
+        with self._lock.read():
+            expected_size = self._height * self._width
+
+            for name, buffer in (("mines", self._mines), ("states", self._states), ("counts", self._counts)):
+                if len(buffer) != expected_size:
+                    raise ValueError("Found a %d-element %s buffer, expected %d" % (len(buffer), name, expected_size))
+            if len(self._mines.translate(None, b"\x00\x01")) > 0:
+                raise ValueError("The mines buffer can only contain 0s and 1s")
+
+        return True
+
+    @staticmethod
+    def _random_mines_distribution(empty_squares, mined_squares, seed=None):
+        """
+        :return: a bytearray of empty_squares + mined_squares elements, mined_squares of which are randomly chosen to
+            be 1 (mined) and all the others 0 (empty). The choice is determined by **seed**, unless it is None.
+        """
+        distribution = bytearray(empty_squares + mined_squares)
+
+        for i in Random(seed).sample(range(len(distribution)), mined_squares):
+            distribution[i] = 1
+
+        return distribution
 
     def toggle_dug(self, toggles=1):
         """
@@ -343,15 +1027,10 @@ class Board:
         for more info). If the state of a square is FLAGGED no modification occurs.\n
         This method is primarily used for debug purposes.
         """
-        self._lock.acquire()
-
-        for i in range(toggles):
-            for s in self:
-                if s.state == State.UNTOUCHED:
-                    # self.set_state(s.row, s.col, State.DUG)
-                    s.state = State.DUG
-                elif s.state == State.DUG:
-                    # self.set_state(s.row, s.col, State.UNTOUCHED)
-                    s.state = State.UNTOUCHED
+        with self._lock.write():
+            for i in range(toggles):
+                self._states[:] = self._states.translate(_TOGGLE_DUG)
 
-        self._lock.release()
+            self._count_squares()
+            self._dirty_rows.update(range(self._height))
+            self._changed(None)
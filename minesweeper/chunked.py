@@ -0,0 +1,549 @@
+from collections import OrderedDict, deque
+from random import Random, getrandbits
+from threading import Lock
+
+from minesweeper.board import Board, State, Square, BoardSnapshot, _STATES, _STATE_CODES, _UNTOUCHED, _FLAGGED, _DUG, \
+    _TOGGLE_DUG, _header_line, _row_line, _pack_plane
+from minesweeper.utils import ReadWriteLock
+
+
+class _Chunk:
+    """
+    The squares of a square region of a ChunkedBoard, stored as flat buffers indexed by row * size + col, with row and
+    col relative to the top left corner of the chunk. Squares of the chunk falling outside of the board never have a
+    bomb and are never dug.
+    """
+
+    __slots__ = ("mines", "states", "counts")
+
+    def __init__(self, mines, counts):
+        self.mines = mines
+        self.states = bytearray(len(mines))
+        self.counts = counts
+
+
+class ChunkedBoard:
+    """
+    A board whose squares are split into chunks of CHUNK_SIZE x CHUNK_SIZE squares, generated lazily the first time one
+    of their squares is modified. The mines of every chunk are a function of the board seed and of the chunk
+    coordinates only, so a chunk that was never modified does not need to be stored at all: its mines are generated
+    again whenever they are needed, and its squares are all untouched. Creating a board therefore takes no time, and
+    its memory grows with the explored area only, so that huge shared maps can be played.
+
+    ChunkedBoard offers the same interface as Board. However, operations visiting the whole board, such as iteration,
+    rendering, save() and toggle_dug(), take time proportional to the board size and are thus only practical for
+    boards of moderate size. So does the first call to mines_count(), and thus to safe_remaining() and is_won(),
+    while later calls return the count kept up to date by mutators.
+
+    Thread safety argument:\n
+    ChunkedBoard is made thread-safe by synchronization, with the same design as Board: observers hold
+    self._lock for reading and mutators hold it for writing. The stored chunks, in self._chunks, are only created and
+    modified by mutators. The cache of the mines of the chunks which are not stored, self._generated, is modified by
+    observers as well, so it is additionally guarded by self._generated_lock. The mines count, self._mines_count,
+    is set by the first observer needing it, which is safe as concurrent observers can only set it to the same
+    value. The render cache is guarded by
+    self._render_lock, as in Board, and snapshots are immutable.
+    """
+
+    CHUNK_SIZE = 64
+    # Number of chunks whose generated mines are kept in memory, without being stored as chunks
+    GENERATED_CACHE_SIZE = 256
+    CHANGES_LOG = Board.CHANGES_LOG
+    CHANGES_LOG_SQUARES = Board.CHANGES_LOG_SQUARES
+
+    def __init__(self, height, width, bomb_probability=0.2, seed=None, chunk_size=CHUNK_SIZE):
+        """
+        :param height: number of rows of the board.
+        :param width: number of elements for each row.
+        :param bomb_probability: the probability that a square of the board has a bomb. **bomb_probability** must
+            belong to [0, 1).
+        :param seed: an int determining the mines of the board. A random seed is chosen if None.
+        :param chunk_size: height and width of the chunks.
+        """
+        if height * width <= 0:
+            raise ValueError("The grid size must be greater than 0 (found %d)" % (height * width))
+        if not 0 <= bomb_probability < 1:
+            raise ValueError("It must be 0 <= bomb_probability <= 1 (bomb_probability = %f)" % bomb_probability)
+        if chunk_size <= 0:
+            raise ValueError("The chunk size must be greater than 0 (found %d)" % chunk_size)
+
+        self._height, self._width = height, width
+        self._chunk_size = chunk_size
+        self.seed = getrandbits(64) if seed is None else seed
+        # Mines are generated from random bytes: a byte below the threshold is a mine
+        threshold = round(bomb_probability * 256)
+        self._mines_table = bytes(1 if b < threshold else 0 for b in range(256))
+
+        self._chunks = dict()
+        self._generated = OrderedDict()
+        self._lock: ReadWriteLock = ReadWriteLock()
+        self._generated_lock: Lock = Lock()
+        self._render_lock: Lock = Lock()
+        self._version = 0
+        self._snapshot = None
+        # None stands for every row being dirty, avoiding to enumerate the rows of a huge board
+        self._dirty_rows = None
+        # See Board
+        self._changes = deque()
+        self._logged_squares = 0
+        # Counters of the squares, as in Board, the mines count being None until first needed. Every square is
+        # untouched at first.
+        self._mines_count = None
+        self._dug_count = self._flagged_count = self._dug_mines_count = 0
+
+    def __repr__(self):
+        return "<'%s.%s' object, height=%d, width=%d, seed=%d, chunks=%d>" % \
+               (self.__class__.__module__, self.__class__.__name__, self._height, self._width, self.seed,
+                len(self._chunks))
+
+    def __str__(self):
+        return str(self.snapshot())
+
+    def __len__(self):
+        return self._height * self._width
+
+    def __contains__(self, key):
+        if not (isinstance(key[0], int) and isinstance(key[1], int)):
+            raise ValueError("Arguments must be integers (found %s, %s)" % (key[0], key[1]))
+
+        return 0 <= key[0] < self._height and 0 <= key[1] < self._width
+
+    def __iter__(self):
+        height, width = self._height, self._width
+
+        return (Square(self, row, col) for row in range(height) for col in range(width))
+
+    def square(self, row, col):
+        if (row, col) not in self:
+            raise IndexError("%d, %d coordinates are out of range" % (row, col))
+
+        return Square(self, row, col)
+
+    def height(self):
+        return self._height
+
+    def width(self):
+        return self._width
+
+    def chunks_count(self):
+        """
+        :return: the number of chunks currently stored, i.e. those where at least one square was modified.
+        """
+        return len(self._chunks)
+
+    def version(self):
+        return self._version
+
+    changes = Board.changes
+    _changed = Board._changed
+    atomic = Board.atomic
+    save = Board.save
+
+    def _to_binary(self):
+        """
+        :return: the binary representation of the board written by Board.save(), which Board.load() reads back as a
+            Board. The seed is left out, as it determines the mines of a ChunkedBoard only.
+        """
+        size = self._chunk_size
+        mines, states = bytearray(), bytearray()
+
+        for row in range(self._height):
+            chunk_row, start = row // size, (row % size) * size
+
+            for chunk_col in range(-(-self._width // size)):
+                chunk = self._chunks.get((chunk_row, chunk_col))
+                mines += self._chunk_mines((chunk_row, chunk_col))[start:start + size]
+                states += chunk.states[start:start + size] if chunk else bytes(size)
+
+            del mines[(row + 1) * self._width:], states[(row + 1) * self._width:]
+
+        header = Board._FILE_HEADER.pack(Board.FILE_MAGIC, Board.FILE_VERSION, 0, 0, self._height, self._width,
+                                         mines.count(1), 0, self._version)
+
+        return [header, _pack_plane(mines, 0), _pack_plane(states, 0), _pack_plane(states, 1)]
+
+    def mines_count(self):
+        """
+        :return: the number of mined squares of the board. The first call visits every chunk, generating the mines of
+            those which are not stored.
+        """
+        with self._lock.read():
+            return self._count_mines()
+
+    def _count_mines(self):
+        if self._mines_count is None:
+            size = self._chunk_size
+            self._mines_count = sum(self._chunk_mines((chunk_row, chunk_col)).count(1)
+                                    for chunk_row in range(-(-self._height // size))
+                                    for chunk_col in range(-(-self._width // size)))
+
+        return self._mines_count
+
+    def dug_count(self):
+        return self._dug_count
+
+    def flagged_count(self):
+        return self._flagged_count
+
+    def safe_remaining(self):
+        """
+        :return: the number of squares without a bomb which are not dug yet.
+        """
+        with self._lock.read():
+            return len(self) - self._count_mines() - (self._dug_count - self._dug_mines_count)
+
+    def is_won(self):
+        return self.safe_remaining() == 0
+
+    def _count_change(self, chunk, index, old, new):
+        """
+        Update the squares counters for the state of the square at **index** of **chunk** changing from code **old**
+        to code **new**.
+        """
+        for code, delta in ((old, -1), (new, 1)):
+            if code == _DUG:
+                self._dug_count += delta
+                self._dug_mines_count += delta * chunk.mines[index]
+            elif code == _FLAGGED:
+                self._flagged_count += delta
+
+    def snapshot(self):
+        """
+        :return: a BoardSnapshot of the current version of the board, as Board.snapshot() does.
+        """
+        snapshot = self._snapshot
+
+        if snapshot is not None and snapshot.version == self._version:
+            return snapshot
+
+        with self._lock.read():
+            with self._render_lock:
+                snapshot = self._snapshot
+
+                if snapshot is None:
+                    rows = [None] * self._height
+                    header = _header_line(self._height, self._width)
+                elif snapshot.version != self._version:
+                    rows = list(snapshot.rows)
+                    header = snapshot.header
+                else:
+                    return snapshot
+
+                for row in range(self._height) if self._dirty_rows is None else self._dirty_rows:
+                    rows[row] = self._render_row(row)
+
+                self._dirty_rows = set()
+                self._snapshot = snapshot = BoardSnapshot(self._version, header, tuple(rows))
+
+                return snapshot
+
+    def _render_row(self, row):
+        size = self._chunk_size
+        chunk_row, start = row // size, (row % size) * size
+        empty = bytes(size)
+        counts, mines, states = list(), list(), list()
+
+        for chunk_col in range(-(-self._width // size)):
+            chunk = self._chunks.get((chunk_row, chunk_col))
+
+            # Squares of a chunk which is not stored are untouched, and are rendered the same regardless of their mines
+            counts.append(chunk.counts[start:start + size] if chunk else empty)
+            mines.append(chunk.mines[start:start + size] if chunk else empty)
+            states.append(chunk.states[start:start + size] if chunk else empty)
+
+        return _row_line(row, self._height, *(b"".join(buffer)[:self._width] for buffer in (counts, mines, states)))
+
+    def set_state(self, row, col, state):
+        """
+        Set the state of a square indicated by (row, col) to state, digging its neighbours as Board.set_state() does.
+        Squares are dug across chunk boundaries, storing every chunk reached.
+
+        :return: the set of (row, col) coordinates of the squares whose state was changed by this call.
+        """
+        if (row, col) not in self:
+            raise ValueError("%d, %d coordinates are out of range" % (row, col))
+
+        with self._lock.write():
+            chunk, index = self._locate(row, col)
+            code = _STATE_CODES[state]
+            changed = {(row, col)} if chunk.states[index] != code else set()
+
+            if changed:
+                self._count_change(chunk, index, chunk.states[index], code)
+                chunk.states[index] = code
+                self._mark_dirty(row)
+
+            if state == State.DUG and not chunk.mines[index] and chunk.counts[index] == 0:
+                changed.update(self._reveal(row, col))
+            if changed:
+                self._changed(changed)
+
+            return changed
+
+    def _reveal(self, row, col):
+        """
+        Digs the neighbourhood of the already dug, mine-free (row, col) square, which is expected to have no adjacent
+        mines, spreading to every not yet dug square with no adjacent mines reached along the way.
+
+        :return: the set of (row, col) coordinates of the squares that were dug.
+        """
+        height, width = self._height, self._width
+        pending = [(row, col)]
+        changed = set()
+
+        while pending:
+            row, col = pending.pop()
+
+            for x in range(max(row - 1, 0), min(row + 2, height)):
+                for y in range(max(col - 1, 0), min(col + 2, width)):
+                    chunk, index = self._locate(x, y)
+
+                    if chunk.states[index] != _DUG:
+                        self._count_change(chunk, index, chunk.states[index], _DUG)
+                        chunk.states[index] = _DUG
+                        changed.add((x, y))
+                        self._mark_dirty(x)
+
+                        if chunk.counts[index] == 0 and not chunk.mines[index]:
+                            pending.append((x, y))
+
+        return changed
+
+    def chord(self, row, col):
+        """
+        Dig every untouched neighbour of the dug (row, col) square, as Board.chord() does, across chunk boundaries.
+
+        :return: the set of (row, col) coordinates of the squares whose state was changed by this call.
+        """
+        if (row, col) not in self:
+            raise ValueError("%d, %d coordinates are out of range" % (row, col))
+
+        with self._lock.write():
+            neighbors = [(n.row, n.col) for n in self.neighbors(row, col)]
+            changed = set()
+
+            if self._square_state(row, col) != State.DUG or \
+                    [self._square_state(*n) for n in neighbors].count(State.FLAGGED) != self.adjacent_mines(row, col):
+                return changed
+
+            for x, y in neighbors:
+                chunk, index = self._locate(x, y)
+
+                if chunk.states[index] == _UNTOUCHED:
+                    self._count_change(chunk, index, _UNTOUCHED, _DUG)
+                    chunk.states[index] = _DUG
+                    self._mark_dirty(x)
+                    changed.add((x, y))
+
+            for x, y in list(changed):
+                chunk, index = self._locate(x, y)
+
+                if not chunk.mines[index] and chunk.counts[index] == 0:
+                    changed.update(self._reveal(x, y))
+
+            if changed:
+                self._changed(changed)
+
+            return changed
+
+    def toggle_dug(self, toggles=1):
+        """
+        Switches the state of every square between UNTOUCHED and DUG, as Board.toggle_dug() does, storing every chunk.
+        This method is primarily used for debug purposes.
+        """
+        size = self._chunk_size
+
+        with self._lock.write():
+            for chunk_row in range(-(-self._height // size)):
+                for chunk_col in range(-(-self._width // size)):
+                    chunk, index = self._locate(chunk_row * size, chunk_col * size)
+                    # Squares of the chunk falling outside of the board are never dug
+                    rows, cols = min(size, self._height - chunk_row * size), min(size, self._width - chunk_col * size)
+
+                    for row in range(rows):
+                        start = row * size
+
+                        for i in range(toggles):
+                            chunk.states[start:start + cols] = chunk.states[start:start + cols].translate(_TOGGLE_DUG)
+
+            self._dug_count = sum(c.states.count(_DUG) for c in self._chunks.values())
+            self._flagged_count = sum(c.states.count(_FLAGGED) for c in self._chunks.values())
+            self._dug_mines_count = sum((int.from_bytes(c.states, "little") &
+                                         int.from_bytes(c.mines, "little") << 1).bit_count()
+                                        for c in self._chunks.values())
+            self._dirty_rows = None
+            self._changed(None)
+
+    def neighbors(self, row, col):
+        return [Square(self, x, y)
+                for x in range(max(row - 1, 0), min(row + 2, self._height))
+                for y in range(max(col - 1, 0), min(col + 2, self._width))
+                if (x, y) != (row, col)]
+
+    def adjacent_mines(self, row, col):
+        size = self._chunk_size
+        chunk = self._chunks.get((row // size, col // size))
+
+        if chunk is not None:
+            return chunk.counts[(row % size) * size + col % size]
+
+        return len([n for n in self.neighbors(row, col) if n.has_bomb])
+
+    def _has_bomb(self, row, col):
+        size = self._chunk_size
+
+        return self._chunk_mines((row // size, col // size))[(row % size) * size + col % size] == 1
+
+    def _set_bomb(self, row, col, has_bomb):
+        """
+        Add or remove the mine of the (row, col) square, updating the adjacent mines count of its neighbours which lie
+        in stored chunks. The counts of chunks stored later are computed from the updated mines.
+        """
+        size = self._chunk_size
+
+        with self._lock.write():
+            chunk, index = self._locate(row, col)
+
+            if chunk.mines[index] != bool(has_bomb):
+                chunk.mines[index] = bool(has_bomb)
+                delta = 1 if has_bomb else -1
+
+                if self._mines_count is not None:
+                    self._mines_count += delta
+                if chunk.states[index] == _DUG:
+                    self._dug_mines_count += delta
+
+                for n in self.neighbors(row, col):
+                    neighbor = self._chunks.get((n.row // size, n.col // size))
+
+                    if neighbor is not None:
+                        neighbor.counts[(n.row % size) * size + n.col % size] += delta
+
+                for x in range(max(row - 1, 0), min(row + 2, self._height)):
+                    self._mark_dirty(x)
+
+                self._changed([(row, col)] + [(n.row, n.col) for n in self.neighbors(row, col)])
+
+    def _square_state(self, row, col):
+        size = self._chunk_size
+        chunk = self._chunks.get((row // size, col // size))
+
+        return _STATES[chunk.states[(row % size) * size + col % size]] if chunk else State.UNTOUCHED
+
+    def _set_square_state(self, row, col, state):
+        with self._lock.write():
+            chunk, index = self._locate(row, col)
+
+            if chunk.states[index] != _STATE_CODES[state]:
+                self._count_change(chunk, index, chunk.states[index], _STATE_CODES[state])
+                chunk.states[index] = _STATE_CODES[state]
+                self._mark_dirty(row)
+                self._changed([(row, col)])
+
+    def _mark_dirty(self, row):
+        if self._dirty_rows is not None:
+            self._dirty_rows.add(row)
+
+    def _locate(self, row, col):
+        """
+        :return: a (chunk, index) tuple, where chunk is the stored chunk containing the (row, col) square, created if
+            needed, and index is the index of the square within the chunk buffers.
+        """
+        size = self._chunk_size
+        key = (row // size, col // size)
+        chunk = self._chunks.get(key)
+
+        if chunk is None:
+            mines = bytearray(self._chunk_mines(key))
+            chunk = self._chunks[key] = _Chunk(mines, self._chunk_counts(key, mines))
+
+            with self._generated_lock:
+                self._generated.pop(key, None)
+
+        return chunk, (row % size) * size + col % size
+
+    def _chunk_mines(self, key):
+        """
+        :return: the mines of the chunk at **key**: those of the stored chunk if there is one, the generated ones
+            otherwise, or no mines at all if the chunk lies outside of the board.
+        """
+        chunk = self._chunks.get(key)
+
+        if chunk is not None:
+            return chunk.mines
+
+        size = self._chunk_size
+
+        if not (0 <= key[0] * size < self._height and 0 <= key[1] * size < self._width):
+            return bytes(size * size)
+
+        with self._generated_lock:
+            mines = self._generated.get(key)
+
+            if mines is not None:
+                self._generated.move_to_end(key)
+                return mines
+
+        mines = self._generate_mines(key)
+
+        with self._generated_lock:
+            self._generated[key] = mines
+
+            while len(self._generated) > self.GENERATED_CACHE_SIZE:
+                self._generated.popitem(False)
+
+        return mines
+
+    def _generate_mines(self, key):
+        """
+        :return: the mines of the chunk at **key** as a function of the board seed and key only.
+        """
+        size = self._chunk_size
+        random = Random("%d:%d:%d" % (self.seed, key[0], key[1]))
+        mines = bytearray(random.randbytes(size * size).translate(self._mines_table))
+        # Squares of the chunk falling outside of the board
+        rows, cols = min(size, self._height - key[0] * size), min(size, self._width - key[1] * size)
+
+        if cols < size:
+            for row in range(rows):
+                mines[row * size + cols:(row + 1) * size] = bytes(size - cols)
+
+        mines[rows * size:] = bytes((size - rows) * size)
+
+        return bytes(mines)
+
+    def _chunk_counts(self, key, mines):
+        """
+        :return: a bytearray with the adjacent mines counts of the squares of the chunk at **key**, whose mines are
+            **mines**. Each row of counts is computed at once, by summing byte-wise the mines of the three rows around
+            it, padded with the border squares of the neighbouring chunks.
+        """
+        size = self._chunk_size
+        chunk_row, chunk_col = key
+        neighbors = {(x, y): mines if (x, y) == (0, 0) else self._chunk_mines((chunk_row + x, chunk_col + y))
+                     for x in (-1, 0, 1) for y in (-1, 0, 1)}
+        center_mask = (1 << (8 * size)) - 1
+
+        def padded_row(row):
+            """
+            :return: the mines of the chunk-relative **row**, which may lie in the chunks above or below, as an int
+                with one byte per square and an additional square on each side.
+            """
+            x, row = (-1, size - 1) if row < 0 else (1, 0) if row >= size else (0, row)
+            start = row * size
+            line = neighbors[(x, -1)][start + size - 1:start + size] + \
+                neighbors[(x, 0)][start:start + size] + \
+                neighbors[(x, 1)][start:start + 1]
+
+            return int.from_bytes(line, "little")
+
+        padded = [padded_row(row) for row in range(-1, size + 1)]
+        # Sums of three horizontally consecutive squares, centered on every square of the chunk
+        triples = [(p + (p >> 8) + (p >> 16)) & center_mask for p in padded]
+        counts = bytearray()
+
+        for row in range(size):
+            total = triples[row] + triples[row + 1] + triples[row + 2] - ((padded[row + 1] >> 8) & center_mask)
+            counts += total.to_bytes(size, "little")
+
+        return counts
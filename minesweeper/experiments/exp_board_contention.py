@@ -0,0 +1,68 @@
+from concurrent.futures import ThreadPoolExecutor, wait, ALL_COMPLETED
+from random import randrange
+from time import perf_counter
+
+from minesweeper.board import Board, State
+
+
+def look(board, times):
+    """
+    :return: the list of the latencies, in seconds, of **times** renderings of board.
+    """
+    latencies = list()
+
+    for i in range(times):
+        start = perf_counter()
+        str(board)
+        latencies.append(perf_counter() - start)
+
+    return latencies
+
+
+def dig(board, times):
+    for i in range(times):
+        board.set_state(randrange(board.height()), randrange(board.width()),
+                        State.FLAGGED if i % 2 else State.UNTOUCHED)
+
+
+def run(board, configs):
+    executor = ThreadPoolExecutor(configs["lookers"] + configs["diggers"])
+    start = perf_counter()
+    lookers = [executor.submit(look, board, configs["looks"]) for i in range(configs["lookers"])]
+    diggers = [executor.submit(dig, board, configs["digs"]) for i in range(configs["diggers"])]
+
+    wait(lookers + diggers, None, ALL_COMPLETED)
+    elapsed = perf_counter() - start
+    latencies = sorted(latency for future in lookers for latency in future.result())
+    executor.shutdown()
+
+    return elapsed, sum(latencies) / len(latencies), latencies[int(len(latencies) * 0.99)]
+
+
+def main():
+    """
+    Measures the throughput of a Board shared by threads rendering it and threads mutating it, first with renderings
+    holding the board lock for reading (the Board behaviour), then with renderings holding it exclusively, as when
+    Board was synchronized through a single RLock.
+    """
+    configs = {
+        "size": 300,
+        "lookers": 8,
+        "diggers": 4,
+        "looks": 200,
+        "digs": 2000,
+    }
+
+    for mode in ("shared", "exclusive"):
+        board = Board.create_from_probability(configs["size"], configs["size"], 0.15)
+
+        if mode == "exclusive":
+            board._lock.read = board._lock.write
+
+        elapsed, mean, p99 = run(board, configs)
+        print("%-9s reads: %.3f s elapsed, look latency mean %.2f ms, p99 %.2f ms" %
+              (mode, elapsed, mean * 1000, p99 * 1000))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,43 @@
+from concurrent.futures import ProcessPoolExecutor
+from time import perf_counter
+
+from minesweeper.board import Board
+from minesweeper.solver import solve
+
+
+def screen(difficulty, seeds):
+    """
+    :return: the number of boards, among those created from **seeds**, which can be solved by logic alone.
+    """
+    return sum(solve(Board.create_from_difficulty(difficulty, seed)) for seed in seeds)
+
+
+def main():
+    """
+    Measures how many candidate boards per second the solver screens, in a single process and across a process pool,
+    and which fraction of them could be handed out as no-guess boards.
+    """
+    configs = {
+        "boards": 2000,
+        "batch": 50,
+        "workers": None,
+    }
+
+    for name, difficulty in (("easy", Board.DIFF_EASY), ("intermediate", Board.DIFF_INTERMEDIATE),
+                             ("hard", Board.DIFF_HARD)):
+        start = perf_counter()
+        screen(difficulty, range(configs["boards"] // 10))
+        single = configs["boards"] // 10 / (perf_counter() - start)
+
+        with ProcessPoolExecutor(configs["workers"]) as executor:
+            start = perf_counter()
+            batches = [range(i, i + configs["batch"]) for i in range(0, configs["boards"], configs["batch"])]
+            solvable = sum(executor.map(screen, [difficulty] * len(batches), batches))
+            pooled = configs["boards"] / (perf_counter() - start)
+
+        print("%-12s %7.1f boards/s in one process, %7.1f boards/s in the pool, %4.1f%% solvable" %
+              (name, single, pooled, solvable / configs["boards"] * 100))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,142 @@
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from random import Random, getrandbits
+from threading import Lock
+
+from minesweeper import solver
+from minesweeper.board import Board
+
+
+def _generate(difficulty, seed, no_guess=False):
+    """
+    Run in the worker processes: boards are sent back in the binary format of Board.save(), as Board instances hold
+    locks and cannot be pickled.
+
+    :return: the binary representation of a new board created from **difficulty** and **seed**, with
+        solver.create_no_guess() if **no_guess** is True.
+    """
+    if no_guess:
+        return b"".join(solver.create_no_guess(difficulty, seed)._to_binary())
+
+    return b"".join(Board.create_from_difficulty(difficulty, seed)._to_binary())
+
+
+class BoardGenerator:
+    """
+    Generates boards in the background with a pool of processes, so that new games can be handed a ready board at
+    once. For the difficulties the generator is configured with, the standard ones by default, a bounded queue of
+    boards is kept, being generated or ready, and a new board is requested as soon as one is taken. Boards of any
+    other difficulty are generated in the pool when requested, with no board queued in their place, so that arbitrary
+    difficulties never leave work or memory behind.
+
+    Boards are deterministic: the n-th board taken for a queued difficulty is created from a seed which only depends on
+    the generator seed, the difficulty and n, and so is the n-th board taken for any other difficulty, n counting the
+    boards of all of them. In no-guess mode, boards are only handed out if they can be solved by logic
+    alone (see solver.create_no_guess()), the candidate boards being screened by the worker processes.
+
+    Thread safety argument:\n
+    The queues and the counts of the boards requested for each difficulty are guarded by self._lock. Boards are built
+    in other processes, and only handed to the calling thread once complete.
+    """
+
+    DEFAULT_CONFIGS = {
+        "queue_size": 4,
+        "difficulties": (Board.DIFF_EASY, Board.DIFF_INTERMEDIATE, Board.DIFF_HARD),
+    }
+
+    def __init__(self, seed=None, queue_size=DEFAULT_CONFIGS["queue_size"],
+                 difficulties=DEFAULT_CONFIGS["difficulties"], workers=None, no_guess=False):
+        """
+        :param seed: an int determining the boards generated. A random seed is chosen if None.
+        :param queue_size: number of boards kept queued for each difficulty.
+        :param difficulties: the difficulties whose boards are queued.
+        :param workers: number of processes generating boards, the number of processors if None.
+        :param no_guess: True to generate boards which can be solved without guessing.
+        """
+        # Set until the pool is started, so that __del__() does not close a generator which failed to initialize
+        self.is_closed = True
+
+        if queue_size <= 0:
+            raise ValueError("The queue size must be greater than 0 (found %d)" % queue_size)
+
+        difficulties = [Board.check_difficulty(difficulty) for difficulty in difficulties]
+        self.seed = getrandbits(64) if seed is None else seed
+        self.queue_size = queue_size
+        self.no_guess = no_guess
+
+        self._executor = ProcessPoolExecutor(workers)
+        self._lock = Lock()
+        self._queues = {difficulty: deque() for difficulty in difficulties}
+        self._requested = dict.fromkeys(difficulties, 0)
+        # Number of boards of difficulties with no queue requested
+        self._unqueued = 0
+        self.is_closed = False
+
+        with self._lock:
+            for difficulty in difficulties:
+                self._fill(difficulty)
+
+    def __repr__(self):
+        return "<'%s.%s' object, seed=%d, queue_size=%d, difficulties=%s>" % \
+               (self.__class__.__module__, self.__class__.__name__, self.seed, self.queue_size,
+                list(self._queues.keys()))
+
+    def __del__(self):
+        if not self.is_closed:
+            self.close()
+
+    def close(self):
+        if not self.is_closed:
+            self._executor.shutdown(False, cancel_futures=True)
+            self.is_closed = True
+
+    def board_seed(self, difficulty, n):
+        """
+        :return: the seed of the **n**-th board generated for **difficulty**, counting from 0. In no-guess mode, the
+            seeds of the candidate boards are derived from it.
+        """
+        return Random("%d:%d:%d:%d:%d" % (self.seed, *difficulty, n)).getrandbits(64)
+
+    def board(self, difficulty=Board.DIFF_EASY):
+        """
+        Take the next board of **difficulty** from its queue, waiting for it only if it is not generated yet, and
+        request a new one in its place. Boards of difficulties with no queue are generated on the spot.
+
+        :param difficulty: a (height, width, mines) tuple, as the Board.DIFF_* constants.
+        :return: a new Board instance.
+        :raise: ValueError if no board can be created from **difficulty**.
+        """
+        difficulty = Board.check_difficulty(difficulty)
+
+        if self.is_closed:
+            raise RuntimeError("Cannot take a board from a closed generator")
+
+        with self._lock:
+            if difficulty in self._queues:
+                future = self._queues[difficulty].popleft()
+                self._fill(difficulty)
+            else:
+                future = self._executor.submit(_generate, difficulty, self.board_seed(difficulty, self._unqueued),
+                                               self.no_guess)
+                self._unqueued += 1
+
+        return Board._from_binary(future.result())
+
+    def queued(self, difficulty):
+        """
+        :return: the number of boards of **difficulty** which are ready to be taken.
+        """
+        with self._lock:
+            return len([f for f in self._queues.get(tuple(difficulty), ()) if f.done()])
+
+    def _fill(self, difficulty):
+        """
+        Request boards of **difficulty**, a queued difficulty, until its queue is full. Must be called holding
+        self._lock.
+        """
+        queue = self._queues[difficulty]
+
+        while len(queue) < self.queue_size:
+            n = self._requested[difficulty]
+            queue.append(self._executor.submit(_generate, difficulty, self.board_seed(difficulty, n), self.no_guess))
+            self._requested[difficulty] = n + 1
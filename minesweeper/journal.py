@@ -0,0 +1,273 @@
+from os import fsync, path as os_path, replace
+from threading import Condition, Lock, Thread
+
+from minesweeper.board import Board, State
+
+DIG, FLAG, DEFLAG, CHORD = "dig", "flag", "deflag", "chord"
+
+
+def play(board, move, row, col):
+    """
+    Apply a move to board, as the server does in reply to a client message: digging a square removes its mine, if
+    any, deflagging a square only changes it if it is flagged, and chording a square (see Board.chord()) removes the
+    mines of the neighbours it digs.
+
+    :param move: one of DIG, FLAG, DEFLAG and CHORD.
+    :return: True if a mined square was dug, False otherwise.
+    """
+    if move == DIG:
+        board.set_state(row, col, State.DUG)
+        square = board.square(row, col)
+
+        if square.has_bomb:
+            square.has_bomb = False
+            return True
+    elif move == FLAG:
+        board.set_state(row, col, State.FLAGGED)
+    elif move == DEFLAG:
+        if board.square(row, col).state == State.FLAGGED:
+            board.set_state(row, col, State.UNTOUCHED)
+    elif move == CHORD:
+        boom = False
+
+        if board.chord(row, col):
+            for square in board.neighbors(row, col):
+                if square.has_bomb and square.state == State.DUG:
+                    square.has_bomb = False
+                    boom = True
+
+        return boom
+    else:
+        raise ValueError("Unknown move '%s'" % move)
+
+    return False
+
+
+class Journal:
+    """
+    An append-only journal of the moves played on a board, from which the board can be rebuilt after a crash.
+
+    The journal is made of two files: a snapshot of the board, in the format written by Board.save(), at **path** +
+    ".snapshot", and the moves played after it at **path**, one "<version> <move> <row> <col>" line each, where version
+    is the version of the board after the move. Every compact_every moves a new snapshot is taken in the background,
+    and the moves it covers, i.e. those with a version not greater than its own, are dropped from the journal. A
+    crash between the two steps leaves moves which are skipped at recovery.
+
+    A new journal first writes the snapshot of its board to **path** + ".snapshot.new", then empties the journal and
+    finally renames the new snapshot in place, so that a crash never leaves the moves of a former board next to the
+    snapshot of the new one: a new snapshot found at recovery is the one of a journal with no moves yet.
+
+    Moves are written with group commit: a move is durable once the journal has been flushed to disk after it was
+    appended, so the first thread waiting for a move writes and flushes the moves appended by all the other threads as
+    well, which in the meantime just wait for it to complete. Under load, many moves share a single fsync.
+
+    Thread safety argument:\n
+    Moves are applied and appended to the journal while holding the board lock for writing, see play(), so that their
+    order in the journal is the order in which they were applied. The pending moves, the sequence numbers and the
+    journal file are guarded by self._condition. The file is only written by the thread which set self._flushing,
+    without holding self._condition, or by compact() after waiting for self._flushing to be cleared. Compactions are
+    serialized by self._compaction_lock.
+    """
+
+    DEFAULT_CONFIGS = {
+        "compact_every": 10000,
+    }
+
+    def __init__(self, path, board=None, compact_every=DEFAULT_CONFIGS["compact_every"]):
+        """
+        :param path: path of the journal file.
+        :param board: the board to play moves on, starting a new journal for it. If None, the board is rebuilt from
+            the snapshot and the moves of an existing journal, see exists().
+        :param compact_every: number of moves after which the journal is compacted.
+        """
+        self.path = path
+        self.snapshot_path = path + ".snapshot"
+        self.new_snapshot_path = self.snapshot_path + ".new"
+        self.compact_every = compact_every
+        # Number of times the journal was flushed to disk
+        self.flushes = 0
+
+        self._condition = Condition(Lock())
+        self._compaction_lock = Lock()
+        self._pending = list()
+        self._appended = self._durable = 0
+        self._flushing = False
+
+        if board is None:
+            self.board = self._recover()
+        else:
+            self.board = board
+            board.save(self.new_snapshot_path)
+            self._start()
+
+        self._file = open(path, "ab")
+
+    def __repr__(self):
+        return "<'%s.%s' object, path=%s, appended=%d, durable=%d>" % \
+               (self.__class__.__module__, self.__class__.__name__, self.path, self._appended, self._durable)
+
+    @staticmethod
+    def exists(path):
+        """
+        :return: True if a journal, from which a board can be recovered, exists at **path**.
+        """
+        return os_path.exists(path + ".snapshot") or os_path.exists(path + ".snapshot.new")
+
+    def play(self, move, row, col):
+        """
+        Apply a move to the board and append it to the journal, returning once it is durable.
+
+        :return: the same as the play() function.
+        """
+        return self.play_all([(move, row, col)])[0]
+
+    def play_all(self, moves):
+        """
+        Apply a sequence of moves to the board and append them to the journal, holding the board lock once for all of
+        them and returning once they are all durable. The moves following one which digs a mined square are dropped.
+
+        :param moves: an iterable of (move, row, col) tuples.
+        :return: the list of the results of the play() function for the moves applied.
+        """
+        results = list()
+
+        with self.board.atomic():
+            for move in moves:
+                results.append(play(self.board, *move))
+                ticket = self._append(*move)
+
+                if results[-1]:
+                    break
+
+        if results:
+            self.commit(ticket)
+
+            if (ticket - len(results)) // self.compact_every != ticket // self.compact_every:
+                Thread(target=self.compact, daemon=True).start()
+
+        return results
+
+    def _append(self, move, row, col):
+        """
+        :return: the sequence number of the appended move, to be passed to commit().
+        """
+        record = ("%d %s %d %d\n" % (self.board.version(), move, row, col)).encode()
+
+        with self._condition:
+            self._pending.append(record)
+            self._appended += 1
+
+            return self._appended
+
+    def commit(self, ticket):
+        """
+        Wait until the move with sequence number **ticket**, and all the moves appended before it, are durable.
+        """
+        with self._condition:
+            while self._durable < ticket:
+                if self._flushing:
+                    self._condition.wait()
+                    continue
+
+                records, last = self._pending, self._appended
+                self._pending = list()
+                self._flushing = True
+                self._condition.release()
+
+                try:
+                    self._file.write(b"".join(records))
+                    self._file.flush()
+                    fsync(self._file.fileno())
+                finally:
+                    self._condition.acquire()
+                    self._flushing = False
+                    self._condition.notify_all()
+
+                self._durable = last
+                self.flushes += 1
+
+    def compact(self):
+        """
+        Save a new snapshot of the board, and drop the moves it covers from the journal.
+        """
+        with self._compaction_lock:
+            if self._file.closed:
+                return
+
+            version = self.board.save(self.snapshot_path)
+
+            with self._condition:
+                while self._flushing:
+                    self._condition.wait()
+
+                self._file.close()
+
+                with open(self.path, "rb") as f:
+                    records = [r for r in f if int(r.split(b" ", 1)[0]) > version]
+                with open(self.path + ".tmp", "wb") as f:
+                    f.writelines(records)
+                    f.flush()
+                    fsync(f.fileno())
+
+                replace(self.path + ".tmp", self.path)
+                self._file = open(self.path, "ab")
+
+    def close(self):
+        """
+        Flush the pending moves and close the journal file.
+        """
+        self.commit(self._appended)
+
+        with self._compaction_lock:
+            self._file.close()
+
+    def _start(self):
+        """
+        Empty the journal, then replace the snapshot with the new one, already written to self.new_snapshot_path.
+        """
+        with open(self.path, "wb") as f:
+            fsync(f.fileno())
+
+        replace(self.new_snapshot_path, self.snapshot_path)
+
+    def _recover(self):
+        """
+        :return: the board rebuilt from the snapshot and the moves of the journal. A last, incomplete move, left by a
+            crash while writing it, is discarded, and a new journal left incomplete by a crash is completed.
+        """
+        if os_path.exists(self.new_snapshot_path):
+            self._start()
+
+        board = Board.load(self.snapshot_path)
+        end = 0
+
+        if not os_path.exists(self.path):
+            return board
+
+        with open(self.path, "rb") as f:
+            for record in f:
+                if not record.endswith(b"\n"):
+                    break
+
+                try:
+                    version, move, row, col = record.decode().split(" ")
+                    version, row, col = int(version), int(row), int(col)
+                except ValueError:
+                    raise ValueError("'%s' contains an invalid record at byte %d: %s" % (self.path, end, record))
+
+                if version > board.version():
+                    play(board, move, row, col)
+
+                    if board.version() != version:
+                        raise ValueError("'%s' does not match its snapshot: found version %d after the record at byte "
+                                         "%d, expected %d" % (self.path, board.version(), end, version))
+
+                end += len(record)
+
+            f.seek(0, 2)
+
+            if f.tell() != end:
+                with open(self.path, "r+b") as torn:
+                    torn.truncate(end)
+
+        return board
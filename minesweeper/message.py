@@ -2,46 +2,86 @@
 
 class Message(object):
 
+    __slots__ = ()
+
     def get_representation(self):
         raise NotImplementedError()
 
+    def encode(self):
+        """
+        :return: the list of the bytes objects the representation of the message is encoded into, to be sent in order.
+        """
+        return [self.get_representation().encode()]
+
     def __str__(self):
         return self.get_representation()
 
 
+def _parse_int(string):
+    """
+    :return: int(**string**), or None if **string** is not an integer literal int() accepts, found without raising
+        and catching an exception.
+    """
+    digits = string.strip()
+
+    if digits[:1] in ("+", "-"):
+        digits = digits[1:]
+    # int() accepts single underscores between digits as well
+    if not digits.replace("_", "").isdecimal() or digits[0] == "_" or digits[-1] == "_" or "__" in digits:
+        return None
+
+    return int(string)
+
+
+def _parse_coordinates(factory_string, prefix):
+    """
+    :return: the (row, col) tuple of a "<prefix> <row> <col>" string, or None if **factory_string** is not one.
+    """
+    components = factory_string.split(" ")
+
+    if len(components) < 3 or components[0] != prefix:
+        return None
+
+    row, col = _parse_int(components[1]), _parse_int(components[2])
+
+    return None if row is None or col is None else (row, col)
+
+
 class UTSMessage(Message):
     """
     A UTSMessage (User-To-Server message) is a superclass for all those classes representing
     a message from the client to the server.
     """
 
+    __slots__ = ()
+
     message_types = ()  # Assigned at the bottom of the file
+    # First words of the strings a concrete class parses, by which parse_infer_type() dispatches to it
+    KEYWORDS = ()
+    # Concrete classes by keyword, assigned at the bottom of the file
+    _parsers = {}
 
     @staticmethod
     def parse_infer_type(raw_input):
         """
-        Takes a raw_input string and returns the first concrete UTSMessage instance where raw_input
+        Takes a raw_input string and returns the concrete UTSMessage instance for which raw_input
         was a valid string for static instantiation.
 
         :param raw_input: string to feed into a factory method.
         :return: object of a concrete UTSMessage class, or an instance of UTSInvalidMessage if the method fails
             (e.g. raw_input is "invalid").
         """
-        result = None
+        string = raw_input.strip()
+        message_type = UTSMessage._parsers.get(string.partition(" ")[0])
 
-        for i in UTSMessage.message_types:
-            try:
-                result = i.parse(raw_input)
+        # Any string ending with "look" is a look request, whatever its first word, but for batches: their commands are
+        # parsed one by one, and a batched look is rejected as not batchable rather than replacing the whole batch
+        if message_type is not UTSBatchMessage and string.endswith(UTSLookMessage.REPR):
+            return UTSLookMessage()
 
-                if result is not None:
-                    break
-            except Exception:
-                continue
+        result = message_type._match(string) if message_type is not None else None
 
-        if result is None:
-            result = UTSInvalidMessage.parse(raw_input)
-
-        return result
+        return result if result is not None else UTSInvalidMessage(string)
 
     @classmethod
     def parse(cls, raw_input):
@@ -54,6 +94,20 @@ class UTSMessage(Message):
 
         :param factory_string: string to construct a new object from.
         :return: a new instance whose class is a subtype of UTSMessage.
+        :raise: ValueError in case factory_string does not comply to the grammar.
+        """
+        result = cls._match(factory_string)
+
+        if result is None:
+            raise ValueError("Expected a %s message, found %s" % (cls.__name__, factory_string))
+
+        return result
+
+    @classmethod
+    def _match(cls, factory_string):
+        """
+        :param factory_string: a stripped string.
+        :return: a new instance of the class if factory_string complies to its grammar, None otherwise.
         """
         raise NotImplementedError()
 
@@ -70,15 +124,14 @@ class UTSMessage(Message):
 
 
 class UTSLookMessage(UTSMessage):
+
+    __slots__ = ()
+
     REPR = "look"
 
     @classmethod
-    def _message_factory(cls, factory_string):
-        if factory_string.endswith(UTSLookMessage.REPR, 0):
-            return UTSLookMessage()
-        else:
-            raise ValueError("required \"%s\", found \"%s\"" %
-                             (UTSLookMessage.REPR, factory_string))
+    def _match(cls, factory_string):
+        return cls() if factory_string.endswith(cls.REPR) else None
 
     def find_errors(self, board):
         return None
@@ -89,7 +142,10 @@ class UTSLookMessage(UTSMessage):
 
 class UTSDigMessage(UTSMessage):
 
+    __slots__ = ("row", "col")
+
     REPR_PREFIX = "dig"
+    KEYWORDS = (REPR_PREFIX, )
     ERROR_OUT_OF_BOUNDS = "Error. The coordinates %d, %d are not contained within the board."
 
     def __init__(self, row, col):
@@ -97,21 +153,17 @@ class UTSDigMessage(UTSMessage):
         self.col = col
 
     @classmethod
-    def _message_factory(cls, factory_string):
+    def _match(cls, factory_string):
         """
         Creates a new instance of UTSDigMessage from factory_string.
 
         :param factory_string: a string of the form "dig <space> [0-9]+ <space> [0-9]+". <space> refers to a single space only.
-        :return: an UTSDigMessage instance created according to the method arguments.
-        :raise: ValueError in case factory_string does not comply to the grammar.
+        :return: an UTSDigMessage instance created according to the method arguments, or None in case factory_string
+            does not comply to the grammar.
         """
-        components = factory_string.split(" ")
-        x, y = int(components[1]), int(components[2])
-
-        if cls.REPR_PREFIX != components[0]:
-            raise ValueError("Expected %s, found %s" % (cls.REPR_PREFIX, components[0]))
+        coordinates = _parse_coordinates(factory_string, cls.REPR_PREFIX)
 
-        return UTSDigMessage(x, y)
+        return cls(*coordinates) if coordinates is not None else None
 
     def get_representation(self):
         return "%s %d %d" % (self.REPR_PREFIX, self.row, self.col)
@@ -124,7 +176,10 @@ class UTSDigMessage(UTSMessage):
 
 class UTSFlagMessage(UTSMessage):
 
+    __slots__ = ("row", "col")
+
     REPR_PREFIX = "flag"
+    KEYWORDS = (REPR_PREFIX, )
     ERROR_OUT_OF_BOUNDS = UTSDigMessage.ERROR_OUT_OF_BOUNDS
 
     def __init__(self, row, col):
@@ -132,14 +187,10 @@ class UTSFlagMessage(UTSMessage):
         self.col = col
 
     @classmethod
-    def _message_factory(cls, factory_string):
-        components = factory_string.split(" ")
-        x, y = int(components[1]), int(components[2])
-
-        if cls.REPR_PREFIX != components[0]:
-            raise ValueError("Expected %s, found %s" % (cls.REPR_PREFIX, components[0]))
+    def _match(cls, factory_string):
+        coordinates = _parse_coordinates(factory_string, cls.REPR_PREFIX)
 
-        return UTSFlagMessage(x, y)
+        return cls(*coordinates) if coordinates is not None else None
 
     def get_representation(self):
         return "%s %d %d" % (self.REPR_PREFIX, self.row, self.col)
@@ -149,7 +200,10 @@ class UTSFlagMessage(UTSMessage):
 
 class UTSDeflagMessage(UTSMessage):
 
+    __slots__ = ("row", "col")
+
     REPR_PREFIX = "deflag"
+    KEYWORDS = (REPR_PREFIX, )
     ERROR_OUT_OF_BOUNDS = UTSDigMessage.ERROR_OUT_OF_BOUNDS
 
     def __init__(self, row, col):
@@ -157,14 +211,34 @@ class UTSDeflagMessage(UTSMessage):
         self.col = col
 
     @classmethod
-    def _message_factory(cls, factory_string):
-        components = factory_string.split(" ")
-        x, y = int(components[1]), int(components[2])
+    def _match(cls, factory_string):
+        coordinates = _parse_coordinates(factory_string, cls.REPR_PREFIX)
 
-        if cls.REPR_PREFIX != components[0]:
-            raise ValueError("Expected %s, found %s" % (cls.REPR_PREFIX, components[0]))
+        return cls(*coordinates) if coordinates is not None else None
 
-        return UTSDeflagMessage(x, y)
+    def get_representation(self):
+        return "%s %d %d" % (self.REPR_PREFIX, self.row, self.col)
+
+    find_errors = UTSDigMessage.find_errors
+
+
+class UTSChordMessage(UTSMessage):
+
+    __slots__ = ("row", "col")
+
+    REPR_PREFIX = "chord"
+    KEYWORDS = (REPR_PREFIX, )
+    ERROR_OUT_OF_BOUNDS = UTSDigMessage.ERROR_OUT_OF_BOUNDS
+
+    def __init__(self, row, col):
+        self.row = row
+        self.col = col
+
+    @classmethod
+    def _match(cls, factory_string):
+        coordinates = _parse_coordinates(factory_string, cls.REPR_PREFIX)
+
+        return cls(*coordinates) if coordinates is not None else None
 
     def get_representation(self):
         return "%s %d %d" % (self.REPR_PREFIX, self.row, self.col)
@@ -174,12 +248,32 @@ class UTSDeflagMessage(UTSMessage):
 
 class UTSHelpRequestMessage(UTSMessage):
 
+    __slots__ = ()
+
     REPR = "help"
+    KEYWORDS = (REPR, )
 
     @classmethod
-    def _message_factory(cls, factory_string):
-        if cls.REPR == factory_string:
-            return UTSHelpRequestMessage()
+    def _match(cls, factory_string):
+        return cls() if cls.REPR == factory_string else None
+
+    def get_representation(self):
+        return self.REPR
+
+    def find_errors(self, board):
+        return None
+
+
+class UTSHintMessage(UTSMessage):
+
+    __slots__ = ()
+
+    REPR = "hint"
+    KEYWORDS = (REPR, )
+
+    @classmethod
+    def _match(cls, factory_string):
+        return cls() if cls.REPR == factory_string else None
 
     def get_representation(self):
         return self.REPR
@@ -190,14 +284,14 @@ class UTSHelpRequestMessage(UTSMessage):
 
 class UTSByeMessage(UTSMessage):
 
+    __slots__ = ()
+
     REPR = "bye"
+    KEYWORDS = (REPR, "-1")
 
     @classmethod
-    def _message_factory(cls, factory_string):
-        if cls.REPR == factory_string or factory_string == "-1":
-            return UTSByeMessage()
-        else:
-            raise ValueError("Expected %s, found %s" % (cls.REPR, factory_string))
+    def _match(cls, factory_string):
+        return cls() if factory_string in cls.KEYWORDS else None
 
     def get_representation(self):
         return self.REPR
@@ -206,19 +300,220 @@ class UTSByeMessage(UTSMessage):
         return None
 
 
+class UTSBatchMessage(UTSMessage):
+    """
+    A sequence of dig, flag, deflag and chord commands, separated by semicolons, to be applied at once and answered
+    with a single reply: "batch flag 1 2; flag 3 4; dig 5 6".
+    """
+
+    __slots__ = ("items", )
+
+    REPR_PREFIX = "batch"
+    KEYWORDS = (REPR_PREFIX, )
+    SEPARATOR = ";"
+    ERROR_NOT_BATCHABLE = "Error. Only dig, flag, deflag and chord commands can be batched."
+    ERROR_ITEM = "Command %d, '%s': %s"
+
+    def __init__(self, items):
+        """
+        :param items: the list of the UTSMessage instances of the batched commands, invalid ones included.
+        """
+        self.items = items
+
+    @classmethod
+    def _match(cls, factory_string):
+        prefix, separator, commands = factory_string.partition(" ")
+
+        if prefix != cls.REPR_PREFIX:
+            return None
+
+        items = [UTSMessage.parse_infer_type(c) for c in commands.split(cls.SEPARATOR) if c.strip()]
+
+        return cls(items) if items else None
+
+    def get_representation(self):
+        return "%s %s" % (self.REPR_PREFIX, (self.SEPARATOR + " ").join(i.get_representation() for i in self.items))
+
+    def find_errors(self, board):
+        return None
+
+    def find_item_errors(self, board):
+        """
+        :return: a list of (index, error) tuples, one for every batched command which cannot be applied, index being
+            its position in the batch and error a human-readable string explaining the issue.
+        """
+        errors = list()
+
+        for index, item in enumerate(self.items):
+            if isinstance(item, UTSInvalidMessage):
+                error = item.stu_error_message_factory().msg
+            elif not isinstance(item, (UTSDigMessage, UTSFlagMessage, UTSDeflagMessage, UTSChordMessage)):
+                error = self.ERROR_NOT_BATCHABLE
+            else:
+                error = item.find_errors(board)
+
+            if error is not None:
+                errors.append((index, self.ERROR_ITEM % (index + 1, item.get_representation(), error)))
+
+        return errors
+
+
+class UTSHelloMessage(UTSMessage):
+    """
+    Negotiates the protocol mode of the board replies: "hello delta" for replies carrying only the squares changed
+    since the previous board reply, "hello" to go back to full boards.
+    """
+
+    __slots__ = ("delta", )
+
+    REPR = "hello"
+    KEYWORDS = (REPR, )
+    MODE_DELTA = "delta"
+
+    def __init__(self, delta=False):
+        self.delta = delta
+
+    @classmethod
+    def _match(cls, factory_string):
+        if factory_string == cls.REPR:
+            return cls()
+        elif factory_string == "%s %s" % (cls.REPR, cls.MODE_DELTA):
+            return cls(True)
+
+        return None
+
+    def get_representation(self):
+        return "%s %s" % (self.REPR, self.MODE_DELTA) if self.delta else self.REPR
+
+    def find_errors(self, board):
+        return None
+
+
+class UTSSnapshotMessage(UTSMessage):
+    """
+    Requests the full board, in delta mode as well.
+    """
+
+    __slots__ = ()
+
+    REPR = "snapshot"
+    KEYWORDS = (REPR, )
+
+    @classmethod
+    def _match(cls, factory_string):
+        return cls() if cls.REPR == factory_string else None
+
+    def get_representation(self):
+        return self.REPR
+
+    def find_errors(self, board):
+        return None
+
+
+class UTSSubscribeMessage(UTSMessage):
+    """
+    Subscribes to the board updates, "subscribe", pushed by the server as other players change the board, or
+    unsubscribes from them, "unsubscribe".
+    """
+
+    __slots__ = ("subscribe", )
+
+    REPR = "subscribe"
+    REPR_OFF = "unsubscribe"
+    KEYWORDS = (REPR, REPR_OFF)
+    ERROR_UNSUPPORTED = "Error. This server cannot push board updates."
+
+    def __init__(self, subscribe=True):
+        self.subscribe = subscribe
+
+    @classmethod
+    def _match(cls, factory_string):
+        return cls(factory_string == cls.REPR) if factory_string in cls.KEYWORDS else None
+
+    def get_representation(self):
+        return self.REPR if self.subscribe else self.REPR_OFF
+
+    def find_errors(self, board):
+        return None
+
+
+class UTSJoinMessage(UTSMessage):
+    """
+    Leaves the current room and joins the room named **room**, where the game of its board goes on: "join 12".
+    """
+
+    __slots__ = ("room", )
+
+    REPR_PREFIX = "join"
+    KEYWORDS = (REPR_PREFIX, )
+    ERROR_NO_ROOM = "Error. There is no room named '%s'."
+
+    def __init__(self, room):
+        self.room = room
+
+    @classmethod
+    def _match(cls, factory_string):
+        components = factory_string.split(" ")
+
+        return cls(components[1]) if len(components) == 2 and components[0] == cls.REPR_PREFIX else None
+
+    def get_representation(self):
+        return "%s %s" % (self.REPR_PREFIX, self.room)
+
+    def find_errors(self, board):
+        return None
+
+
+class UTSCreateMessage(UTSMessage):
+    """
+    Leaves the current room and joins a new one, with a new board of the given difficulty: "create easy" or
+    "create 16x30x99".
+    """
+
+    __slots__ = ("difficulty", )
+
+    REPR_PREFIX = "create"
+    KEYWORDS = (REPR_PREFIX, )
+    ERROR_DIFFICULTY = "Error. '%s' is not a difficulty: use easy, intermediate, hard or <height>x<width>x<mines>."
+    ERROR_TOO_LARGE = "Error. '%s' is too large: boards have at most %d squares."
+    ERROR_FULL = "Error. No more rooms can be created, try again later."
+
+    def __init__(self, difficulty):
+        """
+        :param difficulty: the difficulty string, as accepted by RoomRegistry.parse_difficulty().
+        """
+        self.difficulty = difficulty
+
+    @classmethod
+    def _match(cls, factory_string):
+        components = factory_string.split(" ")
+
+        return cls(components[1]) if len(components) == 2 and components[0] == cls.REPR_PREFIX else None
+
+    def get_representation(self):
+        return "%s %s" % (self.REPR_PREFIX, self.difficulty)
+
+    def find_errors(self, board):
+        return None
+
+
 # noinspection PyAbstractClass
 class UTSInvalidMessage(UTSMessage):
     """
     UTSInvalidMessage represents any type of string which cannot be used to instantiate one of the other
     concrete UTSMessage classes.
     """
+
+    __slots__ = ("repr", )
+
     STU_FACTORY = "Error. '%s' was not understood."
+    ERROR_TOO_LONG = "Error. The command was longer than %d bytes and was discarded."
 
     def __init__(self, input):
         self.repr = input
 
     @classmethod
-    def _message_factory(cls, factory_string):
+    def _match(cls, factory_string):
         return UTSInvalidMessage(str(factory_string))
 
     def get_representation(self):
@@ -238,12 +533,88 @@ class STUMessage(Message):
 
 
 class STUBoardMessage(STUMessage):
+    """
+    The board, as the reply to the commands reading or changing it. In delta mode, see use_deltas(), the board is
+    preceded by a "board <version>" line, or replaced by the squares changed since the version the client last
+    received: a "delta <since> <version> <count>" line followed by count "<row> <col> <square>" lines, the square
+    being the character representing it.
+    """
+
+    REPR_FULL = "board %d\n"
+    REPR_DELTA = "delta %d %d %d\n"
+    REPR_SQUARE = "%d %d %s\n"
 
     def __init__(self, board):
+        """
+        :param board: the shared board instance. Its current snapshot is taken at construction, so that the message
+            can later be rendered without locking the board.
+        """
         self.board = board
+        self.snapshot = board.snapshot()
+        self.delta_mode = False
+        self.since = None
+        self.changes = None
+
+    def use_deltas(self, since):
+        """
+        Switch the message to delta mode.
+
+        :param since: the version of the board the client last received, or None to send the full board.
+        """
+        self.delta_mode = True
+        self.since = since
+        self.changes = None if since is None else self.board.changes(since, self.snapshot.version)
 
     def get_representation(self):
-        return str(self.board) + "\n"
+        if not self.delta_mode:
+            return str(self.snapshot) + "\n"
+        elif self.changes is None:
+            return self.REPR_FULL % self.snapshot.version + str(self.snapshot) + "\n"
+
+        return self.REPR_DELTA % (self.since, self.snapshot.version, len(self.changes)) + \
+            "".join(self.REPR_SQUARE % (row, col, self.snapshot.square(row, col)) for row, col in sorted(self.changes))
+
+    def encode(self):
+        # The full board is sent as the bytes shared by every message of the same snapshot, deltas are not shared
+        if not self.delta_mode:
+            return [self.snapshot.encode(), b"\n"]
+        elif self.changes is None:
+            return [(self.REPR_FULL % self.snapshot.version).encode(), self.snapshot.encode(), b"\n"]
+
+        return super().encode()
+
+
+class STUWonMessage(STUBoardMessage):
+    """
+    The reply to a dig clearing the last square without a bomb: the board, followed by the announcement that the game
+    was won.
+    """
+
+    REPR = "All the squares without a mine were dug. You won!\n"
+
+    def get_representation(self):
+        return super().get_representation() + self.REPR
+
+    def encode(self):
+        return super().encode() + [self.REPR.encode()]
+
+
+class STURoomMessage(STUBoardMessage):
+    """
+    The reply to a join or create command: the name of the room joined, followed by its board.
+    """
+
+    REPR = "You are in room %s.\n"
+
+    def __init__(self, room, board):
+        super().__init__(board)
+        self.room = room
+
+    def get_representation(self):
+        return self.REPR % self.room + super().get_representation()
+
+    def encode(self):
+        return [(self.REPR % self.room).encode()] + super().encode()
 
 
 class STUBoomMessage(STUMessage):
@@ -254,6 +625,43 @@ class STUBoomMessage(STUMessage):
         return self.REPR
 
 
+class STUBatchMessage(STUBoardMessage):
+    """
+    The reply to a batch of commands: the errors of the commands which could not be applied, one per line, followed
+    by the board, and by the announcement of the victory if the batch won the game.
+    """
+
+    def __init__(self, board, errors, won=False):
+        """
+        :param errors: the list of the error strings of the batched commands.
+        :param won: True if the batch dug the last square without a mine.
+        """
+        super().__init__(board)
+        self.errors = errors
+        self.won = won
+
+    def get_representation(self):
+        return "".join(e + "\n" for e in self.errors) + super().get_representation() + \
+               (STUWonMessage.REPR if self.won else "")
+
+    def encode(self):
+        return ["".join(e + "\n" for e in self.errors).encode()] + super().encode() + \
+               ([STUWonMessage.REPR.encode()] if self.won else [])
+
+
+class STUBatchBoomMessage(STUBoomMessage):
+    """
+    The reply to a batch of commands which dug a mine: the errors of the commands which could not be applied, one per
+    line, followed by the mine announcement.
+    """
+
+    def __init__(self, errors):
+        self.errors = errors
+
+    def get_representation(self):
+        return "".join(e + "\n" for e in self.errors) + super().get_representation()
+
+
 class STUHelpMessage(STUMessage):
 
     REPR = """
@@ -263,7 +671,8 @@ look
 
 dig <row> <col>
 \tAttempts to dig a given square. Index errors or a dug mine are indicated automatically
-\tif any of them occurs. Else a response like from a "look" message is sent.
+\tif any of them occurs. Else a response like from a "look" message is sent, followed by a
+\tvictory announcement if no square without a mine is left to dig.
 
 flag <row> <col>
 \tMarks a square with a flag. This command does not behave as a toggle. A second flag message
@@ -272,6 +681,37 @@ flag <row> <col>
 deflag <row> <col>
 \tDeflags the indicated square, or leaves it unchanged if it was already unflagged.
 
+chord <row> <col>
+\tDigs all the unflagged neighbours of a dug square, if as many of them are flagged as its
+\tnumber of adjacent mines. Else the board is left unchanged. Replies as a "dig" message.
+
+batch <command>; <command>...
+\tApplies a sequence of dig, flag, deflag and chord commands at once, replying with a single board.
+\tThe commands which cannot be applied are reported first. A dug mine ends the batch.
+
+hello [delta]
+\tWith "delta", board replies only carry the squares changed since the previous board reply,
+\tas a "delta <since> <version> <count>" line followed by "<row> <col> <square>" lines.
+\tFull boards are then preceded by a "board <version>" line. Without, full boards are sent.
+
+snapshot
+\tReturns a representation of the board, as a full board in delta mode as well.
+
+subscribe
+\tPushes the board, preceded by an "update" line, whenever other players change it. Updates
+\tare merged over short intervals. "unsubscribe" stops them.
+
+join <room>
+\tLeaves the current room and joins the game of another one, replying with its board.
+
+create <difficulty>
+\tCreates a room with a new board and joins it. The difficulty is easy, intermediate, hard
+\tor <height>x<width>x<mines>. Rooms nobody plays in are closed after a while.
+
+hint
+\tSuggests a square which is safe to dig, as deduced from the dug squares. No mutation occurs on
+\tthe board.
+
 help
 \tDisplays this message.
 
@@ -284,6 +724,48 @@ bye
         return self.REPR
 
 
+class STUUpdateMessage(STUBoardMessage):
+    """
+    A board update pushed to a subscribed client: an "update" line followed by the board, or by its changes in delta
+    mode.
+    """
+
+    REPR = "update\n"
+
+    def get_representation(self):
+        return self.REPR + super().get_representation()
+
+    def encode(self):
+        return [self.REPR.encode()] + super().encode()
+
+
+class STUSubscriptionMessage(STUMessage):
+
+    REPR = "Subscribed to the board updates.\n"
+    REPR_OFF = "Unsubscribed from the board updates.\n"
+
+    def __init__(self, subscribed):
+        self.subscribed = subscribed
+
+    def get_representation(self):
+        return self.REPR if self.subscribed else self.REPR_OFF
+
+
+class STUHintMessage(STUMessage):
+
+    REPR = "Hint: the square %d, %d is safe to dig.\n"
+    REPR_NONE = "Hint: no square can be deduced to be safe, a guess is needed.\n"
+
+    def __init__(self, square):
+        """
+        :param square: the (row, col) coordinates of a square safe to dig, or None if none is known.
+        """
+        self.square = square
+
+    def get_representation(self):
+        return self.REPR_NONE if self.square is None else self.REPR % self.square
+
+
 class STUHelloMessage(STUMessage):
 
     REPR = """
@@ -298,6 +780,33 @@ Type 'help' for help.\n
         return self.REPR % self.users
 
 
+class STUBusyMessage(STUMessage):
+
+    REPR = "Server busy: %d/%d players connected. Try again later.\n"
+
+    def __init__(self, users_number, max_users):
+        self.users = users_number
+        self.max_users = max_users
+
+    def get_representation(self):
+        return self.REPR % (self.users, self.max_users)
+
+
+class STUQueuedMessage(STUMessage):
+    """
+    Sent to a client waiting for a player to leave a full server, as it starts waiting and whenever it moves up the
+    queue.
+    """
+
+    REPR = "Server full: you are number %d in the queue, please wait.\n"
+
+    def __init__(self, position):
+        self.position = position
+
+    def get_representation(self):
+        return self.REPR % self.position
+
+
 class STUErrorMessage(STUMessage):
 
     def __init__(self, error_msg):
@@ -316,4 +825,8 @@ class STUByeMessage(STUMessage):
 
 
 UTSMessage.message_types = (UTSLookMessage, UTSDigMessage, UTSFlagMessage, UTSDeflagMessage,
-                            UTSHelpRequestMessage, UTSByeMessage)
+                            UTSHelpRequestMessage, UTSByeMessage, UTSHintMessage, UTSChordMessage,
+                            UTSBatchMessage, UTSJoinMessage, UTSCreateMessage, UTSHelloMessage,
+                            UTSSnapshotMessage, UTSSubscribeMessage)
+UTSMessage._parsers = {keyword: message_type for message_type in UTSMessage.message_types
+                       for keyword in message_type.KEYWORDS}
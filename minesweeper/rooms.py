@@ -0,0 +1,203 @@
+from collections import OrderedDict
+from itertools import count
+from threading import Lock
+from time import monotonic
+
+from minesweeper.board import Board
+
+
+class Room:
+    """
+    A game hosted by a server: a board, with its own lock, and the number of clients playing on it.
+    """
+
+    __slots__ = ("name", "board", "clients", "last_used")
+
+    def __init__(self, name, board):
+        self.name = name
+        self.board = board
+        self.clients = 0
+        self.last_used = monotonic()
+
+    def __repr__(self):
+        return "<'%s.%s' object, name=%s, clients=%d>" % \
+               (self.__class__.__module__, self.__class__.__name__, self.name, self.clients)
+
+
+class RoomRegistry:
+    """
+    The rooms of a server, by name. Clients create rooms and join them by name, and leave them when joining another
+    one or disconnecting. Rooms with no clients are evicted once idle for longer than ttl seconds, or, least recently
+    used first, when max_rooms rooms exist and a new one is created. Rooms added with pinned=True, such as the main
+    room of the server, are never evicted. The boards of the rooms created have at most max_squares squares, so that
+    no client can exhaust the memory of the server with a single command.
+
+    Thread safety argument:\n
+    The rooms, their clients count and their last use time are guarded by self._lock. The boards of the rooms are
+    thread-safe on their own.
+
+    Rooms with no clients that are not pinned are also kept apart, least recently used first, so that evicting rooms
+    only ever looks at the rooms it evicts, and at one more, rather than at every room.
+    """
+
+    # Name of the room of the board a server is started with
+    MAIN = "main"
+    DEFAULT_CONFIGS = {
+        "max_rooms": 50000,
+        "ttl": 600,
+        "max_squares": 1 << 20,
+    }
+    DIFFICULTIES = {
+        "easy": Board.DIFF_EASY,
+        "intermediate": Board.DIFF_INTERMEDIATE,
+        "hard": Board.DIFF_HARD,
+    }
+
+    def __init__(self, generator=None, max_rooms=DEFAULT_CONFIGS["max_rooms"], ttl=DEFAULT_CONFIGS["ttl"], prefix="",
+                 max_squares=DEFAULT_CONFIGS["max_squares"]):
+        """
+        :param generator: an optional BoardGenerator, from which the boards of new rooms are taken. Boards are created
+            on the spot if None.
+        :param max_rooms: maximum number of rooms.
+        :param ttl: number of seconds after which a room with no clients is evicted.
+        :param prefix: a string the names of the rooms created start with.
+        :param max_squares: maximum number of squares of the boards of the rooms created.
+        """
+        self.generator = generator
+        self.max_rooms = max_rooms
+        self.ttl = ttl
+        self.prefix = prefix
+        self.max_squares = max_squares
+
+        self._lock = Lock()
+        self._rooms = {}
+        # Evictable rooms by name, with no clients and not pinned, from the least to the most recently used
+        self._idle = OrderedDict()
+        self._pinned = set()
+        self._names = count(1)
+
+    def __repr__(self):
+        return "<'%s.%s' object, rooms=%d/%d>" % \
+               (self.__class__.__module__, self.__class__.__name__, len(self._rooms), self.max_rooms)
+
+    def __len__(self):
+        return len(self._rooms)
+
+    def __contains__(self, name):
+        return name in self._rooms
+
+    def close(self):
+        """
+        Close the generator of the registry, if any.
+        """
+        if self.generator is not None:
+            self.generator.close()
+
+    @staticmethod
+    def parse_difficulty(string):
+        """
+        :param string: the name of a standard difficulty, as in DIFFICULTIES, or a custom one in the form
+            "<height>x<width>x<mines>".
+        :return: the (height, width, mines) tuple of the difficulty.
+        :raise: ValueError if **string** is not a valid difficulty.
+        """
+        if string in RoomRegistry.DIFFICULTIES:
+            return RoomRegistry.DIFFICULTIES[string]
+
+        components = string.split("x")
+
+        if len(components) != 3:
+            raise ValueError("Expected a difficulty among %s or <height>x<width>x<mines>, found %s" %
+                             (", ".join(RoomRegistry.DIFFICULTIES), string))
+
+        return Board.check_difficulty(tuple(int(c) for c in components))
+
+    def add(self, name, board, pinned=False):
+        """
+        Add a room for an existing board.
+
+        :return: the new Room.
+        """
+        with self._lock:
+            if name in self._rooms:
+                raise ValueError("A room named '%s' already exists" % name)
+
+            room = self._rooms[name] = Room(name, board)
+
+            if pinned:
+                self._pinned.add(name)
+            else:
+                self._idle[name] = room
+
+            return room
+
+    def create(self, difficulty):
+        """
+        Create a room with a new board of **difficulty**, joined by the caller, evicting idle rooms if needed.
+
+        :param difficulty: a (height, width, mines) tuple.
+        :return: the new Room.
+        :raise: ValueError if boards of **difficulty** have more than max_squares squares.
+        :raise: RuntimeError if the maximum number of rooms is reached and no room can be evicted.
+        """
+        if difficulty[0] * difficulty[1] > self.max_squares:
+            raise ValueError("Boards have at most %d squares, found %dx%d" %
+                             (self.max_squares, difficulty[0], difficulty[1]))
+
+        board = self.generator.board(difficulty) if self.generator is not None else \
+            Board.create_from_difficulty(difficulty)
+
+        with self._lock:
+            self._evict(self.max_rooms - 1)
+
+            if len(self._rooms) >= self.max_rooms:
+                raise RuntimeError("The maximum number of rooms, %d, is reached" % self.max_rooms)
+
+            name = self.prefix + str(next(self._names))
+
+            while name in self._rooms:
+                name = self.prefix + str(next(self._names))
+
+            room = self._rooms[name] = Room(name, board)
+            room.clients = 1
+
+            return room
+
+    def join(self, name):
+        """
+        :return: the Room named **name**, counting the caller among its clients.
+        :raise: KeyError if there is no such room.
+        """
+        with self._lock:
+            self._evict(self.max_rooms)
+
+            room = self._rooms[name]
+            room.clients += 1
+            room.last_used = monotonic()
+            self._idle.pop(name, None)
+
+            return room
+
+    def leave(self, room):
+        """
+        Stop counting the caller among the clients of **room**.
+        """
+        with self._lock:
+            room.clients -= 1
+            room.last_used = monotonic()
+
+            if room.clients == 0 and room.name not in self._pinned and self._rooms.get(room.name) is room:
+                self._idle[room.name] = room
+
+    def _evict(self, max_rooms):
+        """
+        Remove the rooms with no clients idle for longer than self.ttl seconds, then as many other rooms with no
+        clients as needed for at most **max_rooms** to be left, least recently used first. Must be called holding
+        self._lock.
+        """
+        expiry = monotonic() - self.ttl
+
+        # The idle rooms are in last use order: once one is kept, the rooms used after it are kept as well
+        while self._idle and (len(self._rooms) > max_rooms or next(iter(self._idle.values())).last_used < expiry):
+            name, room = self._idle.popitem(last=False)
+            del self._rooms[name]
@@ -1,29 +1,65 @@
-import concurrent.futures
+import asyncio
+import os
+import signal
 from argparse import ArgumentParser
+from collections import deque
 from concurrent.futures import ThreadPoolExecutor
 from logging import *
 from socket import *
 from sys import argv, stdout
-from time import sleep
+from threading import Lock
+from time import monotonic, sleep
 
-from minesweeper.board import Board, State
+from minesweeper.board import Board
+from minesweeper.generator import BoardGenerator
+from minesweeper.journal import Journal, DIG, FLAG, DEFLAG, CHORD, play
 from minesweeper.message import *
+from minesweeper.rooms import RoomRegistry
+from minesweeper.solver import hint
+from minesweeper.stream import SocketStream
 from minesweeper.utils import is_boolean
 
 
 class MineSweeperServer:
+    """
+    A server running every connection in a thread of a pool of max_clients threads. Once max_clients clients are
+    connected, up to max_waiting more are queued, each one being told its position in the queue, and admitted in turn
+    as soon as a connected client leaves. The clients beyond those are told that the server is busy and disconnected
+    at once.
+
+    Thread safety argument:\n
+    The connections and the queue of waiting clients are accessed by the thread accepting the clients and by those of
+    the pool, as their connections end, and are guarded by self._admission.
+    """
 
     DEFAULT_CONFIGS = {
         "host": '',
         "port": 3111,
         "listen_backlog": 0,
-        "max_clients": 4
+        "max_clients": 4,
+        "max_waiting": 16,
     }
 
-    def __init__(self, board, port=DEFAULT_CONFIGS["port"], debug=False):
+    def __init__(self, board, port=DEFAULT_CONFIGS["port"], debug=False, journal=None, rooms=None,
+                 max_waiting=DEFAULT_CONFIGS["max_waiting"]):
+        """
+        :param board: the board played by the clients, in the main room.
+        :param port: local port where to bind the server.
+        :param debug: debug flag for the server.
+        :param journal: an optional Journal of **board**, to which the moves of the clients are appended.
+        :param rooms: the RoomRegistry of the rooms clients can create and join, an empty one if None.
+        :param max_waiting: maximum number of clients waiting for a free slot once the server is full.
+        """
         self._board = board
+        self.journal = journal
+        self.rooms = RoomRegistry() if rooms is None else rooms
+        self.rooms.add(RoomRegistry.MAIN, board, pinned=True)
         self._futures_to_connections = dict()
         self.max_clients = self.DEFAULT_CONFIGS["max_clients"]
+        self.max_waiting = max_waiting
+        # Sockets of the clients waiting for a free slot, first come first served
+        self._waiting = deque()
+        self._admission = Lock()
 
         self._server = socket(AF_INET, SOCK_STREAM)
         self._server.bind((self.DEFAULT_CONFIGS["host"], port))
@@ -60,13 +96,24 @@ class MineSweeperServer:
 
     def close(self):
         if not self.is_closed:
+            # No client is admitted from now on
+            with self._admission:
+                self.is_closed = True
+                waiting, self._waiting = self._waiting, deque()
+
+            for client in waiting:
+                client.close()
+
             self._executor.shutdown(False)
 
             self._server.shutdown(SHUT_RDWR)
             self._server.close()
             del self._server
 
-            self.is_closed = True
+            if self.journal is not None:
+                self.journal.close()
+
+            self.rooms.close()
 
             self._logger.debug("%s was closed" % repr(self))
 
@@ -76,25 +123,42 @@ class MineSweeperServer:
     def connections(self):
         return self._futures_to_connections.values()
 
+    def waiting(self):
+        """
+        :return: the number of clients waiting for a free slot.
+        """
+        return len(self._waiting)
+
     def next_connection(self):
-        if self.is_full():
-            self._logger.debug(
-                "Reached maximum number of connections: %d/%d occupied",
-                len(self._futures_to_connections), self.max_clients
-            )
-            return None
-        else:
-            connection = Connection(
-                self,
-                self._server.accept()[0],
-                self.is_debug_enabled()
-            )
-            future = self._executor.submit(connection)
-            future.add_done_callback(self._make_callback_shutdown_client())
+        """
+        Accept the next client, blocking until one connects. The client is served at once if the server is not full,
+        queued if fewer than max_waiting clients are waiting, or told that the server is busy and disconnected
+        otherwise.
+
+        :return: the future of the connection of the client if it is served at once, None otherwise.
+        """
+        client = self._server.accept()[0]
+
+        with self._admission:
+            if not self.is_full() and not self._waiting:
+                future = self._start(client)
+            elif len(self._waiting) < self.max_waiting:
+                self._waiting.append(client)
+                future = None
+                self._tell(client, STUQueuedMessage(len(self._waiting)))
+                self._logger.debug("Queued connection: %d waiting", len(self._waiting))
+            else:
+                self._tell(client, STUBusyMessage(len(self._futures_to_connections), self.max_clients))
+                client.close()
+                self._logger.debug("Rejected connection: %d/%d occupied, %d waiting",
+                                   len(self._futures_to_connections), self.max_clients, len(self._waiting))
 
-            self._futures_to_connections[future] = connection
+                return None
 
-            return future
+        if future is not None:
+            future.add_done_callback(self._make_callback_shutdown_client())
+
+        return future
 
     def is_full(self):
         return len(self._futures_to_connections) >= self.max_clients
@@ -102,18 +166,55 @@ class MineSweeperServer:
     def is_debug_enabled(self):
         return NullHandler not in (type(h) for h in self._logger.handlers)
 
+    def _start(self, client):
+        """
+        Serve **client** in a thread of the pool. Must be called holding self._admission.
+
+        :return: the future of the connection of the client.
+        """
+        connection = Connection(
+            self,
+            client,
+            self.is_debug_enabled()
+        )
+        future = self._executor.submit(connection)
+        self._futures_to_connections[future] = connection
+
+        return future
+
+    @staticmethod
+    def _tell(client, message):
+        """
+        Send **message** to a client not being served, never blocking: a client which does not read what it is told
+        just misses it.
+        """
+        try:
+            client.send(message.get_representation().encode(), MSG_DONTWAIT)
+        except OSError:
+            pass
+
     def _make_callback_shutdown_client(self):
 
         def _callback_shutdown_client(future):
-            connection = self._futures_to_connections[future]
+            with self._admission:
+                connection = self._futures_to_connections.pop(future)
+                admitted = self._start(self._waiting.popleft()) if self._waiting and not self.is_closed else None
+
+                # The clients left waiting moved up the queue
+                if admitted is not None:
+                    for position, client in enumerate(self._waiting, 1):
+                        self._tell(client, STUQueuedMessage(position))
 
             connection.close()
-            self._futures_to_connections.pop(future)
+
+            if admitted is not None:
+                admitted.add_done_callback(self._make_callback_shutdown_client())
 
             self._logger.debug(
-                "Connection closed: %d/%d still running",
+                "Connection closed: %d/%d still running, %d waiting",
                 len(self._futures_to_connections),
-                self.max_clients
+                self.max_clients,
+                len(self._waiting)
             )
 
         return _callback_shutdown_client
@@ -121,10 +222,23 @@ class MineSweeperServer:
 
 class Connection:
 
+    # Moves applied by the dig, flag, deflag and chord messages
+    MOVES = {UTSDigMessage: DIG, UTSFlagMessage: FLAG, UTSDeflagMessage: DEFLAG, UTSChordMessage: CHORD}
+
     def __init__(self, ms_server: MineSweeperServer, client: socket, debug=False):
         self.server = ms_server
         self.board = self.server._board
+        # The Room joined by the client, None while in the main room it starts from
+        self.room = None
+        # Whether board replies are sent in delta mode, and the version of the board last sent to the client, in
+        # either mode
+        self.deltas = False
+        self.version = None
         self.client: socket = client
+        # The SocketStream of the client, created by run()
+        self.stream = None
+        # A board reply held back while more commands are buffered, see _reply()
+        self._held = None
 
         self.is_closed = False
         self.logger = getLogger(__name__)
@@ -147,30 +261,40 @@ class Connection:
         if self not in self.server.connections():
             connections += 1
 
-        self.client.send(
-            STUHelloMessage(connections).get_representation().encode()
-        )
+        self.stream = SocketStream(self.client)
+        self.stream.write(STUHelloMessage(connections).encode())
+        line = self._readline()
 
-        # TO-DO Verify open() is being used correctly
-        with open(self.client.fileno()) as stream:
-            in_message = UTSMessage.parse_infer_type(stream.readline())
+        while line:
+            in_message = UTSMessage.parse_infer_type(line.decode(errors="replace"))
+            self.logger.debug("%s:%s: %s", *self.client.getpeername(), in_message)
 
-            while in_message is not None:
-                self.logger.debug("%s:%s: %s", *self.client.getpeername(), in_message)
+            out_message = self._process_in_message(in_message)
+            self._reply(out_message, self.stream.has_line())
 
-                out_message = self._process_in_message(in_message)
-                self.client.send(out_message.get_representation().encode())
+            if isinstance(out_message, (STUBoomMessage, STUByeMessage)):
+                break
 
-                if isinstance(out_message, STUBoomMessage):
-                    in_message = None
-                elif isinstance(out_message, STUByeMessage):
-                    in_message = None
-                else:
-                    in_message = UTSMessage.parse_infer_type(stream.readline())
+            line = self._readline()
+
+        self._release()
+        self.stream.flush()
+
+    def _readline(self):
+        """
+        :return: the next line sent by the client, or an empty bytes object once it closed the connection. The lines
+            longer than the stream allows are skipped, replying an error to each.
+        """
+        while True:
+            try:
+                return self.stream.readline()
+            except ValueError:
+                self._reply(STUErrorMessage(UTSInvalidMessage.ERROR_TOO_LONG % self.stream.max_line), False)
 
     def close(self):
         if not self.is_closed:
             addrinfo = str(self.client)
+            self._leave_room()
 
             if self.client is not None:
                 try:
@@ -193,16 +317,33 @@ class Connection:
 
         if isinstance(in_message, UTSLookMessage):
             result = STUBoardMessage(self.board)
+        elif isinstance(in_message, UTSSnapshotMessage):
+            self.version = None
+            result = STUBoardMessage(self.board)
+        elif isinstance(in_message, UTSHelloMessage):
+            self.deltas = in_message.delta
+            self.version = None
+            result = STUBoardMessage(self.board)
         elif isinstance(in_message, UTSDigMessage):
             error = in_message.find_errors(self.board)
 
             if error is None:
-                self.board.set_state(in_message.row, in_message.col, State.DUG)
-                square = self.board.square(in_message.row, in_message.col)
+                if self._play(DIG, in_message.row, in_message.col):
+                    result = STUBoomMessage()
+                elif self.board.is_won():
+                    result = STUWonMessage(self.board)
+                else:
+                    result = STUBoardMessage(self.board)
+            else:
+                result = STUErrorMessage(error)
+        elif isinstance(in_message, UTSChordMessage):
+            error = in_message.find_errors(self.board)
 
-                if square.has_bomb:
-                    square.has_bomb = False
+            if error is None:
+                if self._play(CHORD, in_message.row, in_message.col):
                     result = STUBoomMessage()
+                elif self.board.is_won():
+                    result = STUWonMessage(self.board)
                 else:
                     result = STUBoardMessage(self.board)
             else:
@@ -211,7 +352,7 @@ class Connection:
             error = in_message.find_errors(self.board)
 
             if error is None:
-                self.board.set_state(in_message.row, in_message.col, State.FLAGGED)
+                self._play(FLAG, in_message.row, in_message.col)
 
                 result = STUBoardMessage(self.board)
             else:
@@ -220,23 +361,958 @@ class Connection:
             error = in_message.find_errors(self.board)
 
             if error is None:
-                square = self.board.square(in_message.row, in_message.col)
-
-                if square.state == State.FLAGGED:
-                    self.board.set_state(in_message.row, in_message.col, State.UNTOUCHED)
+                self._play(DEFLAG, in_message.row, in_message.col)
 
                 result = STUBoardMessage(self.board)
             else:
                 result = STUErrorMessage(error)
         elif isinstance(in_message, UTSHelpRequestMessage):
             result = STUHelpMessage()
+        elif isinstance(in_message, UTSBatchMessage):
+            result = self._process_batch(in_message)
+        elif isinstance(in_message, UTSHintMessage):
+            result = STUHintMessage(hint(self.board))
+        elif isinstance(in_message, UTSJoinMessage):
+            result = self._join(in_message.room)
+        elif isinstance(in_message, UTSCreateMessage):
+            result = self._create(in_message.difficulty)
+        elif isinstance(in_message, UTSSubscribeMessage):
+            result = self._subscribe(in_message.subscribe)
         elif isinstance(in_message, UTSByeMessage):
             result = STUByeMessage()
         elif isinstance(in_message, UTSInvalidMessage):
             result = in_message.stu_error_message_factory()
 
+        if isinstance(result, STUBoardMessage):
+            if self.deltas:
+                result.use_deltas(self.version)
+
+            self.version = result.snapshot.version
+
         return result
 
+    def _reply(self, out_message, more):
+        """
+        Send **out_message**, the reply to the last command processed. Clients may send several commands before
+        reading the replies: while **more** commands are already buffered, a plain board reply is held back rather
+        than sent, and dropped if the reply to the next command supersedes it. Any other reply is sent in order, after
+        the reply held back, if any.
+
+        :param more: True if another command was received and is to be processed next.
+        """
+        held, self._held = self._held, None
+
+        if held is not None and not self._supersedes(held, out_message):
+            self._write(held.encode())
+
+        if more and type(out_message) is STUBoardMessage:
+            self._held = out_message
+        else:
+            self._write(out_message.encode())
+
+    def _release(self):
+        """
+        Send the reply held back by _reply(), if any.
+        """
+        if self._held is not None:
+            self._write(self._held.encode())
+            self._held = None
+
+    @staticmethod
+    def _supersedes(held, reply):
+        """
+        :return: True if **reply** makes **held**, a plain board reply not sent yet, needless, being a reply carrying
+            the same board. In delta mode, **reply** is then made to carry the changes **held** would have carried as
+            well, unless it is a full board.
+        """
+        if not isinstance(reply, STUBoardMessage) or reply.board is not held.board:
+            return False
+
+        # The changes of both replies are merged rather than read from the board again, which would take its lock
+        if reply.delta_mode and reply.since is not None:
+            if held.changes is None or reply.changes is None or reply.since != held.snapshot.version:
+                reply.changes = None
+            else:
+                reply.changes = held.changes | reply.changes
+
+            reply.since = held.since
+
+        return True
+
+    def _write(self, buffers):
+        self.stream.write(buffers)
+
+    def _subscribe(self, subscribe):
+        """
+        Subscribe to the board updates, or unsubscribe from them if **subscribe** is False. Board updates cannot be
+        pushed from the blocking loop of run(), so only the connections of an AsyncMineSweeperServer support them.
+        """
+        return STUErrorMessage(UTSSubscribeMessage.ERROR_UNSUPPORTED)
+
+    def _process_batch(self, batch):
+        errors = batch.find_item_errors(self.board)
+        failed = {index for index, error in errors}
+        moves = [(self.MOVES[type(item)], item.row, item.col) for index, item in enumerate(batch.items)
+                 if index not in failed]
+        results = self._play_all(moves)
+
+        if any(results):
+            return STUBatchBoomMessage([error for index, error in errors])
+
+        won = any(move in (DIG, CHORD) for move, row, col in moves) and self.board.is_won()
+
+        return STUBatchMessage(self.board, [error for index, error in errors], won)
+
+    def _join(self, name):
+        try:
+            room = self.server.rooms.join(name)
+        except KeyError:
+            return STUErrorMessage(UTSJoinMessage.ERROR_NO_ROOM % name)
+
+        self._enter_room(room)
+
+        return STURoomMessage(room.name, self.board)
+
+    def _create(self, difficulty):
+        rooms = self.server.rooms
+
+        try:
+            parsed = RoomRegistry.parse_difficulty(difficulty)
+        except ValueError:
+            return STUErrorMessage(UTSCreateMessage.ERROR_DIFFICULTY % difficulty)
+
+        try:
+            room = rooms.create(parsed)
+        except ValueError:
+            return STUErrorMessage(UTSCreateMessage.ERROR_TOO_LARGE % (difficulty, rooms.max_squares))
+        except RuntimeError:
+            return STUErrorMessage(UTSCreateMessage.ERROR_FULL)
+
+        self._enter_room(room)
+
+        return STURoomMessage(room.name, self.board)
+
+    def _enter_room(self, room):
+        """
+        Leave the current room for **room**, already joined in the server RoomRegistry.
+        """
+        self._leave_room()
+        self.room = room
+        self.board = room.board
+        self.version = None
+
+    def _leave_room(self):
+        if self.room is not None:
+            self.server.rooms.leave(self.room)
+            self.room = None
+
+    def _play(self, move, row, col):
+        """
+        Apply a move to the board, appending it to the server journal if there is one.
+
+        :return: True if a mined square was dug, False otherwise.
+        """
+        return self._play_all([(move, row, col)])[0]
+
+    def _play_all(self, moves):
+        """
+        Apply a sequence of moves to the board holding its lock once, appending them to the server journal if there is
+        one and the board is the one of the main room. The moves following one which digs a mined square are dropped.
+
+        :param moves: a list of (move, row, col) tuples.
+        :return: the list of the results of the moves applied, True for those which dug a mined square.
+        """
+        if self.server.journal is not None and self.board is self.server.journal.board:
+            return self.server.journal.play_all(moves)
+
+        results = list()
+
+        with self.board.atomic():
+            for move in moves:
+                results.append(play(self.board, *move))
+
+                if results[-1]:
+                    break
+
+        return results
+
+
+class AsyncMineSweeperServer:
+    """
+    A server running every connection as a coroutine of a single asyncio event loop, rather than as a thread of a
+    pool, so that thousands of clients can play at the same time. Messages are parsed and replied to as by
+    MineSweeperServer, through the Connection logic. Those reading or mutating a board, which may block on its lock or
+    on the journal, are processed in a small pool of threads, as are the updates pushed to the clients, so that they
+    never block the event loop.
+
+    Clients are admitted as long as fewer than max_clients are connected, the others being told that the server is
+    busy. As rooms are cheap, a single server can host tens of thousands of small games.
+
+    Subscribed clients are pushed the board of their room whenever another client changes it. The changes made to a
+    board within a tick, counted from the first one, are merged into a single update per client. Clients which are
+    waiting for a reply, or which have not read a backlog of push_limit bytes yet, are skipped, and caught up at a
+    later tick, so that slow clients never hold back the others.
+    """
+
+    DEFAULT_CONFIGS = {
+        "host": '',
+        "port": MineSweeperServer.DEFAULT_CONFIGS["port"],
+        "listen_backlog": 1024,
+        "max_clients": 10000,
+        "workers": 4,
+        # Seconds over which board changes are merged into a single update
+        "tick": 0.05,
+        # Bytes of unsent output beyond which no update is pushed to a client
+        "push_limit": 1 << 16,
+        # Bytes of unsent output beyond which a connection waits for its client to read, until as few as low_water
+        # are left
+        "high_water": SocketStream.DEFAULT_CONFIGS["high_water"],
+        "low_water": SocketStream.DEFAULT_CONFIGS["low_water"],
+        # Length of the longest line accepted
+        "max_line": SocketStream.DEFAULT_CONFIGS["max_line"],
+    }
+
+    def __init__(self, board, port=DEFAULT_CONFIGS["port"], debug=False, journal=None,
+                 max_clients=DEFAULT_CONFIGS["max_clients"], workers=DEFAULT_CONFIGS["workers"], rooms=None):
+        """
+        :param board: the board played by the clients, in the main room, or None for a server with no main room.
+        :param port: local port where to bind the server, or 0 for any free port.
+        :param debug: debug flag for the server.
+        :param journal: an optional Journal of **board**, to which the moves of the clients are appended.
+        :param max_clients: maximum number of clients connected at the same time.
+        :param workers: number of threads processing the messages which mutate the board.
+        :param rooms: the RoomRegistry of the rooms clients can create and join, an empty one if None.
+        """
+        self._board = board
+        self.journal = journal
+        self.rooms = RoomRegistry() if rooms is None else rooms
+        self.port = port
+        self.max_clients = max_clients
+        self._connections = set()
+        self._executor = ThreadPoolExecutor(workers)
+        self._server = None
+        self.is_closed = False
+        # Subscribed connections by board, the boards changed and the connections left behind since the last
+        # broadcast, and the handle of the next broadcast, if scheduled
+        self._subscribers = dict()
+        self._changed = set()
+        self._lagging = set()
+        self._broadcast_handle = None
+
+        if board is not None:
+            self.rooms.add(RoomRegistry.MAIN, board, pinned=True)
+
+        self._logger = getLogger(__name__)
+        self._logger.setLevel(DEBUG)
+        self._logger.addHandler(StreamHandler(stdout) if debug else NullHandler())
+
+    def __repr__(self):
+        return "<'%s.%s' object, port=%s, connections=%d/%d>" % \
+               (self.__class__.__module__, self.__class__.__name__, self.port, len(self._connections),
+                self.max_clients)
+
+    async def start(self):
+        """
+        Start accepting connections. Once started, the port attribute holds the port the server is bound to.
+        """
+        server = self._bind()
+        self._server = await asyncio.start_server(self._accept, sock=server, limit=self.DEFAULT_CONFIGS["max_line"],
+                                                  backlog=self.DEFAULT_CONFIGS["listen_backlog"])
+        self.port = server.getsockname()[1]
+
+        self._logger.debug("Listening at port %d...", self.port)
+
+    def _bind(self):
+        """
+        :return: the socket to listen on, bound to self.port.
+        """
+        # The socket is bound as in MineSweeperServer, asyncio binding one socket per address family otherwise
+        server = socket(AF_INET, SOCK_STREAM)
+        server.bind((self.DEFAULT_CONFIGS["host"], self.port))
+
+        return server
+
+    async def serve_forever(self):
+        if self._server is None:
+            await self.start()
+
+        try:
+            await self._server.serve_forever()
+        finally:
+            await self.close()
+
+    async def close(self):
+        if not self.is_closed:
+            self.is_closed = True
+
+            if self._server is not None:
+                self._server.close()
+                await self._server.wait_closed()
+
+            if self._broadcast_handle is not None:
+                self._broadcast_handle.cancel()
+
+            self._executor.shutdown(False)
+
+            if self.journal is not None:
+                self.journal.close()
+
+            self.rooms.close()
+
+            self._logger.debug("%s was closed" % repr(self))
+
+    def connections(self):
+        return self._connections
+
+    def is_full(self):
+        return len(self._connections) >= self.max_clients
+
+    def subscribe(self, connection):
+        """
+        Push the updates of the board of **connection** to it, if it has a board.
+        """
+        if connection.board is not None:
+            self._subscribers.setdefault(connection.board, set()).add(connection)
+
+    def unsubscribe(self, connection, board):
+        """
+        Stop pushing the updates of **board** to **connection**.
+        """
+        subscribers = self._subscribers.get(board, ())
+
+        if connection in subscribers:
+            subscribers.remove(connection)
+
+            if not subscribers:
+                del self._subscribers[board]
+
+        self._lagging.discard(connection)
+
+    def notify(self, board):
+        """
+        Signal that **board** changed, pushing an update to its subscribers at the end of the current tick.
+        """
+        if board in self._subscribers:
+            self._changed.add(board)
+            self._schedule_broadcast()
+
+    def _schedule_broadcast(self):
+        if self._broadcast_handle is None and not self.is_closed:
+            self._broadcast_handle = asyncio.get_running_loop().call_later(self.DEFAULT_CONFIGS["tick"],
+                                                                           self._broadcast)
+
+    def _broadcast(self):
+        changed, self._changed = self._changed, set()
+        connections = self._lagging.union(*(self._subscribers.get(board, ()) for board in changed))
+        # No broadcast is scheduled until this one is done, the boards changed in the meantime being pushed next
+        self._broadcast_handle = asyncio.ensure_future(self._push(connections))
+
+    async def _push(self, connections):
+        """
+        Push the updates of their boards to **connections**, leaving behind those which cannot be sent one now. The
+        updates are built in the thread pool, as reading a board may block on its lock.
+        """
+        lagging = {c for c in connections if not c.can_push()}
+        due = [(c, c.update()) for c in connections - lagging if c.is_outdated()]
+
+        if due:
+            messages = await asyncio.get_running_loop().run_in_executor(
+                self._executor, lambda: [AsyncConnection.make_update(*update) for c, update in due]
+            )
+
+            for (connection, (board, since, deltas)), message in zip(due, messages):
+                if not connection.push(message, since):
+                    lagging.add(connection)
+
+        self._lagging = lagging
+        self._broadcast_handle = None
+
+        if self._lagging or self._changed:
+            self._schedule_broadcast()
+
+    async def _accept(self, reader, writer):
+        if self.is_full():
+            self._logger.debug("Rejected connection: %d/%d occupied", len(self._connections), self.max_clients)
+            writer.write(STUBusyMessage(len(self._connections), self.max_clients).get_representation().encode())
+            writer.close()
+            return
+
+        await self._serve(self._connection(reader, writer))
+
+    def _connection(self, reader, writer, pending=b""):
+        """
+        :return: a new connection of this server, with the parameters of AsyncConnection.
+        """
+        return AsyncConnection(self, reader, writer, pending)
+
+    async def _serve(self, connection, greet=True):
+        """
+        Run **connection** until the client leaves, then close it.
+
+        :param greet: passed to AsyncConnection.run().
+        """
+        self._connections.add(connection)
+
+        try:
+            await connection.run(greet)
+        except ConnectionError:
+            pass
+        finally:
+            self._connections.discard(connection)
+            connection.close()
+
+            self._logger.debug("Connection closed: %d/%d still running", len(self._connections), self.max_clients)
+
+
+class AsyncConnection(Connection):
+    """
+    A connection of an AsyncMineSweeperServer, reading and writing through asyncio streams.
+    """
+
+    # Messages which read or change a board, and may therefore block on its lock, on the journal or on the generation
+    # of a board: they are processed in a thread pool, the board lock preferring writers to readers
+    BLOCKING_MESSAGES = (UTSLookMessage, UTSSnapshotMessage, UTSHelloMessage, UTSDigMessage, UTSFlagMessage,
+                         UTSDeflagMessage, UTSChordMessage, UTSBatchMessage, UTSHintMessage, UTSJoinMessage,
+                         UTSCreateMessage)
+
+    def __init__(self, ms_server: AsyncMineSweeperServer, reader, writer, pending=b""):
+        """
+        :param pending: bytes already received from the client, read before those of **reader**.
+        """
+        self.server = ms_server
+        self.board = self.server._board
+        self.room = None
+        self.deltas = False
+        self.version = None
+        self.client = None
+        self.reader: asyncio.StreamReader = reader
+        self.writer: asyncio.StreamWriter = writer
+        self.writer.transport.set_write_buffer_limits(self.server.DEFAULT_CONFIGS["high_water"],
+                                                      self.server.DEFAULT_CONFIGS["low_water"])
+        self._pending = pending
+        self.subscribed = False
+        self._held = None
+        # Set while a message is processed or its reply is held back, during which no update is pushed, so that
+        # updates never overtake replies
+        self.busy = False
+
+        self.is_closed = False
+        self.logger = getLogger(__name__)
+
+    def __repr__(self):
+        return repr(self.writer.get_extra_info("peername"))
+
+    async def run(self, greet=True):
+        """
+        :param greet: False not to send the hello message, to a client which already received it.
+        """
+        self.logger.debug("%s connected", self)
+
+        if greet:
+            self.writer.writelines(STUHelloMessage(len(self.server.connections())).encode())
+            await self.writer.drain()
+
+        line = await self._read_line()
+
+        while line:
+            in_message = UTSMessage.parse_infer_type(line.decode(errors="replace"))
+            self.logger.debug("%s: %s", self, in_message)
+
+            if await self._hand_off(in_message, line):
+                break
+
+            # Connections of servers with no main room have no board until they join a room. Board versions are read
+            # with no lock, so they can be compared on the event loop.
+            board = self.board
+            version = board.version() if board is not None else None
+            self.busy = True
+
+            if isinstance(in_message, self.BLOCKING_MESSAGES):
+                out_message = await asyncio.get_running_loop().run_in_executor(
+                    self.server._executor, self._process_in_message, in_message
+                )
+            else:
+                out_message = self._process_in_message(in_message)
+
+            self._reply(out_message, self._has_line())
+            self.busy = self._held is not None
+
+            if self.subscribed and self.board is not board:
+                self.server.unsubscribe(self, board)
+                self.server.subscribe(self)
+            if board is not None and board.version() != version:
+                self.server.notify(board)
+
+            await self.writer.drain()
+
+            if isinstance(out_message, (STUBoomMessage, STUByeMessage)):
+                break
+
+            line = await self._read_line()
+
+        self._release()
+
+    def _has_line(self):
+        """
+        :return: True if a whole line was received and not read yet.
+        """
+        # StreamReader offers no public way to peek at its buffer
+        return b"\n" in self._pending or b"\n" in self.reader._buffer
+
+    def _write(self, buffers):
+        self.writer.writelines(buffers)
+
+    async def _read_line(self):
+        """
+        :return: the next line sent by the client, or an empty bytes object once it closed the connection. The lines
+            longer than max_line are skipped, replying an error to each, as Connection does.
+        """
+        line = b""
+
+        if self._pending:
+            line, separator, self._pending = self._pending.partition(b"\n")
+
+            if separator:
+                return line + separator
+
+        # Whether the bytes received until the next newline belong to a line longer than max_line
+        discarding = False
+
+        while True:
+            try:
+                line += await self.reader.readuntil(b"\n")
+            except asyncio.IncompleteReadError as e:
+                return b"" if discarding else line + e.partial
+            except asyncio.LimitOverrunError as e:
+                # StreamReader leaves the bytes of the line in its buffer: those received so far are dropped at once
+                await self.reader.readexactly(e.consumed)
+                line, discarding = b"", True
+                continue
+
+            if not discarding:
+                return line
+
+            self._reply(STUErrorMessage(UTSInvalidMessage.ERROR_TOO_LONG % self.server.DEFAULT_CONFIGS["max_line"]),
+                        False)
+            self.busy = False
+            await self.writer.drain()
+            line, discarding = b"", False
+
+    def can_push(self):
+        """
+        :return: False if no update can be sent to the client now, the client being waiting for a reply or slow to
+            read, True otherwise.
+        """
+        return not self.busy and \
+            self.writer.transport.get_write_buffer_size() <= self.server.DEFAULT_CONFIGS["push_limit"]
+
+    def is_outdated(self):
+        """
+        :return: True if the board of the client changed since the last board sent to it.
+        """
+        return not self.writer.is_closing() and self.board.version() != self.version
+
+    def update(self):
+        """
+        :return: the arguments of make_update() building the update to push to the client.
+        """
+        return self.board, self.version, self.deltas
+
+    @staticmethod
+    def make_update(board, since, deltas):
+        """
+        Build the update of **board** to push to a client, which may block on the board lock.
+
+        :param since: the version of the board last sent to the client.
+        :param deltas: whether the board replies of the client are in delta mode.
+        :return: a STUUpdateMessage.
+        """
+        message = STUUpdateMessage(board)
+
+        if deltas:
+            message.use_deltas(since)
+
+        return message
+
+    def push(self, message, since):
+        """
+        Send the client **message**, an update built by make_update() from the board it had when last sent the version
+        **since**.
+
+        :return: False if the update could not be sent, the client being waiting for a reply or slow to read, or having
+            been sent another board since, True otherwise.
+        """
+        if self.writer.is_closing():
+            return True
+        elif not self.can_push() or message.board is not self.board or since != self.version:
+            return False
+
+        self.version = message.snapshot.version
+        self.writer.writelines(message.encode())
+
+        return True
+
+    def _subscribe(self, subscribe):
+        if subscribe and not self.subscribed:
+            self.server.subscribe(self)
+        elif not subscribe and self.subscribed:
+            self.server.unsubscribe(self, self.board)
+
+        self.subscribed = subscribe
+
+        return STUSubscriptionMessage(subscribe)
+
+    async def _hand_off(self, in_message, line):
+        """
+        Called before processing every message, to let another server process it in place of this one.
+
+        :param line: the line **in_message** was parsed from.
+        :return: True if the connection was handed off, and must be closed here without replying, False otherwise.
+        """
+        return False
+
+    def close(self):
+        if not self.is_closed:
+            if self.subscribed:
+                self.server.unsubscribe(self, self.board)
+
+            self._leave_room()
+            self.writer.close()
+            self.is_closed = True
+
+            self.logger.debug("'%s' closed", self)
+
+
+class Supervisor:
+    """
+    Runs an AsyncMineSweeperServer in each of several forked worker processes, so that clients are served by as many
+    cores. Every worker listens on the same port with a socket of its own, through SO_REUSEPORT, the kernel spreading
+    the incoming connections among them, and the supervisor restarts the workers which die.
+
+    Each worker owns a set of rooms: the main room is owned by the first worker, and the rooms created by a client are
+    owned by the worker serving it, their names starting with its index, as "2-15". When a client sends a command for
+    a room owned by another worker, joining it or playing on the main room, the connection is handed off to the owner:
+    the client socket, along with the input received but not processed yet, is passed to it through a Unix socket
+    with send_fds(), and the owner carries on serving the client from that same command. The rooms of a worker are
+    lost when it dies, except the main room, which is recovered from its journal if there is one.
+    """
+
+    DEFAULT_CONFIGS = {
+        "host": AsyncMineSweeperServer.DEFAULT_CONFIGS["host"],
+        "workers": os.cpu_count(),
+        # Minimum number of seconds between two starts of the same worker
+        "restart_delay": 1,
+        # Maximum number of bytes of input handed off along with a connection
+        "max_hand_off": 1 << 17,
+    }
+
+    def __init__(self, board, port=AsyncMineSweeperServer.DEFAULT_CONFIGS["port"], workers=DEFAULT_CONFIGS["workers"],
+                 debug=False, journal_path=None, max_clients=AsyncMineSweeperServer.DEFAULT_CONFIGS["max_clients"],
+                 max_rooms=RoomRegistry.DEFAULT_CONFIGS["max_rooms"]):
+        """
+        :param board: the board of the main room.
+        :param port: local port where to bind the workers, or 0 for any free port.
+        :param workers: number of worker processes.
+        :param debug: debug flag for the workers.
+        :param journal_path: an optional path of the journal of **board**, which a new journal is started at. The
+            board is recovered from it when the first worker is restarted.
+        :param max_clients: maximum number of clients connected to each worker at the same time.
+        :param max_rooms: maximum number of rooms of each worker.
+        """
+        if workers <= 0:
+            raise ValueError("The number of workers must be greater than 0 (found %d)" % workers)
+
+        self._board = board
+        self.port = port
+        self.workers = workers
+        self.debug = debug
+        self.journal_path = journal_path
+        self.max_clients = max_clients
+        self.max_rooms = max_rooms
+
+        # Worker indices by process id, and start times of the workers by index
+        self._pids = dict()
+        self._started = dict()
+        self._socket = None
+        # A pair of connected Unix sockets for every worker: connections handed off to it are sent on the first one
+        # and received on the second one
+        self._channels = list()
+        self.is_closed = False
+
+        self._logger = getLogger(__name__)
+        self._logger.setLevel(DEBUG)
+        self._logger.addHandler(StreamHandler(stdout) if debug else NullHandler())
+
+    def __repr__(self):
+        return "<'%s.%s' object, port=%s, workers=%d>" % \
+               (self.__class__.__module__, self.__class__.__name__, self.port, self.workers)
+
+    def start(self):
+        """
+        Start the workers, returning once all of them are listening. Once started, the port attribute holds the port
+        they are bound to.
+        """
+        # Bound but never listening, so that the port is reserved to the workers, and known if 0 was given, without
+        # any connection being queued to this socket
+        self._socket = socket(AF_INET, SOCK_STREAM)
+        self._socket.setsockopt(SOL_SOCKET, SO_REUSEPORT, 1)
+        self._socket.bind((self.DEFAULT_CONFIGS["host"], self.port))
+        self.port = self._socket.getsockname()[1]
+        self._channels = [socketpair(AF_UNIX, SOCK_DGRAM) for i in range(self.workers)]
+
+        for index in range(self.workers):
+            self._fork(index)
+
+        self._logger.debug("Started %d workers at port %d", self.workers, self.port)
+
+    def serve_forever(self):
+        """
+        Start the workers if needed, then restart those which die until the supervisor is closed.
+        """
+        if self._socket is None:
+            self.start()
+
+        try:
+            while not self.is_closed:
+                try:
+                    pid, status = os.wait()
+                except ChildProcessError:
+                    break
+
+                index = self._pids.pop(pid, None)
+
+                if index is not None and not self.is_closed:
+                    self._logger.debug("Worker %d (pid %d) exited with status %d, restarting it", index, pid, status)
+                    sleep(max(self._started[index] + self.DEFAULT_CONFIGS["restart_delay"] - monotonic(), 0))
+                    self._fork(index, True)
+        finally:
+            self.close()
+
+    def close(self):
+        if not self.is_closed:
+            self.is_closed = True
+
+            for pid in list(self._pids):
+                try:
+                    os.kill(pid, signal.SIGTERM)
+                    os.waitpid(pid, 0)
+                except (ProcessLookupError, ChildProcessError):
+                    pass
+
+            self._pids.clear()
+
+            for channel in self._channels:
+                for end in channel:
+                    end.close()
+
+            if self._socket is not None:
+                self._socket.close()
+
+            self._logger.debug("%s was closed" % repr(self))
+
+    def pids(self):
+        """
+        :return: a dict of the process ids of the workers, by index.
+        """
+        return {index: pid for pid, index in self._pids.items()}
+
+    def _fork(self, index, restarted=False):
+        """
+        Start the worker at **index**, returning once it is listening or has exited.
+        """
+        self._started[index] = monotonic()
+        ready_in, ready_out = os.pipe()
+        pid = os.fork()
+
+        if pid == 0:
+            status = 0
+            os.close(ready_in)
+
+            try:
+                asyncio.run(self._run_worker(index, restarted, ready_out))
+            except KeyboardInterrupt:
+                pass
+            except BaseException:
+                self._logger.exception("Worker %d failed", index)
+                status = 1
+            finally:
+                os._exit(status)
+
+        self._pids[pid] = index
+        os.close(ready_out)
+
+        with open(ready_in, "rb") as ready:
+            ready.read(1)
+
+    async def _run_worker(self, index, restarted, ready):
+        """
+        Run in the worker processes.
+
+        :param ready: the file descriptor written to once the worker is listening.
+        """
+        board = journal = None
+
+        if index == 0:
+            board = self._board
+
+            if self.journal_path is not None:
+                if restarted and Journal.exists(self.journal_path):
+                    journal = Journal(self.journal_path)
+                else:
+                    journal = Journal(self.journal_path, board)
+
+                board = journal.board
+
+        server = WorkerServer(self, index, board, journal)
+        await server.start()
+
+        os.write(ready, b"\0")
+        os.close(ready)
+
+        await server.serve_forever()
+
+
+class WorkerServer(AsyncMineSweeperServer):
+    """
+    The server of a worker process of a Supervisor, which owns the rooms whose names start with its index and the main
+    room if its index is 0.
+    """
+
+    def __init__(self, supervisor: Supervisor, index, board, journal=None):
+        """
+        :param index: the index of the worker, from 0.
+        :param board: the board of the main room, or None if **index** is not 0.
+        """
+        super().__init__(board, supervisor.port, supervisor.debug, journal, supervisor.max_clients,
+                         rooms=RoomRegistry(max_rooms=supervisor.max_rooms, prefix="%d-" % index))
+        self.index = index
+        self.workers = supervisor.workers
+        self._channels = [sender for sender, receiver in supervisor._channels]
+        self._inbox = supervisor._channels[index][1]
+        # Tasks serving the connections handed off to this worker, referenced until done
+        self._adoptions = set()
+
+    def __repr__(self):
+        return "<'%s.%s' object, index=%d, port=%s, connections=%d/%d>" % \
+               (self.__class__.__module__, self.__class__.__name__, self.index, self.port, len(self._connections),
+                self.max_clients)
+
+    async def start(self):
+        await super().start()
+
+        self._inbox.setblocking(False)
+        asyncio.get_running_loop().add_reader(self._inbox.fileno(), self._receive)
+
+    def owner(self, room):
+        """
+        :return: the index of the worker owning the room named **room**. Names not matching any worker are owned by
+            this one, which replies that there is no such room.
+        """
+        if room == RoomRegistry.MAIN:
+            return 0
+
+        prefix, separator, name = room.partition("-")
+
+        if separator and prefix.isdigit() and int(prefix) < self.workers:
+            return int(prefix)
+
+        return self.index
+
+    async def hand_off(self, index, client, data, deltas=False, subscribed=False):
+        """
+        Send the socket **client** to the worker at **index**, along with **data**, the bytes received from it and not
+        processed yet. The channel of that worker blocks while full, so the socket is sent from the executor.
+
+        :param deltas: whether the board replies of the client are in delta mode.
+        :param subscribed: whether the client is subscribed to the board updates.
+        :raise: OSError if the connection cannot be sent, e.g. if **data** is too large.
+        """
+        if len(data) >= Supervisor.DEFAULT_CONFIGS["max_hand_off"]:
+            raise OSError("Cannot hand off %d bytes of input" % len(data))
+
+        buffers, fds = [bytes((deltas | subscribed << 1,)), data], [client.fileno()]
+        await asyncio.get_running_loop().run_in_executor(
+            self._executor, lambda: send_fds(self._channels[index], buffers, fds)
+        )
+
+    def _receive(self):
+        while True:
+            try:
+                data, fds, flags, address = recv_fds(self._inbox, Supervisor.DEFAULT_CONFIGS["max_hand_off"], 1)
+            except BlockingIOError:
+                return
+
+            for fd in fds:
+                task = asyncio.ensure_future(self._adopt(socket(fileno=fd), data[1:], data[0]))
+                self._adoptions.add(task)
+                task.add_done_callback(self._adoptions.discard)
+
+    async def _adopt(self, client, data, flags):
+        """
+        :param flags: the delta mode and subscription flags of the client, as sent by hand_off().
+        """
+        client.setblocking(False)
+        reader, writer = await asyncio.open_connection(sock=client, limit=self.DEFAULT_CONFIGS["max_line"])
+        connection = self._connection(reader, writer, data)
+        connection.deltas = bool(flags & 1)
+        connection.subscribed = bool(flags & 2)
+
+        if connection.subscribed:
+            self.subscribe(connection)
+
+        await self._serve(connection, False)
+
+    def _bind(self):
+        server = socket(AF_INET, SOCK_STREAM)
+        server.setsockopt(SOL_SOCKET, SO_REUSEPORT, 1)
+        server.bind((self.DEFAULT_CONFIGS["host"], self.port))
+
+        return server
+
+    def _connection(self, reader, writer, pending=b""):
+        return WorkerConnection(self, reader, writer, pending)
+
+
+class WorkerConnection(AsyncConnection):
+    """
+    A connection of a WorkerServer, handed off to the worker owning the room a command is for.
+    """
+
+    # Messages played on the board of the room of the client
+    BOARD_MESSAGES = (UTSLookMessage, UTSDigMessage, UTSFlagMessage, UTSDeflagMessage, UTSChordMessage,
+                      UTSBatchMessage, UTSHintMessage, UTSSnapshotMessage, UTSHelloMessage, UTSSubscribeMessage)
+    ERROR_HAND_OFF = "Error. The command could not be routed to its room, the connection is closed. Please reconnect."
+
+    async def _hand_off(self, in_message, line):
+        if isinstance(in_message, UTSJoinMessage):
+            owner = self.server.owner(in_message.room)
+        elif self.room is None and isinstance(in_message, self.BOARD_MESSAGES):
+            owner = 0
+        else:
+            return False
+
+        if owner == self.server.index:
+            return False
+
+        # Every reply must be sent before the owner starts writing to the client
+        self._release()
+        self.writer.transport.set_write_buffer_limits(0)
+        await self.writer.drain()
+
+        # The input read from the socket but not processed yet, reading being paused until the connection is closed
+        # so that none is read while it is sent. StreamReader offers no public way to take its buffer.
+        self.writer.transport.pause_reading()
+        data = line + self._pending + bytes(self.reader._buffer)
+
+        try:
+            await self.server.hand_off(owner, self.writer.get_extra_info("socket"), data, self.deltas,
+                                       self.subscribed)
+        except OSError:
+            self.logger.exception("%s: could not hand off to worker %d", self, owner)
+            self.writer.writelines(STUErrorMessage(self.ERROR_HAND_OFF).encode())
+
+        return True
+
 
 def main():
     configs = {
@@ -244,7 +1320,6 @@ def main():
         "port": MineSweeperServer.DEFAULT_CONFIGS["port"],
         "program_name": "Minesweeper server",
         "bomb_probability": 0.20,
-        "sleep": 2,
     }
     logger = getLogger(__name__)
     ap = ArgumentParser(configs["program_name"])
@@ -259,10 +1334,37 @@ def main():
                                 help="Value of the height and width of the grid")
     creation_group.add_argument("-f", "--file", dest="file", action="store", type=str,
                                 help="Path pointing to a board file")
+    ap.add_argument("-j", "--journal", dest="journal", action="store", type=str,
+                    help="Path of the moves journal. If it exists and neither -s nor -f are given, the board is "
+                         "recovered from it")
+    ap.add_argument("-a", "--asyncio", dest="asyncio", action="store", type=is_boolean, default=False,
+                    help="Serve the clients from an asyncio event loop rather than from a pool of threads")
+    ap.add_argument("-m", "--max-clients", dest="max_clients", action="store", type=int,
+                    default=AsyncMineSweeperServer.DEFAULT_CONFIGS["max_clients"],
+                    help="Maximum number of clients connected at the same time, in asyncio mode")
+    ap.add_argument("-w", "--workers", dest="workers", action="store", type=int, default=0,
+                    help="Number of worker processes sharing the port, each one an asyncio server owning its rooms. "
+                         "0 to serve from this process only")
+    ap.add_argument("-r", "--max-rooms", dest="max_rooms", action="store", type=int,
+                    default=RoomRegistry.DEFAULT_CONFIGS["max_rooms"],
+                    help="Maximum number of rooms clients can create")
+    ap.add_argument("-g", "--generate", dest="generate", action="store", type=is_boolean, default=False,
+                    help="Generate the boards of the rooms of standard difficulties in the background, in a pool of "
+                         "processes, rather than when the rooms are created")
+    ap.add_argument("-q", "--max-waiting", dest="max_waiting", action="store", type=int,
+                    default=MineSweeperServer.DEFAULT_CONFIGS["max_waiting"],
+                    help="Maximum number of clients waiting for a free slot once the server is full, the others being "
+                         "told that the server is busy, in threads mode")
 
     arguments = ap.parse_args(argv[1:])
-
-    if arguments.size is not None:
+    journal = None
+
+    if arguments.journal is not None and arguments.size is None and arguments.file is None and \
+            Journal.exists(arguments.journal):
+        journal = Journal(arguments.journal)
+        board = journal.board
+        logger.debug("Recovered board version %d from %s", board.version(), arguments.journal)
+    elif arguments.size is not None:
         board = Board.create_from_probability(
             arguments.size,
             arguments.size,
@@ -273,24 +1375,47 @@ def main():
     else:
         board = Board.create_from_probability(configs["size"], configs["size"])
 
-    server = MineSweeperServer(board, arguments.port, arguments.debug)
+    if arguments.workers > 0:
+        if journal is not None:
+            journal.close()
+
+        supervisor = Supervisor(board, arguments.port, arguments.workers, arguments.debug, arguments.journal,
+                                arguments.max_clients, arguments.max_rooms)
+
+        try:
+            supervisor.serve_forever()
+        except KeyboardInterrupt:
+            supervisor.close()
+
+        return
+
+    if arguments.journal is not None and journal is None:
+        journal = Journal(arguments.journal, board)
+
+    generator = BoardGenerator(queue_size=1) if arguments.generate and arguments.max_rooms > 0 else None
+    rooms = RoomRegistry(generator, arguments.max_rooms)
+
+    if arguments.asyncio:
+        server = AsyncMineSweeperServer(board, arguments.port, arguments.debug, journal, arguments.max_clients,
+                                        rooms=rooms)
+
+        try:
+            asyncio.run(server.serve_forever())
+        except KeyboardInterrupt:
+            pass
+
+        return
+
+    server = MineSweeperServer(board, arguments.port, arguments.debug, journal, rooms, arguments.max_waiting)
 
     while True:
         try:
-            if server.is_full():
-                logger.debug(
-                    "Server full (%d/%d connections occupied). Waiting for older ones to be freed...",
-                    len(server.connections()),
-                    server.max_clients
-                )
-                concurrent.futures.wait(server.futures(), None, concurrent.futures.FIRST_COMPLETED)
-                sleep(configs["sleep"])
-            else:
-                server.next_connection()
+            server.next_connection()
         except KeyboardInterrupt:
             break
 
     server.close()
 
+
 if __name__ == "__main__":
     main()
@@ -0,0 +1,467 @@
+from functools import lru_cache
+from itertools import repeat
+from random import Random
+from threading import Lock
+from weakref import WeakKeyDictionary
+
+from minesweeper.board import Board, State, _DUG, _IS_NOT_DUG
+
+
+# Number of candidate boards tried by create_no_guess() before giving up
+MAX_ATTEMPTS = 10000
+
+
+class Solver:
+    """
+    Deduces which squares of a board are safe and which are mined, by logic alone, from what players can see: the dug
+    squares and their adjacent mines counts. Flags are not trusted, as players may have placed them wrongly.
+
+    Every dug square with untouched neighbours gives a constraint: the number of mines among those neighbours.
+    Deductions are made in three steps, repeated as long as new squares are found:
+
+    1. Constraints with no mines left, or with as many mines as squares, make all of their squares safe, or mined;
+    2. Pairs of overlapping constraints are compared: when all the mines allowed by one of them beyond the other must
+       lie in its squares outside of the other, those are mines and the squares of the other outside of it are safe.
+       Subset constraints are the most common case, and their difference is added as a new constraint;
+    3. The remaining constraints are split into independent components, sharing no squares, and the components with
+       at most MAX_ENUMERATION squares are solved exactly, by enumerating all of their mines placements: squares mined
+       in none of them are safe, squares mined in all of them are mines. Results are cached by the shape of the
+       component, which often repeats within and across boards.
+
+    A Solver works on a copy of the board taken at construction, which update() brings up to date with the squares
+    dug since then, and refresh() with every change recorded by the board. Safe squares and mines deduced are
+    remembered across calls to deduce(), as long as the mines of the board are unchanged: removing a mine, as when a
+    client digs one, changes the adjacent mines counts of its neighbours, and every square deduced is then forgotten.
+    """
+
+    MAX_ENUMERATION = 20
+
+    def __init__(self, board):
+        with board._lock.read():
+            self._height, self._width = board.height(), board.width()
+            self._states, self._counts = bytearray(board._states), bytearray(board._counts)
+            # The version of the board the solver is up to date with
+            self.version = board._version
+
+        self._safe = set()
+        self._mines = set()
+        # Constraints of the dug squares, by buffer index: the frozenset of the buffer indices of their not dug
+        # neighbours, and the number of mines among them
+        self._constraints = dict()
+
+        # Constraints only come from the dug squares next to not dug ones: these are found from the rarer of the two
+        if self._states.count(_DUG) <= len(self._states) // 2:
+            self._refresh(_find_all(self._states, _DUG))
+        else:
+            self._refresh({n for index in _find_all(self._states.translate(_IS_NOT_DUG), 1)
+                           for n in self._neighbors(index)})
+
+    def __repr__(self):
+        return "<'%s.%s' object, height=%d, width=%d, constraints=%d>" % \
+               (self.__class__.__module__, self.__class__.__name__, self._height, self._width, len(self._constraints))
+
+    def update(self, board, changed):
+        """
+        Bring the solver up to date with **board**, whose squares in **changed** were dug, or had their mines removed,
+        since the solver was created or last updated.
+
+        :param changed: an iterable of (row, col) coordinates, as returned by Board.set_state().
+        :return: the version of **board** the squares were copied at.
+        """
+        indices = [row * self._width + col for row, col in changed]
+        mines_changed = False
+
+        with board._lock.read():
+            for index in indices:
+                self._states[index] = board._states[index]
+                mines_changed |= self._counts[index] != board._counts[index]
+                self._counts[index] = board._counts[index]
+
+            version = board._version
+
+        # The squares deduced from the former mines no longer hold
+        if mines_changed:
+            self._safe, self._mines = set(), set()
+
+        self._refresh({n for index in indices for n in self._neighbors(index)}.union(indices))
+
+        return version
+
+    def refresh(self, board):
+        """
+        Bring the solver up to date with every change recorded by **board** since the solver was created or last
+        refreshed, as returned by Board.changes().
+
+        :return: True if the solver is up to date, False if the changes are no longer known, in which case a new
+            Solver must be created.
+        """
+        while True:
+            version = board.version()
+            changed = board.changes(self.version, version)
+
+            if changed is None:
+                return False
+
+            self.version = version
+
+            # Squares changed while they were copied are copied again, at their latest version, by the next round
+            if self.update(board, changed) == version:
+                return True
+
+    def deduce(self, complete=True):
+        """
+        :param complete: if False, the deduction stops as soon as a safe square is found, skipping the exact
+            enumeration of the components whenever possible.
+        :return: a (safe, mines) tuple, the sets of the (row, col) coordinates of the not dug squares which are
+            respectively safe and mined, as far as they can be deduced.
+        """
+        safe, mines = self._deduce(complete)
+        width = self._width
+
+        return {divmod(i, width) for i in safe}, {divmod(i, width) for i in mines if self._states[i] != _DUG}
+
+    def hint(self):
+        """
+        :return: the (row, col) coordinates of a not dug square which is safe to dig, or None if none can be deduced.
+        """
+        safe, mines = self._deduce(False)
+
+        # Buffer indices are ordered as the coordinates of their squares
+        return divmod(min(safe), self._width) if safe else None
+
+    def _deduce(self, complete):
+        """
+        See deduce().
+
+        :return: a (safe, mines) tuple, the sets of the buffer indices of the squares deduced to be safe and mined,
+            those of the mines including dug ones.
+        """
+        safe, mines = {i for i in self._safe if self._states[i] != _DUG}, self._mines
+        constraints = set(self._constraints.values()) if complete or not safe else None
+        self._safe = safe
+
+        while constraints:
+            constraints = self._propagate(constraints, safe, mines, complete)
+
+            if (safe and not complete) or not self._enumerate(constraints, safe, mines):
+                break
+
+        return safe, mines
+
+    def _refresh(self, indices):
+        """
+        Compute again the constraints of the squares at buffer indices **indices**.
+        """
+        states, counts, constraints = self._states, self._counts, self._constraints
+
+        for index in indices:
+            if states[index] == _DUG and counts[index] > 0:
+                squares = frozenset(n for n in self._neighbors(index) if states[n] != _DUG)
+
+                if squares:
+                    constraints[index] = (squares, counts[index])
+                    continue
+
+            constraints.pop(index, None)
+
+    def _neighbors(self, index):
+        """
+        :return: the list of the buffer indices of the neighbours of the square at buffer index **index**.
+        """
+        width = self._width
+        row, col = divmod(index, width)
+
+        if 0 < row < self._height - 1 and 0 < col < width - 1:
+            return [index - width - 1, index - width, index - width + 1, index - 1, index + 1, index + width - 1,
+                    index + width, index + width + 1]
+
+        rows = range(max(row - 1, 0), min(row + 2, self._height))
+        cols = range(max(col - 1, 0), min(col + 2, width))
+
+        return [r * width + c for r in rows for c in cols if r != row or c != col]
+
+    @staticmethod
+    def _propagate(constraints, safe, mines, complete=True):
+        """
+        Apply steps 1 and 2 of the deduction until no new square is found, adding the squares found to **safe** and
+        **mines**.
+
+        :param complete: if False, stop as soon as a pass finds a safe square.
+        :return: the constraints left, restricted to the squares still unknown.
+        """
+        while True:
+            reduced = set()
+            found = False
+
+            for squares, mines_count in constraints:
+                known_mines = len(squares & mines)
+                squares = squares - safe - mines
+                mines_count -= known_mines
+
+                if not squares:
+                    continue
+                elif mines_count == 0:
+                    safe.update(squares)
+                    found = True
+                elif mines_count == len(squares):
+                    mines.update(squares)
+                    found = True
+                else:
+                    reduced.add((squares, mines_count))
+
+            constraints = reduced
+
+            if safe and not complete:
+                return constraints
+            elif found:
+                continue
+
+            by_square = dict()
+
+            for constraint in constraints:
+                for square in constraint[0]:
+                    by_square.setdefault(square, list()).append(constraint)
+
+            derived = set()
+
+            for a in constraints:
+                others = {b for square in a[0] for b in by_square[square]}
+
+                for b in others:
+                    if a is b:
+                        continue
+
+                    outside = b[0] - a[0]
+
+                    if b[1] - a[1] == len(outside):
+                        inside = a[0] - b[0]
+
+                        if outside or inside:
+                            mines.update(outside)
+                            safe.update(inside)
+                            found = True
+                    elif a[0] < b[0]:
+                        derived.add((outside, b[1] - a[1]))
+
+            if safe and not complete:
+                return constraints
+            elif found:
+                continue
+
+            derived -= constraints
+
+            if not derived:
+                return constraints
+
+            constraints |= derived
+
+    @classmethod
+    def _enumerate(cls, constraints, safe, mines):
+        """
+        Apply step 3 of the deduction, adding the squares found to **safe** and **mines**.
+
+        :return: True if any square was found.
+        """
+        parents = dict()
+
+        def find(square):
+            while parents[square] != square:
+                parents[square] = parents[parents[square]]
+                square = parents[square]
+
+            return square
+
+        for squares, mines_count in constraints:
+            for square in squares:
+                parents.setdefault(square, square)
+
+            first = find(next(iter(squares)))
+
+            for square in squares:
+                parents[find(square)] = first
+
+        components = dict()
+
+        for constraint in constraints:
+            components.setdefault(find(next(iter(constraint[0]))), list()).append(constraint)
+
+        found = False
+
+        for component in components.values():
+            squares = sorted(set().union(*(c[0] for c in component)))
+
+            if len(squares) > cls.MAX_ENUMERATION:
+                continue
+
+            local = {square: i for i, square in enumerate(squares)}
+            key = tuple(sorted((tuple(sorted(local[s] for s in c[0])), c[1]) for c in component))
+            never, always = _solve_component(len(squares), key)
+
+            safe.update(squares[i] for i in never)
+            mines.update(squares[i] for i in always)
+            found = found or len(never) > 0 or len(always) > 0
+
+        return found
+
+
+@lru_cache(maxsize=1 << 14)
+def _solve_component(size, constraints):
+    """
+    Enumerate every placement of mines over **size** squares, numbered from 0, satisfying **constraints**, a tuple of
+    (squares, mines) pairs.
+
+    :return: a (never, always) tuple, the lists of the squares mined in none and in all of the placements.
+    """
+    by_square = [list() for i in range(size)]
+    left = [mines_count for squares, mines_count in constraints]
+    free = [len(squares) for squares, mines_count in constraints]
+    mined = [0] * size
+    placement = [0] * size
+    solutions = 0
+
+    for k, (squares, mines_count) in enumerate(constraints):
+        for square in squares:
+            by_square[square].append(k)
+
+    def search(square):
+        nonlocal solutions
+
+        if square == size:
+            solutions += 1
+
+            for i in range(size):
+                mined[i] += placement[i]
+
+            return
+
+        ks = by_square[square]
+
+        for value in (0, 1):
+            for k in ks:
+                free[k] -= 1
+                left[k] -= value
+
+            if all(0 <= left[k] <= free[k] for k in ks):
+                placement[square] = value
+                search(square + 1)
+
+            for k in ks:
+                free[k] += 1
+                left[k] += value
+
+    search(0)
+
+    if solutions == 0:
+        return [], []
+
+    return [i for i in range(size) if mined[i] == 0], [i for i in range(size) if mined[i] == solutions]
+
+
+def _find_all(buffer, value):
+    """
+    :return: the list of the indices of the bytes of **buffer** equal to **value**.
+    """
+    result, index = list(), buffer.find(value)
+
+    while index != -1:
+        result.append(index)
+        index = buffer.find(value, index + 1)
+
+    return result
+
+
+# Solvers of the boards hints were asked for, and the locks guarding them, by board
+_hints = WeakKeyDictionary()
+_hints_lock = Lock()
+
+
+def hint(board):
+    """
+    :return: the hint of a Solver of **board**, as Solver.hint(). A Solver is kept for every board, and brought up to
+        date with the changes made to the board since the last hint, so that only the first hint on a large board
+        needs to scan it.
+    """
+    with _hints_lock:
+        entry = _hints.get(board)
+
+        if entry is None:
+            entry = _hints[board] = [Lock(), None]
+
+    with entry[0]:
+        if entry[1] is None or not entry[1].refresh(board):
+            entry[1] = Solver(board)
+
+        return entry[1].hint()
+
+
+def opening(board):
+    """
+    :return: the (row, col) coordinates of the square with no adjacent mines, and no bomb, closest to the centre of
+        **board**, or None if there is no such square.
+    """
+    height, width = board.height(), board.width()
+    center_row, center_col = height // 2, width // 2
+    mines, counts = board._mines, board._counts
+    candidates = [(abs(row - center_row) + abs(col - center_col), row, col) for row, col in map(divmod, (
+        i for i in range(height * width) if not mines[i] and not counts[i]), repeat(width))]
+
+    return min(candidates)[1:] if candidates else None
+
+
+def solve(board):
+    """
+    Play **board** by logic alone: dig its opening (see opening()) if nothing is dug yet, then keep digging the squares
+    the Solver deduces as safe.
+
+    :return: True if all the squares without a bomb were dug, False if a guess would be needed to go on.
+    """
+    if board.dug_count() == 0:
+        start = opening(board)
+
+        if start is None:
+            return False
+
+        board.set_state(*start, State.DUG)
+
+    solver = Solver(board)
+
+    while not board.is_won():
+        safe, mines = solver.deduce(False)
+
+        if not safe:
+            return False
+
+        changed = set()
+
+        for row, col in safe:
+            changed.update(board.set_state(row, col, State.DUG))
+
+        solver.update(board, changed)
+
+    return True
+
+
+def create_no_guess(difficulty=Board.DIFF_EASY, seed=None, attempts=MAX_ATTEMPTS):
+    """
+    Create a board solvable by logic alone, trying boards created from seeds derived from **seed** until one is found.
+    The returned board has its opening already dug, so that players can start without guessing as well.
+
+    :param attempts: maximum number of boards tried.
+    :return: a new Board instance.
+    :raise: ValueError if none of the boards tried can be solved by logic alone.
+    """
+    height, width, mines = Board.check_difficulty(difficulty)
+
+    for attempt in range(attempts):
+        candidate_seed = None if seed is None else Random("%d:%d" % (seed, attempt)).getrandbits(64)
+        board = Board.create_from_difficulty(difficulty, candidate_seed)
+
+        if solve(board):
+            result = Board._from_buffer(height, width, bytearray(board._mines), bytearray(board._counts), board.seed,
+                                        board.mines_count())
+            result.set_state(*opening(result), State.DUG)
+
+            return result
+
+    raise ValueError("No board of difficulty %s solvable by logic alone was found in %d attempts" %
+                     (difficulty, attempts))
@@ -0,0 +1,145 @@
+from collections import deque
+from itertools import islice
+
+
+class SocketStream:
+    """
+    Buffered reads and writes over a blocking socket. Lines are split out of large reads, rather than read one byte at
+    a time, and writes always complete: the buffers written are queued and sent in order with sendmsg(), which
+    gathers any number of them, such as the header and the body of a reply, in a single system call, sending again
+    what a partial send left over.
+
+    Written bytes are only sent once the queue exceeds the high water mark, down to the low water mark, or when the
+    stream is flushed, which readline() does before waiting for the peer. The replies to commands received together
+    are therefore sent together, while a peer not reading its replies blocks the writer once high_water bytes are
+    queued.
+
+    Lines longer than max_line are discarded as they are received, so that a peer never sending a newline cannot make
+    the input buffer grow without bounds.
+
+    Thread safety argument:\n
+    A SocketStream is not thread-safe. It is meant to be used by the single thread serving its socket.
+    """
+
+    DEFAULT_CONFIGS = {
+        # Bytes received at most per system call
+        "read_size": 1 << 16,
+        # Length of the longest line accepted
+        "max_line": 1 << 16,
+        # Bytes queued beyond which writes block, until as few as low_water are left
+        "high_water": 1 << 18,
+        "low_water": 1 << 16,
+    }
+    # Buffers gathered at most per system call, the least IOV_MAX guaranteed by POSIX being 16
+    MAX_BUFFERS = 16
+
+    def __init__(self, sock, high_water=DEFAULT_CONFIGS["high_water"], low_water=DEFAULT_CONFIGS["low_water"],
+                 max_line=DEFAULT_CONFIGS["max_line"], read_size=DEFAULT_CONFIGS["read_size"]):
+        """
+        :param sock: a connected, blocking socket.
+        :raise: ValueError if **low_water** exceeds **high_water**.
+        """
+        if low_water > high_water:
+            raise ValueError("The low water mark %d exceeds the high water mark %d" % (low_water, high_water))
+
+        self.socket = sock
+        self.high_water = high_water
+        self.low_water = low_water
+        self.max_line = max_line
+        self.read_size = read_size
+        self._input = bytearray()
+        # Length of the prefix of self._input known to contain no newline
+        self._scanned = 0
+        # Whether the bytes received until the next newline belong to a line longer than max_line
+        self._discarding = False
+        self._output = deque()
+        self._buffered = 0
+
+    def __repr__(self):
+        return "<'%s.%s' object, input=%d, output=%d>" % \
+               (self.__class__.__module__, self.__class__.__name__, len(self._input), self._buffered)
+
+    def buffered(self):
+        """
+        :return: the number of bytes written and not sent yet.
+        """
+        return self._buffered
+
+    def has_line(self):
+        """
+        :return: True if a whole line was received and not read yet, so that readline() would return it at once.
+        """
+        return self._input.find(b"\n", self._scanned) >= 0
+
+    def readline(self):
+        """
+        Read the next line, flushing the bytes written first if it was not received yet.
+
+        :return: the next line received, newline included, or the last bytes received if the peer closed the
+            connection without ending them with a newline. An empty bytes object once the peer closed the connection.
+        :raise: ValueError if the next line is longer than max_line, once it was received and discarded whole, so
+            that the following line can be read next.
+        """
+        while True:
+            end = self._input.find(b"\n", self._scanned)
+
+            if end >= 0:
+                line = bytes(self._input[:end + 1])
+                del self._input[:end + 1]
+                self._scanned = 0
+
+                if self._discarding or end > self.max_line:
+                    self._discarding = False
+                    raise ValueError("Received a line longer than %d bytes" % self.max_line)
+
+                return line
+            elif len(self._input) > self.max_line:
+                self._input.clear()
+                self._discarding = True
+
+            self._scanned = len(self._input)
+            self.flush()
+            data = self.socket.recv(self.read_size)
+
+            if not data:
+                line = b"" if self._discarding else bytes(self._input)
+                self._input.clear()
+                self._scanned = 0
+                self._discarding = False
+
+                return line
+
+            self._input += data
+
+    def write(self, buffers):
+        """
+        Queue **buffers** to be sent in order, sending the queued bytes down to the low water mark if they exceed the
+        high water mark.
+
+        :param buffers: an iterable of bytes-like objects.
+        """
+        for buffer in buffers:
+            if buffer:
+                self._output.append(buffer)
+                self._buffered += len(buffer)
+
+        if self._buffered > self.high_water:
+            self.flush(self.low_water)
+
+    def flush(self, limit=0):
+        """
+        Send the queued bytes, blocking until at most **limit** of them are left.
+        """
+        while self._buffered > limit:
+            sent = self.socket.sendmsg(list(islice(self._output, self.MAX_BUFFERS)))
+            self._buffered -= sent
+
+            while sent:
+                head = self._output[0]
+
+                if len(head) <= sent:
+                    self._output.popleft()
+                    sent -= len(head)
+                else:
+                    self._output[0] = memoryview(head)[sent:]
+                    sent = 0
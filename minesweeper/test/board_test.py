@@ -1,10 +1,13 @@
+import os
 import unittest
 from concurrent.futures import ALL_COMPLETED
 from concurrent.futures import ThreadPoolExecutor
 from concurrent.futures import wait
 from unittest import TestCase, SkipTest
-from random import randint
+from random import randint, Random
+from tempfile import NamedTemporaryFile
 from minesweeper.board import *
+from minesweeper import vectorized
 
 
 class BoardTest(TestCase):
@@ -90,6 +93,329 @@ class BoardTest(TestCase):
                 root + file
             )
 
+    def test_from_file_newlines(self):
+        """
+        Tests that board files are read the same regardless of their newline convention and of a final newline.
+        """
+        lines = ["0 1 1", "1 0 0", "0 0 1"]
+        expected = [True if i == "1" else False for line in lines for i in line.split(" ")]
+
+        for newline, end in (("\n", "\n"), ("\r\n", "\r\n"), ("\r", ""), ("\n", "")):
+            with NamedTemporaryFile("w", suffix=".ms", newline="", delete=False) as f:
+                f.write(newline.join(lines) + end)
+
+            try:
+                self.assertEqual(expected, [s.has_bomb for s in Board.create_from_file(f.name)])
+            finally:
+                os.remove(f.name)
+
+    def test_square_view(self):
+        """
+        Tests that Square instances obtained in different ways are views over the same board cell.
+        """
+        b = Board([[False, True], [False, False]])
+        square = b.square(1, 0)
+
+        square.state = State.FLAGGED
+        b.square(0, 1).has_bomb = False
+
+        self.assertEqual(State.FLAGGED, b.square(1, 0).state)
+        self.assertEqual(State.FLAGGED, [s for s in b][2].state)
+        self.assertEqual(0, b.mines_count())
+        self.assertEqual((1, 0), (square.row, square.col))
+        self.assertRaises(IndexError, b.square, 2, 0)
+
+    def test_adjacent_mines(self):
+        """
+        Tests that the adjacent mines counts are correct after creation and after the removal of a mine, as done by
+        the server when a mine is dug.
+        """
+        b = Board.create_from_difficulty(Board.DIFF_HARD)
+
+        def expected_count(square):
+            return len([n for n in b.neighbors(square.row, square.col) if n.has_bomb])
+
+        for s in b:
+            self.assertEqual(expected_count(s), b.adjacent_mines(s.row, s.col))
+
+        for s in [s for s in b if s.has_bomb][:10]:
+            s.has_bomb = False
+
+        for s in b:
+            self.assertEqual(expected_count(s), b.adjacent_mines(s.row, s.col))
+
+    def test_set_state_reveal(self):
+        """
+        Tests that digging a square with no adjacent mines reveals a region far larger than the recursion limit, and
+        that set_state() returns exactly the squares it changed.
+        """
+        size = 300
+        # A mine on the center square, unlike one next to a corner, leaves no safe square out of the revealed region
+        b = Board([[row == col == size // 2 for col in range(size)] for row in range(size)])
+        mine = b.square(size // 2, size // 2)
+        start = b.square(0, 0)
+
+        b.set_state(mine.row, mine.col, State.FLAGGED)
+        changed = b.set_state(start.row, start.col, State.DUG)
+
+        self.assertEqual(len(b) - 1, len(changed))
+        self.assertEqual({(s.row, s.col) for s in b if s.state == State.DUG}, changed)
+        self.assertEqual(set(), b.set_state(start.row, start.col, State.DUG))
+        self.assertEqual({(mine.row, mine.col)}, b.set_state(mine.row, mine.col, State.UNTOUCHED))
+
+    def test_render_cache(self):
+        """
+        Tests that rendering a board after some mutations gives the same result as rendering, with an empty render
+        cache, a copy of it having the same squares.
+        """
+        b = Board.create_from_difficulty(Board.DIFF_HARD)
+        str(b)
+
+        b.set_state(0, 0, State.FLAGGED)
+        b.set_state(b.height() - 1, b.width() - 1, State.DUG)
+        [s for s in b if s.has_bomb][0].has_bomb = False
+        rendered = str(b)
+
+        copy = Board([[s.has_bomb for s in b][row * b.width():(row + 1) * b.width()] for row in range(b.height())])
+
+        for s in b:
+            copy.square(s.row, s.col).state = s.state
+
+        self.assertEqual(str(copy), rendered)
+
+    def test_snapshot(self):
+        """
+        Tests that snapshots are versioned, immutable, and share the rows which did not change between versions.
+        """
+        b = Board.create_from_difficulty(Board.DIFF_HARD)
+        first = b.snapshot()
+        rendered = str(first)
+
+        self.assertIs(first, b.snapshot())
+
+        b.set_state(1, 1, State.FLAGGED)
+        second = b.snapshot()
+
+        self.assertGreater(second.version, first.version)
+        self.assertEqual(rendered, str(first))
+        self.assertEqual(str(b), str(second))
+        self.assertNotEqual(first.rows[1], second.rows[1])
+        self.assertIs(first.rows[5], second.rows[5])
+
+        b.set_state(1, 1, State.FLAGGED)
+        self.assertIs(second, b.snapshot())
+
+    def test_seed(self):
+        """
+        Tests that boards created with the same seed have the same mines.
+        """
+        def mines(board):
+            return [s.has_bomb for s in board]
+
+        self.assertEqual(mines(Board.create_from_difficulty(Board.DIFF_HARD, 5)),
+                         mines(Board.create_from_difficulty(Board.DIFF_HARD, 5)))
+        self.assertEqual(mines(Board.create_from_probability(20, 30, 0.2, 5)),
+                         mines(Board.create_from_probability(20, 30, 0.2, 5)))
+
+    def test_chord(self):
+        """
+        Tests that chording digs the same squares as digging the unflagged neighbours one by one, and only when the
+        flagged neighbours match the adjacent mines count.
+        """
+        b = Board.create_from_difficulty((30, 30, 120), 8)
+        copy = Board._from_buffer(b.height(), b.width(), bytearray(b._mines))
+        numbers = [s for s in b if not s.has_bomb and b.adjacent_mines(s.row, s.col) > 0]
+
+        for s in numbers[:40]:
+            for board in (b, copy):
+                board.set_state(s.row, s.col, State.DUG)
+
+            flagged = [n for n in b.neighbors(s.row, s.col) if n.state == State.FLAGGED]
+
+            if len(flagged) < b.adjacent_mines(s.row, s.col):
+                self.assertEqual(set(), b.chord(s.row, s.col))
+
+            for n in b.neighbors(s.row, s.col):
+                if n.has_bomb:
+                    b.set_state(n.row, n.col, State.FLAGGED)
+                    copy.set_state(n.row, n.col, State.FLAGGED)
+
+            expected = set()
+
+            for n in copy.neighbors(s.row, s.col):
+                if n.state == State.UNTOUCHED:
+                    expected.update(copy.set_state(n.row, n.col, State.DUG))
+
+            self.assertEqual(expected, b.chord(s.row, s.col))
+            self.assertEqual(str(copy), str(b))
+            self.assertEqual((copy.dug_count(), copy.flagged_count()), (b.dug_count(), b.flagged_count()))
+
+        s = [s for s in numbers[40:] if not any(n.state == State.FLAGGED for n in b.neighbors(s.row, s.col))][0]
+        wrong = [n for n in b.neighbors(s.row, s.col) if not n.has_bomb][:b.adjacent_mines(s.row, s.col)]
+        b.set_state(s.row, s.col, State.DUG)
+
+        for n in wrong:
+            b.set_state(n.row, n.col, State.FLAGGED)
+
+        b.chord(s.row, s.col)
+
+        self.assertTrue(all(n.state == State.DUG for n in b.neighbors(s.row, s.col) if n.has_bomb))
+
+    def test_changes(self):
+        """
+        Tests that the squares changed between two versions include all those rendered differently, and that they are
+        unknown once the mutations in between are forgotten.
+        """
+        random = Random(4)
+        b = Board.create_from_difficulty((20, 20, 60), 4)
+        snapshots = {b.version(): b.snapshot()}
+
+        for i in range(300):
+            row, col = random.randrange(20), random.randrange(20)
+            move = random.randrange(4)
+
+            if move == 0:
+                b.set_state(row, col, State.DUG)
+            elif move == 1:
+                b.set_state(row, col, random.choice((State.FLAGGED, State.UNTOUCHED)))
+            elif move == 2:
+                b.chord(row, col)
+            else:
+                b.square(row, col).has_bomb = False
+
+            snapshots[b.version()] = b.snapshot()
+
+        for i in range(100):
+            since, until = sorted(random.sample(list(snapshots), 2))
+            changes = b.changes(since, until)
+            old, new = snapshots[since], snapshots[until]
+
+            self.assertEqual(set(), {(r, c) for r in range(20) for c in range(20)
+                                     if old.square(r, c) != new.square(r, c)} - changes)
+
+        self.assertEqual(set(), b.changes(b.version()))
+        self.assertIsNone(b.changes(b.version() - Board.CHANGES_LOG - 1))
+
+        b.toggle_dug()
+        self.assertIsNone(b.changes(b.version() - 1))
+
+    def test_changes_bounded(self):
+        """
+        Tests that the squares changed by a mutation larger than the log are not remembered, and that the log never
+        holds more than CHANGES_LOG_SQUARES squares.
+        """
+        side = 300
+        b = Board([[r == c == 0 for c in range(side)] for r in range(side)])
+        b.set_state(0, 1, State.FLAGGED)
+        version = b.version()
+        b.set_state(side - 1, side - 1, State.DUG)
+
+        self.assertGreater(b.dug_count(), Board.CHANGES_LOG_SQUARES)
+        self.assertIsNone(b.changes(version))
+        self.assertEqual({(0, 1)}, b.changes(version - 1, version))
+
+        for row in range(1, side):
+            b.set_state(row, 0, State.FLAGGED)
+
+        self.assertEqual({(row, 0) for row in range(1, side)}, b.changes(b.version() - side + 1))
+        self.assertLessEqual(b._logged_squares, Board.CHANGES_LOG_SQUARES)
+        self.assertEqual(b._logged_squares, sum(len(s) for v, s in b._changes if s is not None))
+
+    def test_counters(self):
+        """
+        Tests that the squares counters match those computed by scanning the board, through digs, flags, reveals,
+        mine removals and toggles, and that the game is won once all the squares without a bomb are dug.
+        """
+        b = Board.create_from_difficulty((30, 30, 60), 2)
+        random = Random(4)
+
+        def check():
+            squares = [s for s in b]
+
+            self.assertEqual(len([s for s in squares if s.has_bomb]), b.mines_count())
+            self.assertEqual(len([s for s in squares if s.state == State.DUG]), b.dug_count())
+            self.assertEqual(len([s for s in squares if s.state == State.FLAGGED]), b.flagged_count())
+            self.assertEqual(len([s for s in squares if not s.has_bomb and s.state != State.DUG]), b.safe_remaining())
+
+        check()
+
+        for i in range(200):
+            row, col = random.randrange(b.height()), random.randrange(b.width())
+            b.set_state(row, col, random.choice([State.DUG, State.FLAGGED, State.FLAGGED, State.UNTOUCHED]))
+
+            if i % 20 == 0:
+                b.square(row, col).has_bomb = not b.square(row, col).has_bomb
+            if i % 50 == 0:
+                b.toggle_dug()
+
+            check()
+
+        for s in b:
+            # Reveals may dig every safe square left before the loop is over
+            if not s.has_bomb and s.state != State.DUG:
+                self.assertFalse(b.is_won())
+                b.set_state(s.row, s.col, State.DUG)
+
+        check()
+        self.assertTrue(b.is_won())
+
+    def test_save_load(self):
+        """
+        Tests that a board saved in the binary format is loaded back with the same mines, states, seed and version,
+        and that damaged files are rejected.
+        """
+        b = Board.create_from_difficulty((37, 45, 200), 11)
+        b.set_state(0, 0, State.FLAGGED)
+        b.set_state(36, 44, State.DUG)
+        b.set_state(20, 3, State.DUG)
+
+        with NamedTemporaryFile(suffix=".msb", delete=False) as f:
+            pass
+
+        try:
+            b.save(f.name)
+            loaded = Board.load(f.name)
+
+            self.assertEqual(str(b), str(loaded))
+            self.assertEqual([s.has_bomb for s in b], [s.has_bomb for s in loaded])
+            self.assertEqual((11, b.version()), (loaded.seed, loaded.version()))
+            self.assertEqual(b._counts, loaded._counts)
+
+            with open(f.name, "r+b") as data:
+                data.seek(Board._FILE_HEADER.size)
+                flipped = data.read(1)[0] ^ 1
+                data.seek(Board._FILE_HEADER.size)
+                data.write(bytes([flipped]))
+
+            self.assertRaises(ValueError, Board.load, f.name)
+
+            with open(f.name, "wb") as data:
+                data.write(b"0 1\n1 0\n" * 10)
+
+            self.assertRaises(ValueError, Board.load, f.name)
+        finally:
+            os.remove(f.name)
+
+    def test_vectorized(self):
+        """
+        Tests that boards generated with NumPy have the expected mines and adjacent mines counts.
+        """
+        if not vectorized.available():
+            raise SkipTest("NumPy is not installed")
+
+        height, width, mines = 300, 200, 9000
+        b = Board.create_from_difficulty((height, width, mines))
+        expected = Board._from_buffer(height, width, bytearray(b._mines))
+
+        self.assertEqual(mines, b.mines_count())
+        self.assertEqual(expected._counts, b._counts)
+
+        b = Board.create_from_probability(height, width, 0.3)
+        expected = Board._from_buffer(height, width, bytearray(b._mines))
+
+        self.assertAlmostEqual(0.3, b.mines_count() / len(b), 1)
+        self.assertEqual(expected._counts, b._counts)
+
     def test_thread_safety(self):
         configs = {
             "threads": 35,
@@ -0,0 +1,104 @@
+import unittest
+from os import path
+from random import Random
+from tempfile import TemporaryDirectory
+from minesweeper.board import Board, State
+from minesweeper.chunked import ChunkedBoard
+
+
+class ChunkedBoardTest(unittest.TestCase):
+
+    def test_deterministic(self):
+        """
+        Tests that the mines of a ChunkedBoard depend on its seed only, and that reading them stores no chunk.
+        """
+        a, b = ChunkedBoard(100, 150, seed=42, chunk_size=16), ChunkedBoard(100, 150, seed=42, chunk_size=16)
+        mines = [s.has_bomb for s in a]
+
+        self.assertEqual(mines, [s.has_bomb for s in b])
+        self.assertNotEqual(mines, [s.has_bomb for s in ChunkedBoard(100, 150, seed=43, chunk_size=16)])
+        self.assertEqual(0, a.chunks_count())
+        self.assertEqual(len([m for m in mines if m]), a.mines_count())
+
+    def test_same_as_board(self):
+        """
+        Tests that a ChunkedBoard behaves as a Board with the same mines, when digging, chording, flagging and removing
+        mines across chunk boundaries, and that it keeps the same counts of squares.
+        """
+        random = Random(0)
+        chunked = ChunkedBoard(45, 70, bomb_probability=0.08, seed=7, chunk_size=8)
+        board = Board([[chunked.square(row, col).has_bomb for col in range(chunked.width())]
+                       for row in range(chunked.height())])
+
+        for i in range(60):
+            row, col = random.randrange(board.height()), random.randrange(board.width())
+            state = random.choice([State.DUG, State.DUG, State.FLAGGED])
+
+            self.assertEqual(board.set_state(row, col, state), chunked.set_state(row, col, state))
+
+            if state == State.DUG and board.square(row, col).has_bomb:
+                board.square(row, col).has_bomb = False
+                chunked.square(row, col).has_bomb = False
+
+            self.assertEqual(str(board), str(chunked))
+            self.assertEqual((board.mines_count(), board.dug_count(), board.flagged_count(), board.safe_remaining()),
+                             (chunked.mines_count(), chunked.dug_count(), chunked.flagged_count(),
+                              chunked.safe_remaining()))
+
+        for s in [s for s in board if s.state == State.DUG and board.adjacent_mines(s.row, s.col)][::10]:
+            for n in board.neighbors(s.row, s.col):
+                if n.has_bomb:
+                    board.set_state(n.row, n.col, State.FLAGGED)
+                    chunked.set_state(n.row, n.col, State.FLAGGED)
+
+            self.assertEqual(board.chord(s.row, s.col), chunked.chord(s.row, s.col))
+
+        self.assertEqual(str(board), str(chunked))
+        self.assertEqual((board.dug_count(), board.flagged_count(), board.safe_remaining()),
+                         (chunked.dug_count(), chunked.flagged_count(), chunked.safe_remaining()))
+
+        for s in board:
+            self.assertEqual(board.adjacent_mines(s.row, s.col), chunked.adjacent_mines(s.row, s.col))
+
+    def test_save_and_toggle(self):
+        """
+        Tests that a ChunkedBoard is saved as a Board with the same squares, and that toggle_dug() leaves the squares
+        outside of the board untouched.
+        """
+        chunked = ChunkedBoard(20, 30, bomb_probability=0.1, seed=3, chunk_size=8)
+
+        with chunked.atomic():
+            chunked.set_state(0, 0, State.FLAGGED)
+            chunked.set_state(19, 29, State.DUG)
+
+        with TemporaryDirectory() as directory:
+            self.assertEqual(chunked.version(), chunked.save(path.join(directory, "board")))
+            board = Board.load(path.join(directory, "board"))
+
+        self.assertEqual(str(chunked), str(board))
+        self.assertEqual([s.has_bomb for s in chunked], [s.has_bomb for s in board])
+
+        chunked.toggle_dug()
+        board.toggle_dug()
+
+        self.assertEqual(str(board), str(chunked))
+        self.assertEqual((board.dug_count(), board.flagged_count(), board.is_won()),
+                         (chunked.dug_count(), chunked.flagged_count(), chunked.is_won()))
+        self.assertEqual(12, chunked.chunks_count())
+
+    def test_lazy_chunks(self):
+        """
+        Tests that a huge board can be created, and that only the chunks where squares are modified are stored.
+        """
+        board = ChunkedBoard(10 ** 9, 10 ** 9, bomb_probability=0.01, seed=1)
+
+        board.set_state(10 ** 8, 10 ** 8, State.FLAGGED)
+        board.set_state(10 ** 9 - 1, 10 ** 9 - 1, State.FLAGGED)
+
+        self.assertEqual(2, board.chunks_count())
+        self.assertEqual(State.FLAGGED, board.square(10 ** 8, 10 ** 8).state)
+        self.assertEqual(State.UNTOUCHED, board.square(10 ** 8, 10 ** 8 + 1).state)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,57 @@
+import unittest
+from minesweeper.board import Board
+from minesweeper.generator import BoardGenerator
+
+
+class BoardGeneratorTest(unittest.TestCase):
+
+    def test_deterministic(self):
+        """
+        Tests that the boards handed out by generators with the same seed are the same, for standard and custom
+        difficulties, and that they are those created from the advertised seeds.
+        """
+        custom = (20, 25, 70)
+        a, b = BoardGenerator(7, queue_size=2, workers=2), BoardGenerator(7, queue_size=3, workers=2)
+
+        try:
+            for difficulty in (Board.DIFF_HARD, custom, Board.DIFF_HARD, Board.DIFF_HARD, custom):
+                board = a.board(difficulty)
+
+                self.assertEqual(str(board), str(b.board(difficulty)))
+                self.assertEqual(difficulty, (board.height(), board.width(), board.mines_count()))
+
+            expected = Board.create_from_difficulty(custom, a.board_seed(custom, 2))
+            board = a.board(custom)
+
+            self.assertEqual([s.has_bomb for s in expected], [s.has_bomb for s in board])
+            self.assertEqual(expected.seed, board.seed)
+        finally:
+            a.close()
+            b.close()
+
+    def test_bounded_queue(self):
+        """
+        Tests that no more boards than the queue size are kept for a difficulty, that no board is queued for the
+        difficulties the generator is not configured with, and that invalid difficulties are rejected at once.
+        """
+        generator = BoardGenerator(queue_size=2, difficulties=(Board.DIFF_EASY,), workers=1)
+
+        try:
+            generator.board(Board.DIFF_EASY)
+            generator._queues[Board.DIFF_EASY][-1].result()
+
+            self.assertEqual(2, generator.queued(Board.DIFF_EASY))
+            self.assertEqual(0, generator.queued(Board.DIFF_HARD))
+
+            generator.board(Board.DIFF_HARD)
+            self.assertEqual(0, generator.queued(Board.DIFF_HARD))
+            self.assertEqual([Board.DIFF_EASY], list(generator._queues))
+            self.assertRaises(ValueError, generator.board, (3, 3, 9))
+        finally:
+            generator.close()
+
+        self.assertRaises(RuntimeError, generator.board, Board.DIFF_EASY)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,107 @@
+import os
+import unittest
+from concurrent.futures import ThreadPoolExecutor, wait, ALL_COMPLETED
+from random import Random
+from tempfile import TemporaryDirectory
+from minesweeper.board import Board
+from minesweeper.journal import Journal, DIG, FLAG, DEFLAG, CHORD
+
+
+class JournalTest(unittest.TestCase):
+
+    @staticmethod
+    def play_random(journal, seed, moves):
+        random = Random(seed)
+        board = journal.board
+
+        for i in range(moves):
+            journal.play(random.choice([DIG, FLAG, FLAG, DEFLAG, CHORD]), random.randrange(board.height()),
+                         random.randrange(board.width()))
+
+    def assertSameBoard(self, expected, actual):
+        self.assertEqual(str(expected), str(actual))
+        self.assertEqual([s.has_bomb for s in expected], [s.has_bomb for s in actual])
+        self.assertEqual(expected.version(), actual.version())
+
+    def test_recover(self):
+        """
+        Tests that a board played by concurrent threads, with compactions in between, is recovered exactly, and that
+        the threads share the flushes of the journal.
+        """
+        with TemporaryDirectory() as directory:
+            path = os.path.join(directory, "journal")
+            journal = Journal(path, Board.create_from_difficulty((40, 40, 300), 3), compact_every=100)
+            executor = ThreadPoolExecutor(8)
+
+            wait([executor.submit(self.play_random, journal, i, 150) for i in range(8)], None, ALL_COMPLETED)
+            executor.shutdown()
+            journal.close()
+
+            self.assertLessEqual(journal.flushes, 8 * 150)
+            self.assertTrue(Journal.exists(path))
+            self.assertSameBoard(journal.board, Journal(path).board)
+
+            journal.compact()
+            recovered = Journal(path)
+            self.assertSameBoard(journal.board, recovered.board)
+            recovered.close()
+
+    def test_interrupted_start(self):
+        """
+        Tests that a new journal interrupted by a crash once its snapshot was written recovers the new board, with none
+        of the moves of the former journal at the same path.
+        """
+        with TemporaryDirectory() as directory:
+            path = os.path.join(directory, "journal")
+            journal = Journal(path, Board.create_from_difficulty(Board.DIFF_HARD, 5))
+            self.play_random(journal, 0, 50)
+            journal.close()
+
+            board = Board.create_from_difficulty(Board.DIFF_EASY, 6)
+            board.save(path + ".snapshot.new")
+            recovered = Journal(path)
+
+            self.assertSameBoard(board, recovered.board)
+            self.assertEqual(0, os.path.getsize(path))
+            self.assertFalse(os.path.exists(path + ".snapshot.new"))
+            recovered.close()
+
+    def test_torn_record(self):
+        """
+        Tests that an incomplete last record is discarded at recovery, and that the journal can be appended to
+        afterwards.
+        """
+        with TemporaryDirectory() as directory:
+            path = os.path.join(directory, "journal")
+            journal = Journal(path, Board.create_from_difficulty(Board.DIFF_HARD, 5))
+            self.play_random(journal, 0, 50)
+            journal.close()
+
+            with open(path, "ab") as f:
+                f.write(b"%d dig 3" % (journal.board.version() + 1))
+
+            recovered = Journal(path)
+            self.assertSameBoard(journal.board, recovered.board)
+
+            self.play_random(recovered, 1, 50)
+            recovered.close()
+            self.assertSameBoard(recovered.board, Journal(path).board)
+
+    def test_new_journal(self):
+        """
+        Tests that starting a journal for a new board discards the moves of the previous one.
+        """
+        with TemporaryDirectory() as directory:
+            path = os.path.join(directory, "journal")
+            journal = Journal(path, Board.create_from_difficulty(Board.DIFF_HARD, 5))
+            self.play_random(journal, 0, 50)
+            journal.close()
+
+            board = Board.create_from_difficulty(Board.DIFF_INTERMEDIATE, 6)
+            Journal(path, board).close()
+
+            self.assertSameBoard(board, Journal(path).board)
+
+
+if __name__ == "__main__":
+    unittest.main()
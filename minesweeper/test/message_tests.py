@@ -1,6 +1,8 @@
 #!/usr/bin/python3.2
 
+import json
 import unittest
+from minesweeper.board import Board, State
 from minesweeper.message import *
 
 
@@ -13,7 +15,7 @@ class UTSMessageTest(unittest.TestCase):
         type.
         """
         factory_strings = ("look", "dig 5 2", "flag 6 2", "deflag 3 6",
-                           "help", "bye")
+                           "help", "bye", "hint")
         message_classes = UTSMessage.message_types
 
         for string, mclass in zip(factory_strings, message_classes):
@@ -24,6 +26,70 @@ class UTSMessageTest(unittest.TestCase):
                 mclass
             )
 
+    def test_parse_corpus(self):
+        """
+        Parses every line of a fuzz corpus, valid commands and near misses, checking that each one is parsed into the
+        same message its entry records, as parsed by trying every message type in turn. The corpus was recorded from
+        that former parser, which no longer exists, and is therefore frozen: its entries must not be regenerated, but
+        only updated where the grammar is changed on purpose, as for the batches ending with a look command.
+        """
+        def describe(message):
+            result = [type(message).__name__, message.get_representation()]
+
+            if isinstance(message, UTSBatchMessage):
+                result.append([describe(item) for item in message.items])
+
+            return result
+
+        with open("./assets/parse_corpus.json") as f:
+            corpus = json.load(f)
+
+        for line, expected in corpus:
+            self.assertEqual(expected, describe(UTSMessage.parse_infer_type(line)), repr(line))
+
+    def test_batch_ending_with_look(self):
+        """
+        Tests that a batch ending with a look command is parsed as a batch, not as a look request, and that the look
+        command is rejected as not batchable.
+        """
+        message = UTSMessage.parse_infer_type("batch dig 1 2; look\n")
+
+        self.assertIsInstance(message, UTSBatchMessage)
+        self.assertEqual([UTSDigMessage, UTSLookMessage], [type(i) for i in message.items])
+        self.assertEqual([(1, UTSBatchMessage.ERROR_ITEM % (2, "look", UTSBatchMessage.ERROR_NOT_BATCHABLE))],
+                         message.find_item_errors(Board.create_from_difficulty((3, 3, 1), 0)))
+        self.assertIsInstance(UTSMessage.parse_infer_type("dig 1 2 look"), UTSLookMessage)
+
+    def test_slots(self):
+        """
+        Checks that the parsed messages carry no instance dictionary.
+        """
+        for string in ("look", "dig 5 2", "batch flag 1 2; dig 3 4", "join 1", "hello delta", "dance"):
+            self.assertFalse(hasattr(UTSMessage.parse_infer_type(string), "__dict__"), string)
+
+
+class STUMessageTest(unittest.TestCase):
+
+    def test_encode(self):
+        """
+        Tests that the buffers a message is encoded into join into its encoded representation, and that the messages
+        of the same board version share the encoded board.
+        """
+        board = Board([[False, True, False], [False, False, False], [True, False, False]])
+        deltas = STUBoardMessage(board)
+        deltas.use_deltas(None)
+        board.set_state(0, 0, State.FLAGGED)
+        since = STUBoardMessage(board)
+        since.use_deltas(deltas.snapshot.version)
+        messages = (STUBoardMessage(board), STUWonMessage(board), STURoomMessage("1", board), deltas, since,
+                    STUBatchMessage(board, ["Command 1, 'dig 9 9': out"], True), STUBatchMessage(board, []),
+                    STUUpdateMessage(board), STUBoomMessage(), STUHelloMessage(3), STUErrorMessage("Error."))
+
+        for message in messages:
+            self.assertEqual(message.get_representation().encode(), b"".join(message.encode()), type(message))
+
+        self.assertIs(messages[0].encode()[0], messages[1].encode()[0])
+
 
 if __name__ == "__main__":
     unittest.main()
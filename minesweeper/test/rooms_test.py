@@ -0,0 +1,86 @@
+import unittest
+from minesweeper.board import Board
+from minesweeper.rooms import RoomRegistry
+
+
+class RoomRegistryTest(unittest.TestCase):
+
+    def test_lru_eviction(self):
+        """
+        Tests that creating a room beyond the maximum evicts the least recently used room with no clients, joins and
+        leaves both counting as uses, and that rooms with clients and pinned rooms are never evicted.
+        """
+        rooms = RoomRegistry(max_rooms=4)
+        rooms.add(RoomRegistry.MAIN, Board.create_from_difficulty(Board.DIFF_EASY), pinned=True)
+        created = [rooms.create(Board.DIFF_EASY) for i in range(3)]
+
+        for room in created:
+            rooms.leave(room)
+
+        rooms.join(created[0].name)
+        rooms.leave(created[0])
+        rooms.create(Board.DIFF_EASY)
+
+        self.assertNotIn(created[1].name, rooms)
+        self.assertIn(created[0].name, rooms)
+        self.assertIn(RoomRegistry.MAIN, rooms)
+        self.assertEqual(4, len(rooms))
+
+        for room in list(rooms._rooms.values()):
+            if room.name != RoomRegistry.MAIN:
+                rooms.join(room.name)
+
+        self.assertRaises(RuntimeError, rooms.create, Board.DIFF_EASY)
+
+        rooms = RoomRegistry(max_rooms=2)
+        first, second = rooms.create(Board.DIFF_EASY), rooms.create(Board.DIFF_EASY)
+        rooms.join(first.name)
+        rooms.leave(first)
+        rooms.leave(first)
+        rooms.leave(second)
+        rooms.create(Board.DIFF_EASY)
+
+        self.assertNotIn(first.name, rooms)
+        self.assertIn(second.name, rooms)
+
+    def test_ttl_eviction(self):
+        """
+        Tests that rooms with no clients idle for longer than the TTL are evicted, and the others kept.
+        """
+        rooms = RoomRegistry(ttl=60)
+        idle, left, playing = [rooms.create((3, 3, 1)) for i in range(3)]
+
+        rooms.leave(idle)
+        rooms.leave(left)
+        idle.last_used -= 61
+        playing.last_used -= 61
+        rooms.create((3, 3, 1))
+
+        self.assertNotIn(idle.name, rooms)
+        self.assertIn(left.name, rooms)
+        self.assertIn(playing.name, rooms)
+        self.assertRaises(KeyError, rooms.join, idle.name)
+
+    def test_parse_difficulty(self):
+        self.assertEqual(Board.DIFF_HARD, RoomRegistry.parse_difficulty("hard"))
+        self.assertEqual((16, 30, 99), RoomRegistry.parse_difficulty("16x30x99"))
+
+        for string in ("", "expert", "16x30", "16x30x", "2x2x5", "0x3x0", "-3x-3x1", "3x-3x1"):
+            self.assertRaises(ValueError, RoomRegistry.parse_difficulty, string)
+
+    def test_max_squares(self):
+        """
+        Tests that rooms with boards larger than max_squares are not created.
+        """
+        rooms = RoomRegistry(max_squares=100)
+
+        self.assertRaises(ValueError, rooms.create, (50000, 50000, 1))
+        self.assertRaises(ValueError, rooms.create, (10, 11, 1))
+        self.assertEqual(0, len(rooms))
+
+        board = rooms.create((10, 10, 1)).board
+        self.assertEqual((10, 10), (board.height(), board.width()))
+
+
+if __name__ == "__main__":
+    unittest.main()
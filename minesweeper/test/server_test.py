@@ -0,0 +1,514 @@
+import asyncio
+import os
+import signal
+import unittest
+from random import Random
+from socket import socket, AF_INET, SOCK_STREAM, SOL_SOCKET, SO_RCVBUF, SO_SNDBUF
+from threading import Thread, Event
+from time import sleep
+from types import SimpleNamespace
+from minesweeper.board import Board, State
+from minesweeper.message import *
+from minesweeper.rooms import RoomRegistry
+from minesweeper.server import MineSweeperServer, Connection, AsyncMineSweeperServer, Supervisor
+from minesweeper.stream import SocketStream
+
+
+class ConnectionTest(unittest.TestCase):
+
+    @staticmethod
+    def connection(board):
+        return Connection(SimpleNamespace(_board=board, journal=None), None)
+
+    def test_batch(self):
+        """
+        Tests that a batch applies its valid commands, and replies with one board preceded by the errors of the
+        others.
+        """
+        board = Board([[False, False, True], [False, False, False], [True, False, False]])
+        connection = self.connection(board)
+        message = UTSMessage.parse_infer_type("batch flag 0 2; dig 9 9; look; flag 2 0;deflag 0 2; dig 0 0\n")
+        reply = connection._process_in_message(message)
+
+        self.assertIsInstance(message, UTSBatchMessage)
+        self.assertIsInstance(reply, STUBatchMessage)
+        self.assertEqual([State.UNTOUCHED, State.FLAGGED, State.DUG],
+                         [board.square(*s).state for s in ((0, 2), (2, 0), (0, 0))])
+
+        lines = reply.get_representation().splitlines()
+
+        self.assertEqual(UTSBatchMessage.ERROR_ITEM % (2, "dig 9 9", UTSDigMessage.ERROR_OUT_OF_BOUNDS % (9, 9)),
+                         lines[0])
+        self.assertEqual(UTSBatchMessage.ERROR_ITEM % (3, "look", UTSBatchMessage.ERROR_NOT_BATCHABLE), lines[1])
+        self.assertEqual(STUBoardMessage(board).get_representation().splitlines(), lines[2:])
+
+    def test_batch_boom(self):
+        """
+        Tests that a batch stops at the first dug mine, replying as a dug mine does.
+        """
+        board = Board([[False, True], [False, False]])
+        reply = self.connection(board)._process_in_message(
+            UTSMessage.parse_infer_type("batch flag 1 1; dig 0 1; flag 1 0"))
+
+        self.assertIsInstance(reply, STUBoomMessage)
+        self.assertEqual(State.FLAGGED, board.square(1, 1).state)
+        self.assertEqual(State.UNTOUCHED, board.square(1, 0).state)
+        self.assertEqual(0, board.mines_count())
+
+    def test_chord(self):
+        """
+        Tests that a chord command digs the neighbours of a satisfied square, and that a wrongly flagged one digs the
+        mine.
+        """
+        board = Board([[False, True], [False, False]])
+        connection = self.connection(board)
+
+        for command in ("dig 0 0", "flag 0 1", "chord 0 0"):
+            reply = connection._process_in_message(UTSMessage.parse_infer_type(command))
+
+        self.assertIsInstance(reply, STUWonMessage)
+        self.assertEqual(3, board.dug_count())
+
+        board = Board([[False, True], [False, False]])
+        connection = self.connection(board)
+
+        for command in ("dig 0 0", "flag 1 1", "chord 0 0"):
+            reply = connection._process_in_message(UTSMessage.parse_infer_type(command))
+
+        self.assertIsInstance(reply, STUBoomMessage)
+        self.assertEqual(0, board.mines_count())
+
+    def test_rooms(self):
+        """
+        Tests that clients play on the board of the room they created or joined, and leave it when switching room.
+        """
+        board = Board([[False, True], [False, False]])
+        rooms = RoomRegistry()
+        rooms.add(RoomRegistry.MAIN, board, pinned=True)
+        server = SimpleNamespace(_board=board, journal=None, rooms=rooms)
+        first, second = Connection(server, None), Connection(server, None)
+
+        reply = first._process_in_message(UTSMessage.parse_infer_type("create 4x5x2"))
+        self.assertIsInstance(reply, STURoomMessage)
+        self.assertEqual((4, 5, 2), (first.board.height(), first.board.width(), first.board.mines_count()))
+
+        reply = second._process_in_message(UTSMessage.parse_infer_type("join %s" % reply.room))
+        self.assertIs(first.board, second.board)
+        self.assertEqual(2, first.room.clients)
+
+        second._process_in_message(UTSMessage.parse_infer_type("flag 3 4"))
+        self.assertEqual(State.FLAGGED, first.board.square(3, 4).state)
+        self.assertEqual(State.UNTOUCHED, board.square(1, 1).state)
+
+        second._process_in_message(UTSMessage.parse_infer_type("join main"))
+        self.assertIs(board, second.board)
+        self.assertEqual(1, first.room.clients)
+
+        for command, error in (("join 99", UTSJoinMessage.ERROR_NO_ROOM % "99"),
+                               ("create huge", UTSCreateMessage.ERROR_DIFFICULTY % "huge"),
+                               ("create 2x2x5", UTSCreateMessage.ERROR_DIFFICULTY % "2x2x5"),
+                               ("create -3x-3x1", UTSCreateMessage.ERROR_DIFFICULTY % "-3x-3x1"),
+                               ("create 50000x50000x1", UTSCreateMessage.ERROR_TOO_LARGE %
+                                ("50000x50000x1", RoomRegistry.DEFAULT_CONFIGS["max_squares"]))):
+            self.assertEqual(error + "\n", first._process_in_message(UTSMessage.parse_infer_type(command)).
+                             get_representation())
+
+    def test_deltas(self):
+        """
+        Tests that in delta mode the board replies, applied to the full board, give the same board as full replies.
+        """
+        board = Board.create_from_difficulty((12, 15, 20), 2)
+        connection, other = self.connection(board), self.connection(board)
+        reply = connection._process_in_message(UTSMessage.parse_infer_type("hello delta")).get_representation()
+        header, text = reply.split("\n", 1)
+        self.assertEqual(STUBoardMessage.REPR_FULL % board.version(), header + "\n")
+
+        grid = [list(line) for line in text.splitlines()[:-1]]
+        header_lines = len(grid) - board.height()
+        prefix = len(grid[-1]) - 2 * board.width()
+        random = Random(2)
+
+        for i in range(60):
+            other._process_in_message(UTSMessage.parse_infer_type("flag %d %d" % (
+                random.randrange(board.height()), random.randrange(board.width()))))
+            command = "%s %d %d" % (random.choice(("dig", "dig", "flag", "deflag", "chord")),
+                                    random.randrange(board.height()), random.randrange(board.width()))
+            reply = connection._process_in_message(UTSMessage.parse_infer_type(command if i % 10 else "look"))
+
+            if isinstance(reply, STUBoomMessage):
+                continue
+
+            lines = reply.get_representation().splitlines()
+            since, version, count = map(int, lines[0].split(" ")[1:])
+            self.assertEqual(count, len(lines) - 1)
+
+            for line in lines[1:]:
+                row, col, square = line[:-1].split(" ", 2)[:2] + [line[-1]]
+                grid[header_lines + int(row)][prefix + 2 * int(col)] = square
+
+            self.assertEqual(str(board), "\n".join("".join(line) for line in grid) + "\n")
+
+        reply = connection._process_in_message(UTSMessage.parse_infer_type("snapshot"))
+        self.assertEqual(STUBoardMessage.REPR_FULL % board.version() + str(board) + "\n", reply.get_representation())
+
+    def test_pipelining(self):
+        """
+        Tests that the board replies superseded by the reply to the next command are dropped while commands are
+        buffered, that the other replies are sent in order, and that in delta mode the replies sent carry the changes
+        of those dropped.
+        """
+        board = Board([[False, False, False, False], [False, False, False, False], [False, False, False, True]])
+        connection, other = self.connection(board), self.connection(board)
+        written = list()
+        connection._write = lambda buffers: written.append(b"".join(buffers).decode())
+
+        def play(commands):
+            written.clear()
+
+            for i, command in enumerate(commands):
+                connection._reply(connection._process_in_message(UTSMessage.parse_infer_type(command)),
+                                  i < len(commands) - 1)
+
+            return list(written)
+
+        replies = play(["look"] * 5 + ["flag 0 0", "dig 9 9", "look", "flag 1 1", "help", "bye"])
+
+        self.assertEqual(5, len(replies))
+        self.assertEqual([1, 0, 2], [r.count("F") for r in replies[:3]])
+        self.assertEqual(UTSDigMessage.ERROR_OUT_OF_BOUNDS % (9, 9) + "\n", replies[1])
+        self.assertEqual([STUHelpMessage().get_representation(), STUByeMessage.REPR], replies[3:])
+
+        replies = play(["hello delta", "flag 2 2", "look"])
+        self.assertEqual([STUBoardMessage.REPR_FULL % board.version() + str(board) + "\n"], replies)
+
+        since = board.version()
+        other._process_in_message(UTSMessage.parse_infer_type("flag 0 1"))
+        replies = play(["flag 2 1", "look", "deflag 0 0", "look"])
+
+        self.assertEqual([STUBoardMessage.REPR_DELTA % (since, board.version(), 3) + "0 0 -\n0 1 F\n2 1 F\n"],
+                         replies)
+
+    def test_batch_parse(self):
+        """
+        Tests that batches with no commands or a wrong prefix are not understood.
+        """
+        for string in ("batch", "batch ;;", "batchflag 1 2", "batches flag 1 2"):
+            self.assertIsInstance(UTSMessage.parse_infer_type(string), UTSInvalidMessage)
+
+        self.assertEqual("batch flag 1 2; dig 3 4", UTSMessage.parse_infer_type("batch flag 1 2;dig 3 4").
+                         get_representation())
+
+
+class MineSweeperServerTest(unittest.TestCase):
+
+    def test_admission(self):
+        """
+        Tests that the clients beyond max_clients are queued, told their position, and admitted as soon as a client
+        leaves, and that the clients beyond max_waiting are told that the server is busy at once.
+        """
+        class Server(MineSweeperServer):
+            DEFAULT_CONFIGS = dict(MineSweeperServer.DEFAULT_CONFIGS, max_clients=1)
+
+        server = Server(Board.create_from_difficulty((3, 3, 1), 0), 0, max_waiting=2)
+        accepting = Thread(target=lambda: [server.next_connection() for i in range(4)])
+        accepting.start()
+        clients = list()
+
+        def receive(client, text):
+            data = b""
+
+            while not data.endswith(text.encode()):
+                received = client.recv(4096)
+                self.assertTrue(received, data)
+                data += received
+
+            return data.decode()
+
+        for i in range(4):
+            clients.append(socket(AF_INET, SOCK_STREAM))
+            clients[-1].settimeout(10)
+            clients[-1].connect(("127.0.0.1", server._server.getsockname()[1]))
+
+        receive(clients[0], "help.\n\n")
+        receive(clients[1], STUQueuedMessage(1).get_representation())
+        receive(clients[2], STUQueuedMessage(2).get_representation())
+        self.assertEqual(STUBusyMessage(1, 1).get_representation(), receive(clients[3], "later.\n"))
+        self.assertEqual(b"", clients[3].recv(4096))
+        accepting.join(10)
+        self.assertEqual(2, server.waiting())
+
+        clients[0].sendall(b"bye\n")
+        receive(clients[0], STUByeMessage.REPR)
+        receive(clients[1], "help.\n\n")
+        receive(clients[2], STUQueuedMessage(1).get_representation())
+
+        clients[1].sendall(b"look\nbye\n")
+        receive(clients[1], STUByeMessage.REPR)
+        receive(clients[2], "help.\n\n")
+
+        for client in clients:
+            client.close()
+
+        server.close()
+
+    def test_long_line(self):
+        """
+        Tests that a command longer than the longest line accepted is replied an error, the following commands being
+        processed as usual.
+        """
+        server = MineSweeperServer(Board.create_from_difficulty((3, 3, 1), 0), 0)
+        client = socket(AF_INET, SOCK_STREAM)
+        client.settimeout(10)
+        client.connect(("127.0.0.1", server._server.getsockname()[1]))
+        future = server.next_connection()
+
+        client.sendall(b"x" * (SocketStream.DEFAULT_CONFIGS["max_line"] + 1) + b"\nbye\n")
+        future.result(10)
+        data = b""
+
+        while not data.endswith(STUByeMessage.REPR.encode()):
+            received = client.recv(4096)
+            self.assertTrue(received, data)
+            data += received
+
+        client.close()
+        server.close()
+
+        error = UTSInvalidMessage.ERROR_TOO_LONG % SocketStream.DEFAULT_CONFIGS["max_line"]
+        self.assertTrue(data.decode().endswith(STUErrorMessage(error).get_representation() + STUByeMessage.REPR))
+
+
+class AsyncMineSweeperServerTest(unittest.TestCase):
+
+    @staticmethod
+    async def play(port, commands):
+        """
+        :return: the replies received by a client connecting to **port** and sending **commands**, hello message
+            included, once the server closes the connection.
+        """
+        reader, writer = await asyncio.open_connection("127.0.0.1", port)
+        writer.write("".join(c + "\n" for c in commands).encode())
+        await writer.drain()
+        replies = (await reader.read()).decode()
+        writer.close()
+
+        return replies
+
+    def test_clients(self):
+        """
+        Tests that many clients play at the same time, each receiving the replies to its messages, and that the clients
+        beyond max_clients are rejected.
+        """
+        clients = 300
+        board = Board.create_from_difficulty((40, 40, 1), 0)
+
+        async def run():
+            server = AsyncMineSweeperServer(board, 0, max_clients=clients)
+            await server.start()
+
+            replies = await asyncio.gather(*(self.play(server.port, ["flag %d %d" % (i // 40, i % 40), "look", "bye"])
+                                             for i in range(clients)))
+            blocked = [await asyncio.open_connection("127.0.0.1", server.port) for i in range(clients)]
+            rejected = await self.play(server.port, [])
+
+            for reader, writer in blocked:
+                writer.close()
+
+            await server.close()
+
+            return replies, rejected
+
+        replies, rejected = asyncio.run(run())
+
+        self.assertTrue(all(r.endswith(STUByeMessage.REPR) for r in replies))
+        self.assertEqual(clients, board.flagged_count())
+        self.assertEqual(STUBusyMessage(clients, clients).get_representation(), rejected)
+
+    def test_push(self):
+        """
+        Tests that subscribed clients are pushed the changes of other clients, merged into few updates, and that
+        clients which do not read their updates are skipped.
+        """
+        board = Board.create_from_difficulty((100, 100, 1), 0)
+
+        class Server(AsyncMineSweeperServer):
+            DEFAULT_CONFIGS = dict(AsyncMineSweeperServer.DEFAULT_CONFIGS, push_limit=0)
+
+        async def run():
+            server = Server(board, 0)
+            await server.start()
+
+            connections = list()
+
+            for i in range(2):
+                client = socket(AF_INET, SOCK_STREAM)
+                client.setsockopt(SOL_SOCKET, SO_RCVBUF, 4096)
+                client.connect(("127.0.0.1", server.port))
+                reader, writer = await asyncio.open_connection(sock=client)
+                writer.write(b"subscribe\n")
+                await reader.readuntil(STUSubscriptionMessage.REPR.encode())
+                connections.append((reader, writer))
+
+            (reader, writer), (slow_reader, slow_writer) = connections
+            slow = [c for c in server.connections() if c.writer.get_extra_info("peername") ==
+                    slow_writer.get_extra_info("sockname")][0]
+            slow.writer.get_extra_info("socket").setsockopt(SOL_SOCKET, SO_SNDBUF, 4096)
+
+            for i in range(10):
+                await self.play(server.port, ["flag %d %d" % (i, j) for j in range(10)] + ["bye"])
+                await asyncio.sleep(2 * server.DEFAULT_CONFIGS["tick"])
+
+            buffered = slow.writer.transport.get_write_buffer_size()
+            writer.write(b"bye\n")
+            replies = (await reader.read()).decode()
+            slow_writer.close()
+            await server.close()
+
+            return replies, buffered
+
+        replies, buffered = asyncio.run(run())
+        updates = replies.split(STUUpdateMessage.REPR)[1:]
+
+        self.assertLess(len(updates), 100)
+        self.assertEqual(100, updates[-1].count("F"))
+        self.assertLessEqual(buffered, len(STUUpdateMessage(board).get_representation()))
+
+    def test_locked_board(self):
+        """
+        Tests that clients are served while a board is locked by a long mutation, those reading it waiting for the
+        mutation to end in the thread pool rather than on the event loop.
+        """
+        board = Board.create_from_difficulty((10, 10, 1), 0)
+
+        async def run():
+            server = AsyncMineSweeperServer(board, 0)
+            await server.start()
+
+            reader, writer = await asyncio.open_connection("127.0.0.1", server.port)
+            await reader.readuntil(b"for help.\n\n")
+
+            locked, done, timeouts = Event(), Event(), list()
+
+            def mutate():
+                with board.atomic():
+                    board.set_state(0, 0, State.FLAGGED)
+                    locked.set()
+                    timeouts.append(not done.wait(5))
+
+            mutation = Thread(target=mutate)
+            mutation.start()
+            locked.wait(5)
+            writer.write(b"look\nbye\n")
+            helped = await self.play(server.port, ["help", "bye"])
+            done.set()
+            mutation.join()
+
+            looked = await reader.read()
+            writer.close()
+            await server.close()
+
+            return helped, looked.decode(), timeouts
+
+        helped, looked, timeouts = asyncio.run(run())
+
+        self.assertEqual([False], timeouts)
+        self.assertTrue(helped.endswith(STUHelpMessage().get_representation() + STUByeMessage.REPR))
+        self.assertEqual(STUBoardMessage(board).get_representation() + STUByeMessage.REPR, looked)
+
+    def test_long_line(self):
+        """
+        Tests that commands longer than the longest line accepted are replied an error, as by MineSweeperServer, the
+        following commands being processed as usual.
+        """
+        board = Board.create_from_difficulty((3, 3, 1), 0)
+        max_line = AsyncMineSweeperServer.DEFAULT_CONFIGS["max_line"]
+
+        async def run():
+            server = AsyncMineSweeperServer(board, 0)
+            await server.start()
+            replies = await self.play(server.port, ["x" * (max_line + 1), "help", "y" * (3 * max_line), "bye"])
+            await server.close()
+
+            return replies
+
+        error = STUErrorMessage(UTSInvalidMessage.ERROR_TOO_LONG % max_line).get_representation()
+
+        self.assertTrue(asyncio.run(run()).endswith(error + STUHelpMessage().get_representation() + error +
+                                                    STUByeMessage.REPR))
+
+    def test_pipelining(self):
+        """
+        Tests that the commands a client sends at once are answered with one board reply per run of board replies,
+        errors and the goodbye message being sent in order.
+        """
+        board = Board.create_from_difficulty((3, 3, 1), 0)
+        header = str(board).split("\n", 1)[0]
+
+        async def run():
+            server = AsyncMineSweeperServer(board, 0)
+            await server.start()
+            replies = await self.play(server.port, ["look"] * 5 + ["flag 0 0", "dig 9 9", "look", "bye"])
+            await server.close()
+
+            return replies
+
+        replies = asyncio.run(run())
+
+        self.assertEqual(2, replies.count(header))
+        self.assertLess(replies.index(header), replies.index(UTSDigMessage.ERROR_OUT_OF_BOUNDS % (9, 9)))
+        self.assertTrue(replies.endswith(STUByeMessage.REPR))
+
+
+class SupervisorTest(unittest.TestCase):
+
+    @staticmethod
+    def play(port, commands):
+        return asyncio.run(AsyncMineSweeperServerTest.play(port, commands))
+
+    def test_workers(self):
+        """
+        Tests that clients play on the rooms of every worker, whichever worker accepted them, and that a killed worker
+        is restarted.
+        """
+        board = Board.create_from_difficulty((5, 5, 1), 0)
+        supervisor = Supervisor(board, 0, workers=2)
+        supervisor.start()
+        thread = Thread(target=supervisor.serve_forever)
+        thread.start()
+
+        try:
+            rooms = dict()
+
+            # Connections are spread at random among the workers, so both of them eventually create a room
+            for i in range(64):
+                reply = self.play(supervisor.port, ["create 3x3x1", "bye"])
+                room = reply.split(STURoomMessage.REPR.split("%s")[0])[1].split(".")[0]
+                rooms.setdefault(room.split("-")[0], room)
+
+            self.assertEqual({"0", "1"}, set(rooms))
+
+            self.play(supervisor.port, ["flag 0 0", "join %s" % rooms["1"], "flag 1 1", "join %s" % rooms["0"],
+                                        "flag 2 2", "bye"])
+
+            for room, row in (("main", 0), (rooms["1"], 1), (rooms["0"], 2)):
+                reply = self.play(supervisor.port, ["join %s" % room, "look", "bye"])
+                self.assertEqual(2, reply.count("%d %sF" % (row, "- " * row)), reply)
+
+            pid = supervisor.pids()[1]
+            os.kill(pid, signal.SIGKILL)
+
+            for i in range(50):
+                if supervisor.pids().get(1, pid) != pid:
+                    break
+
+                sleep(0.1)
+
+            self.assertNotEqual(pid, supervisor.pids()[1])
+            self.assertTrue(self.play(supervisor.port, ["look", "bye"]).endswith(STUByeMessage.REPR))
+        finally:
+            supervisor.close()
+            thread.join()
+
+
+if __name__ == "__main__":
+    unittest.main()
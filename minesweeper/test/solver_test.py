@@ -0,0 +1,141 @@
+import unittest
+from itertools import product
+from random import Random
+from minesweeper.board import Board, State
+from minesweeper.generator import BoardGenerator
+from minesweeper import solver as solver_module
+from minesweeper.journal import play, DIG, FLAG
+from minesweeper.solver import Solver, solve, create_no_guess, hint
+
+
+class SolverTest(unittest.TestCase):
+
+    @staticmethod
+    def brute_force(board):
+        """
+        :return: the (safe, mines) sets of the not dug squares bordering dug ones which are respectively mined in none
+            and in all of the mines placements consistent with the adjacent mines counts of the dug squares.
+        """
+        dug = [s for s in board if s.state == State.DUG]
+        frontier = sorted({(n.row, n.col) for s in dug for n in board.neighbors(s.row, s.col)
+                           if n.state != State.DUG})
+        placements = list()
+
+        for values in product((0, 1), repeat=len(frontier)):
+            mined = {square for square, value in zip(frontier, values) if value}
+
+            if all(len([n for n in board.neighbors(s.row, s.col) if (n.row, n.col) in mined]) ==
+                   board.adjacent_mines(s.row, s.col) for s in dug):
+                placements.append(mined)
+
+        return {s for s in frontier if not any(s in p for p in placements)}, \
+            {s for s in frontier if all(s in p for p in placements)}
+
+    def test_deduce(self):
+        """
+        Tests that the squares deduced by the solver on small partially dug boards are exactly those determined by
+        the dug squares, as found by enumerating all of the mines placements.
+        """
+        random = Random(1)
+
+        for i in range(60):
+            b = Board.create_from_difficulty((5, 5, random.randint(3, 8)), i)
+
+            for j in range(3):
+                square = b.square(random.randrange(5), random.randrange(5))
+
+                if not square.has_bomb:
+                    b.set_state(square.row, square.col, State.DUG)
+
+            frontier = {(n.row, n.col) for s in b if s.state == State.DUG for n in b.neighbors(s.row, s.col)
+                        if n.state != State.DUG}
+
+            if len(frontier) > 14:
+                continue
+
+            safe, mines = Solver(b).deduce()
+
+            self.assertEqual(self.brute_force(b), (safe, mines))
+            self.assertFalse(any(b.square(*s).has_bomb for s in safe))
+            self.assertTrue(all(b.square(*s).has_bomb for s in mines))
+
+    def test_hint(self):
+        """
+        Tests that hints are safe squares, and that no hint is given when none can be deduced.
+        """
+        b = Board([[False, False, True], [False, False, False], [True, False, False]])
+
+        self.assertIsNone(Solver(b).hint())
+
+        b.set_state(0, 0, State.DUG)
+
+        self.assertEqual((2, 2), Solver(b).hint())
+
+        b.set_state(2, 2, State.DUG)
+
+        self.assertIsNone(Solver(b).hint())
+
+    def test_incremental_hint(self):
+        """
+        Tests that hint() keeps one Solver per board, brought up to date with the changes of the board, mines removed
+        included, and created again once the changes are no longer known.
+        """
+        b = Board([[False, False, True, False], [False, False, False, False], [True, False, False, False]])
+
+        self.assertIsNone(hint(b))
+        solver = solver_module._hints[b][1]
+
+        b.set_state(0, 0, State.DUG)
+        self.assertEqual((2, 2), hint(b))
+
+        # Digging a mine removes it
+        play(b, DIG, 2, 0)
+        hint(b)
+        self.assertIs(solver, solver_module._hints[b][1])
+        self.assertEqual(Solver(b).deduce(), solver.deduce())
+
+        b.toggle_dug()
+        hint(b)
+        self.assertIsNot(solver, solver_module._hints[b][1])
+
+    def test_hint_after_mine_removed(self):
+        """
+        Tests that the hints of a board whose mines are dug, and thus removed, then flagged are safe squares not dug
+        yet, the squares deduced from the former mines being forgotten.
+        """
+        for seed in range(3):
+            b, random = Board.create_from_difficulty((8, 8, 10), seed), Random(seed)
+
+            for i in range(60):
+                square = hint(b)
+
+                if square is not None:
+                    self.assertFalse(b.square(*square).has_bomb, (seed, i, square))
+                    self.assertNotEqual(State.DUG, b.square(*square).state, (seed, i, square))
+
+                play(b, random.choice([DIG, DIG, FLAG]), random.randrange(8), random.randrange(8))
+
+    def test_no_guess(self):
+        """
+        Tests that no-guess boards are deterministic, come with their opening dug and can be solved by logic alone.
+        """
+        b = create_no_guess(Board.DIFF_INTERMEDIATE, 3)
+
+        self.assertEqual(str(b), str(create_no_guess(Board.DIFF_INTERMEDIATE, 3)))
+        self.assertGreater(b.dug_count(), 0)
+        self.assertTrue(solve(b))
+        self.assertRaises(ValueError, create_no_guess, (6, 6, 30), 3, 5)
+
+        generator = BoardGenerator(5, queue_size=1, difficulties=(), workers=2, no_guess=True)
+
+        try:
+            b = generator.board(Board.DIFF_HARD)
+
+            self.assertGreater(b.dug_count(), 0)
+            self.assertTrue(solve(b))
+        finally:
+            generator.close()
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,86 @@
+import unittest
+from socket import socketpair, SOL_SOCKET, SO_SNDBUF
+from threading import Thread
+
+from minesweeper.stream import SocketStream
+
+
+class SocketStreamTest(unittest.TestCase):
+
+    def setUp(self):
+        self.local, self.remote = socketpair()
+
+    def tearDown(self):
+        self.local.close()
+        self.remote.close()
+
+    def test_readline(self):
+        """
+        Tests that lines received together, split across reads or left unterminated are returned one at a time.
+        """
+        stream = SocketStream(self.local)
+        self.remote.sendall(b"look\ndig 1 2\nfl")
+        self.remote.sendall(b"ag 3 4\nbye")
+        self.remote.close()
+
+        self.assertEqual([b"look\n", b"dig 1 2\n", b"flag 3 4\n", b"bye", b""],
+                         [stream.readline() for i in range(5)])
+
+    def test_long_line(self):
+        """
+        Tests that lines longer than max_line are discarded whole, whether received at once or across reads, raising
+        ValueError, and that the following lines are read as usual.
+        """
+        stream = SocketStream(self.local, max_line=10, read_size=4)
+        self.remote.sendall(b"look\n" + b"x" * 11 + b"\n" + b"y" * 30 + b"\nbye\n" + b"z" * 20)
+        self.remote.close()
+
+        self.assertEqual(b"look\n", stream.readline())
+        self.assertRaises(ValueError, stream.readline)
+        self.assertRaises(ValueError, stream.readline)
+        self.assertEqual(b"bye\n", stream.readline())
+        self.assertEqual(b"", stream.readline())
+
+    def test_write(self):
+        """
+        Tests that writes are queued up to the high water mark, and that large writes are sent whole through a small
+        send buffer, in order, while the peer reads slowly.
+        """
+        self.local.setsockopt(SOL_SOCKET, SO_SNDBUF, 4096)
+        stream = SocketStream(self.local, high_water=1 << 12, low_water=1 << 10)
+        received = bytearray()
+        chunks = [bytes([i]) * (i * 997) for i in range(1, 40)]
+
+        stream.write([b"small"])
+        self.assertEqual(5, stream.buffered())
+
+        def read():
+            while True:
+                data = self.remote.recv(1000)
+
+                if not data:
+                    return
+
+                received.extend(data)
+
+        reader = Thread(target=read)
+        reader.start()
+        stream.write(chunks)
+        self.assertLessEqual(stream.buffered(), 1 << 10)
+
+        stream.flush()
+        self.assertEqual(0, stream.buffered())
+
+        self.local.close()
+        reader.join(5)
+        self.assertEqual(b"small" + b"".join(chunks), bytes(received))
+
+    def test_water_marks(self):
+        """
+        Tests that a low water mark above the high water mark is rejected.
+        """
+        self.assertRaises(ValueError, SocketStream, self.local, 10, 20)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -1,6 +1,7 @@
 import unittest
 import math
-from minesweeper.utils import digits
+from threading import Barrier, Event, Thread
+from minesweeper.utils import digits, ReadWriteLock
 
 
 class UncategorizedTest(unittest.TestCase):
@@ -21,6 +22,47 @@ class UncategorizedTest(unittest.TestCase):
                 "digits(%f) = %d" % (digit, digits(digit))
             )
 
+    def test_read_write_lock(self):
+        """
+        Tests that ReadWriteLock lets readers share it, excludes writers while it is read, and is reentrant.
+        """
+        lock = ReadWriteLock()
+        readers = 4
+        barrier = Barrier(readers, timeout=5)
+        written = Event()
+
+        def read():
+            with lock.read():
+                # Every reader must be inside the lock at the same time for the barrier to be passed
+                barrier.wait()
+
+        def write():
+            with lock.write():
+                written.set()
+
+        threads = [Thread(target=read) for i in range(readers)]
+
+        for t in threads:
+            t.start()
+        for t in threads:
+            t.join()
+
+        with lock.read():
+            with lock.read():
+                writer = Thread(target=write)
+                writer.start()
+                self.assertFalse(written.wait(0.1))
+
+            self.assertRaises(RuntimeError, lock.acquire_write)
+
+        writer.join()
+        self.assertTrue(written.is_set())
+
+        with lock.write():
+            with lock.write():
+                with lock.read():
+                    pass
+
 
 if __name__ == "__main__":
     unittest.main()
@@ -1,4 +1,6 @@
+from contextlib import contextmanager
 from math import floor, log10
+from threading import Condition, Lock, get_ident, local
 
 
 def is_boolean(x):
@@ -21,3 +23,102 @@ def digits(n):
         return 1
 
     return floor(log10(n)) + 1
+
+
+class ReadWriteLock:
+    """
+    A readers-writer lock: any number of threads can hold it for reading at the same time, while holding it for writing
+    is exclusive. Writers are given priority over new readers, so that a steady flow of readers cannot starve them.
+
+    The lock is reentrant: a thread holding it for reading can acquire it for reading again, and a thread holding it
+    for writing can acquire it again both for reading and for writing. Upgrading a read lock to a write lock is not
+    supported, as two readers trying to do so at the same time would deadlock.
+    """
+
+    def __init__(self):
+        self._condition = Condition(Lock())
+        self._readers = 0
+        self._waiting_writers = 0
+        self._writer = None
+        self._writer_depth = 0
+        self._local = local()
+
+    def __repr__(self):
+        return "<'%s.%s' object, readers=%d, writer=%s, waiting_writers=%d>" % \
+               (self.__class__.__module__, self.__class__.__name__, self._readers, self._writer,
+                self._waiting_writers)
+
+    @contextmanager
+    def read(self):
+        self.acquire_read()
+
+        try:
+            yield self
+        finally:
+            self.release_read()
+
+    @contextmanager
+    def write(self):
+        self.acquire_write()
+
+        try:
+            yield self
+        finally:
+            self.release_write()
+
+    def acquire_read(self):
+        # Every read acquisition of the current thread is recorded, marking whether it is counted in self._readers
+        # (outermost reads only) or not (nested reads, and reads by the thread holding the write lock).
+        reads = self._local.__dict__.setdefault("reads", list())
+
+        if self._writer == get_ident() or len(reads) > 0:
+            reads.append(False)
+        else:
+            with self._condition:
+                while self._writer is not None or self._waiting_writers > 0:
+                    self._condition.wait()
+
+                self._readers += 1
+
+            reads.append(True)
+
+    def release_read(self):
+        reads = self._local.__dict__.get("reads")
+
+        if not reads:
+            raise RuntimeError("Cannot release a read lock which was not acquired")
+
+        if reads.pop():
+            with self._condition:
+                self._readers -= 1
+
+                if self._readers == 0:
+                    self._condition.notify_all()
+
+    def acquire_write(self):
+        if self._writer == get_ident():
+            self._writer_depth += 1
+            return
+        if len(self._local.__dict__.get("reads", ())) > 0:
+            raise RuntimeError("Cannot upgrade a read lock to a write lock")
+
+        with self._condition:
+            self._waiting_writers += 1
+
+            while self._writer is not None or self._readers > 0:
+                self._condition.wait()
+
+            self._waiting_writers -= 1
+            self._writer = get_ident()
+            self._writer_depth = 1
+
+    def release_write(self):
+        if self._writer != get_ident():
+            raise RuntimeError("Cannot release a write lock which is not owned")
+
+        with self._condition:
+            self._writer_depth -= 1
+
+            if self._writer_depth == 0:
+                self._writer = None
+                self._condition.notify_all()
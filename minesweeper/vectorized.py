@@ -0,0 +1,95 @@
+"""
+NumPy implementations of the most expensive steps of board generation: mine placement and adjacent mines counting.
+NumPy is an optional dependency: when it is not installed, available() returns False and Board falls back to its pure
+Python implementation.
+
+All the functions below return bytearray buffers in the layout used by Board, one byte per square at index
+row * width + col, so that they can be handed to a Board without further conversion.
+"""
+try:
+    import numpy
+except ImportError:
+    numpy = None
+
+# Number of squares generated at a time, bounding the memory taken by temporary arrays
+BLOCK_SIZE = 1 << 23
+
+
+def available():
+    """
+    :return: True if NumPy is installed, and the other functions of this module can therefore be used.
+    """
+    return numpy is not None
+
+
+def random_mines(size, probability, seed=None):
+    """
+    :param size: number of squares.
+    :param probability: the probability that a square has a bomb.
+    :param seed: seed of the random generator, or None for an unpredictable one.
+    :return: a bytearray of **size** elements, each independently 1 (mined) with the given probability, 0 otherwise.
+    """
+    mines = bytearray(size)
+    _fill_random(numpy.frombuffer(mines, dtype=numpy.uint8), probability, numpy.random.default_rng(seed))
+
+    return mines
+
+
+def random_mines_count(size, mines_count, seed=None):
+    """
+    :param size: number of squares.
+    :param mines_count: number of mined squares.
+    :param seed: seed of the random generator, or None for an unpredictable one.
+    :return: a bytearray of **size** elements, exactly **mines_count** of which are 1 (mined) and all the others 0,
+        every placement of the mines being equally likely.
+    """
+    random = numpy.random.default_rng(seed)
+    mines = bytearray(size)
+    view = numpy.frombuffer(mines, dtype=numpy.uint8)
+
+    # Every square is mined with the expected mines ratio first, then the few missing or exceeding mines are added to
+    # or removed from random squares.
+    _fill_random(view, mines_count / size, random)
+    count = int(view.sum(dtype=numpy.int64))
+
+    while count != mines_count:
+        value = 1 if count < mines_count else 0
+        candidates = numpy.unique(random.integers(0, size, abs(mines_count - count)))
+        candidates = random.permutation(candidates[view[candidates] != value])[:abs(mines_count - count)]
+        view[candidates] = value
+        count += len(candidates) if value else -len(candidates)
+
+    return mines
+
+
+def adjacent_counts(mines, height, width):
+    """
+    :param mines: a buffer of height * width elements, 1 for mined squares and 0 otherwise.
+    :return: a bytearray with the number of mines adjacent to every square, computed as the sum of the mines grid
+        shifted in each of the eight directions.
+    """
+    counts = bytearray(height * width)
+    grid = numpy.frombuffer(mines, dtype=numpy.uint8).reshape(height, width)
+    result = numpy.frombuffer(counts, dtype=numpy.uint8).reshape(height, width)
+    # Slices of the destination and of the source, along one axis, for the shifts by -1, 0 and 1
+    shifts = {-1: (slice(1, None), slice(None, -1)), 0: (slice(None), slice(None)), 1: (slice(None, -1), slice(1, None))}
+
+    for row_shift, (row_dst, row_src) in shifts.items():
+        for col_shift, (col_dst, col_src) in shifts.items():
+            if (row_shift, col_shift) != (0, 0):
+                result[row_dst, col_dst] += grid[row_src, col_src]
+
+    return counts
+
+
+def _fill_random(view, probability, random):
+    """
+    Sets every element of **view** to 1 with the given probability, 0 otherwise. Random 16 bit integers are drawn
+    rather than floats, being much cheaper to generate, so probabilities are rounded to multiples of 1 / 65536.
+    """
+    threshold = round(probability * (1 << 16))
+    result = view.view(numpy.bool_)
+
+    for start in range(0, len(view), BLOCK_SIZE):
+        end = min(start + BLOCK_SIZE, len(view))
+        numpy.less(random.integers(0, 1 << 16, end - start, dtype=numpy.uint16), threshold, out=result[start:end])